@@ -0,0 +1,76 @@
+# -*- coding: utf-8 -*-
+"""
+요청 수락 제어 (bounded admission queue).
+동시에 처리할 요청 수와 대기열 길이를 제한하고, 대기열이 가득 차면 즉시 거절하여
+과부하 시 요청이 쌓여 클라이언트 타임아웃(30초)까지 끌려가는 일을 막습니다.
+"""
+import threading
+
+# --- 설정 ---
+DEFAULT_MAX_INFLIGHT = 4      # 동시에 처리할 최대 요청 수
+DEFAULT_MAX_QUEUE = 8         # 처리 슬롯을 기다릴 수 있는 최대 요청 수
+DEFAULT_QUEUE_TIMEOUT = 10.0  # 대기열에서 기다리는 최대 시간 (초)
+# --- 설정 끝 ---
+
+class AdmissionController:
+    """처리 슬롯(세마포어) + 대기 카운터로 구성된 수락 제어기. 스레드 안전합니다."""
+
+    def __init__(self, max_inflight=DEFAULT_MAX_INFLIGHT, max_queue=DEFAULT_MAX_QUEUE, queue_timeout=DEFAULT_QUEUE_TIMEOUT):
+        self.max_inflight = max(1, max_inflight)
+        self.max_queue = max(0, max_queue)
+        self.queue_timeout = queue_timeout
+        self._slots = threading.Semaphore(self.max_inflight)
+        self._lock = threading.Lock()
+        self._inflight = 0
+        self._waiting = 0
+        self._admitted_total = 0
+        self._rejected_total = 0
+
+    def try_acquire(self):
+        """
+        처리 슬롯을 얻습니다. 슬롯이 없으면 대기열에 들어가 queue_timeout까지 기다립니다.
+
+        Returns:
+            bool: 슬롯을 얻었으면 True (반드시 release() 호출), 대기열이 가득 찼거나 시간 초과면 False.
+        """
+        acquired = self._slots.acquire(blocking=False)
+        if not acquired:
+            with self._lock:
+                if self._waiting >= self.max_queue:
+                    self._rejected_total += 1
+                    return False
+                self._waiting += 1
+            try:
+                acquired = self._slots.acquire(timeout=self.queue_timeout)
+            finally:
+                with self._lock:
+                    self._waiting -= 1
+        with self._lock:
+            if acquired:
+                self._inflight += 1
+                self._admitted_total += 1
+            else:
+                self._rejected_total += 1
+        return acquired
+
+    def release(self):
+        """try_acquire()로 얻은 슬롯을 반환합니다."""
+        with self._lock:
+            self._inflight -= 1
+        self._slots.release()
+
+    def reset_after_fork(self):
+        """포크된 자식 프로세스에서 호출: 부모에서 복사된 잠금/카운터를 새로 만듭니다."""
+        self.__init__(self.max_inflight, self.max_queue, self.queue_timeout)
+
+    def stats(self):
+        """현재 처리 중/대기 중 요청 수와 누적 수락/거절 수."""
+        with self._lock:
+            return {
+                "inflight": self._inflight,
+                "waiting": self._waiting,
+                "max_inflight": self.max_inflight,
+                "max_queue": self.max_queue,
+                "admitted_total": self._admitted_total,
+                "rejected_total": self._rejected_total,
+            }
@@ -1,34 +1,389 @@
 # -*- coding: utf-8 -*-
 import os
-import whisper # STT
 from gtts import gTTS # TTS
 from pydub import AudioSegment # Audio conversion
-from flask import Flask, request, jsonify, send_file # Web framework
-import tempfile # For temporary files
+from flask import Flask, request, jsonify, Response, stream_with_context, g, has_request_context # Web framework
 import io # For sending file data from memory
+import json # For streaming NDJSON responses
+import threading # For background model loading
+import time # For load/warmup timing
+import numpy as np # Synthetic warmup clip
+import audio_utils # PCM conversion / resampling
+import stt_batcher # Micro-batching of concurrent STT requests
+import stt_engines # Pluggable STT backends (whisper / faster-whisper int8)
+import tts_cache # Two-tier TTS result cache
+import text_utils # Sentence splitting for streaming TTS
+import admission # Bounded admission queue (429 on overload)
+import metrics # Prometheus text-format metrics
+import conversation # Weather / LLM routing shared with main.py
+import converse_protocol # Framed /converse response stream
+import tracing # Per-turn latency spans (X-Turn-Id from main.py)
+from contextlib import contextmanager # Stage timer context manager
+from concurrent.futures import ThreadPoolExecutor # Parallel sentence synthesis
+from collections import deque # Bounded sentence prefetch window
 
 # --- 설정 ---
-WHISPER_MODEL_NAME = "large"
+# STT 엔진: 'whisper' (PyTorch 레퍼런스) 또는 'faster-whisper' (CPU int8 양자화)
+STT_ENGINE = os.getenv("STT_ENGINE", "whisper")
+WHISPER_MODEL_NAME = os.getenv("STT_MODEL", "large")
+STT_THREADS = int(os.getenv("STT_THREADS", 0))     # CPU 추론 스레드 수 (0: 라이브러리 기본값)
+STT_BEAM_SIZE = int(os.getenv("STT_BEAM_SIZE", 1)) # 빔 서치 크기 (1: 그리디)
+STT_LOAD_IN_BACKGROUND = os.getenv("STT_LOAD_IN_BACKGROUND", "1") == "1" # 포트를 먼저 열고 모델은 백그라운드에서 로드
+STT_WARMUP_SECONDS = float(os.getenv("STT_WARMUP_SECONDS", 1.0)) # 워밍업용 합성 오디오 길이 (0이면 워밍업 생략)
+STT_RETRY_AFTER_SECONDS = 5 # 모델 준비 전 요청에 돌려줄 Retry-After (초)
+STT_DEFER_LOAD = os.getenv("STT_DEFER_LOAD", "0") == "1" # import 시 로드하지 않음 (serve.py가 직접 로드 시점을 제어)
 # --- 추가: 표준 오디오 샘플 레이트 설정 ---
-TARGET_SAMPLE_RATE = 44100 # 또는 16000
+TARGET_SAMPLE_RATE = 44100 # 또는 16000 (형식을 지정하지 않은 기존 클라이언트용 WAV 기본값)
+# ------------------------------------
+# --- TTS 출력 형식 협상 설정 ---
+TTS_OUTPUT_FORMATS = { # 형식 이름 → Content-Type
+    "wav": "audio/wav",
+    "pcm": "audio/pcm",
+    "opus": "audio/ogg; codecs=opus",
+}
+TTS_ACCEPT_MIMETYPES = { # Accept 헤더 MIME 타입 → 형식 이름
+    "audio/wav": "wav", "audio/x-wav": "wav", "audio/wave": "wav",
+    "audio/pcm": "pcm", "audio/l16": "pcm",
+    "audio/ogg": "opus", "audio/opus": "opus",
+}
+TTS_DEFAULT_SAMPLE_RATES = {"wav": TARGET_SAMPLE_RATE, "pcm": 16000, "opus": 24000}
+TTS_ALLOWED_SAMPLE_RATES = {
+    "wav": (16000, 22050, 24000, 44100),
+    "pcm": range(8000, 48001),
+    "opus": (8000, 12000, 16000, 24000, 48000), # Opus가 지원하는 입력 샘플 레이트
+}
+# ------------------------------------
+# --- 스트리밍 STT 설정 ---
+STT_STREAM_PARTIAL_INTERVAL = float(os.getenv("STT_STREAM_PARTIAL_INTERVAL", 1.5)) # 부분 인식 주기 (초, 새로 들어온 오디오 기준)
+STT_STREAM_STABLE_MARGIN = float(os.getenv("STT_STREAM_STABLE_MARGIN", 1.0)) # 버퍼 끝에서 이만큼 떨어진 세그먼트는 확정 (초)
+STT_STREAM_READ_SIZE = 4096 # 요청 스트림에서 한 번에 읽을 바이트 수
+# ------------------------------------
+# --- STT 배치 처리 설정 ---
+STT_BATCHING = os.getenv("STT_BATCHING", "1") == "1" # 동시 요청을 모아 한 번에 디코딩
+STT_BATCH_WINDOW_MS = int(os.getenv("STT_BATCH_WINDOW_MS", stt_batcher.DEFAULT_BATCH_WINDOW_MS))
+STT_BATCH_MAX_SIZE = int(os.getenv("STT_BATCH_MAX_SIZE", stt_batcher.DEFAULT_MAX_BATCH_SIZE))
+# ------------------------------------
+
+# --- TTS 캐시 설정 ---
+TTS_CACHE_ENABLED = os.getenv("TTS_CACHE_ENABLED", "1") == "1"
+TTS_CACHE_DIR = os.getenv("TTS_CACHE_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), "tts_cache"))
+TTS_CACHE_MEMORY_MB = float(os.getenv("TTS_CACHE_MEMORY_MB", 64)) # 메모리 LRU 한도
+TTS_CACHE_DISK_MB = float(os.getenv("TTS_CACHE_DISK_MB", 512))    # 디스크 저장소 한도 (0이면 디스크 사용 안 함)
+# ------------------------------------
+
+# --- 스트리밍 TTS 설정 ---
+TTS_STREAM_PREFETCH = int(os.getenv("TTS_STREAM_PREFETCH", 2)) # 동시에 합성할 문장 수 (현재 문장 전송 중 다음 문장을 미리 합성)
+TTS_STREAM_FRAME_BYTES = 8192 # 응답에 한 번에 쓰는 PCM 바이트 수
+# ------------------------------------
+
+# --- 요청 수락 제어 설정 (프로세스/워커 단위) ---
+ADMISSION_MAX_INFLIGHT = int(os.getenv("ADMISSION_MAX_INFLIGHT", admission.DEFAULT_MAX_INFLIGHT))
+ADMISSION_MAX_QUEUE = int(os.getenv("ADMISSION_MAX_QUEUE", admission.DEFAULT_MAX_QUEUE))
+ADMISSION_QUEUE_TIMEOUT = float(os.getenv("ADMISSION_QUEUE_TIMEOUT", admission.DEFAULT_QUEUE_TIMEOUT))
+ADMISSION_RETRY_AFTER_SECONDS = 2 # 429 응답의 Retry-After (초)
+ADMISSION_ENDPOINTS = {'speech_to_text', 'speech_to_text_stream', 'generate_tts', 'generate_tts_stream', 'converse'} # 무거운 엔드포인트만 제한
+# ------------------------------------
+
+# --- 메트릭 설정 ---
+METRICS_RATE_WINDOW_SECONDS = 60 # '벽시계 1초당 처리 오디오 초' 계산 구간
+METRICS_ENDPOINTS = { # Flask 엔드포인트 → (메트릭 endpoint 레이블, 서비스)
+    'speech_to_text': ('stt', 'stt'),
+    'speech_to_text_stream': ('stt_stream', 'stt'),
+    'generate_tts': ('generate_tts', 'tts'),
+    'generate_tts_stream': ('generate_tts_stream', 'tts'),
+    'converse': ('converse', 'converse'),
+}
+METRICS_STREAMED_ENDPOINTS = {'speech_to_text_stream', 'generate_tts_stream', 'converse'} # 응답 전송 시간에 생성 시간이 섞이는 엔드포인트
+# ------------------------------------
+
+# --- 턴 추적 설정 (main.py가 X-Turn-Id 헤더를 보낸 요청만 기록) ---
+TRACE_ENABLED = os.getenv("TRACE_ENABLED", "1") == "1"
+TRACE_FILE = os.getenv("TRACE_FILE", os.path.join(os.path.dirname(os.path.abspath(__file__)), "traces", "server.{pid}.jsonl")) # 워커별 파일
 # ------------------------------------
 
 # --- Flask 앱 초기화 ---
 app = Flask(__name__)
 
-# --- Whisper 모델 로드 ---
-print(f"Whisper 모델 로딩 중: {WHISPER_MODEL_NAME}...")
-whisper_model = None
-try:
-    if os.system("ffmpeg -version > nul 2>&1" if os.name == 'nt' else "ffmpeg -version > /dev/null 2>&1") != 0:
-         print("경고: ffmpeg가 설치되지 않았거나 PATH에 없습니다. Whisper/Pydub 작동에 실패할 수 있습니다.")
-         print("ffmpeg를 설치하고 환경 변수 PATH에 추가해주세요. (https://ffmpeg.org/download.html)")
+# --- 메트릭 정의 (/metrics) ---
+metrics_registry = metrics.Registry()
+REQUESTS_TOTAL = metrics_registry.counter("audio_requests_total", "처리한 요청 수", ("endpoint", "status"))
+REQUESTS_IN_FLIGHT = metrics_registry.gauge("audio_requests_in_flight", "처리 중인 요청 수", ("endpoint",))
+REQUEST_DURATION = metrics_registry.histogram("audio_request_duration_seconds", "요청 전체 처리 시간 (응답 전송 포함)", ("endpoint",))
+STAGE_DURATION = metrics_registry.histogram(
+    "audio_stage_duration_seconds",
+    "단계별 처리 시간 (upload_read, decode, inference, synthesis, transcode, reply, response_write)",
+    ("service", "stage"))
+AUDIO_SECONDS_TOTAL = metrics_registry.counter("audio_processed_audio_seconds_total", "처리한 오디오 길이 합계 (STT 입력 / TTS 출력)", ("service",))
+AUDIO_RATE = metrics_registry.gauge(
+    "audio_processed_audio_seconds_per_wall_second",
+    f"최근 {METRICS_RATE_WINDOW_SECONDS}초 동안 벽시계 1초당 처리한 오디오 초", ("service",))
+MODEL_READY = metrics_registry.gauge("audio_stt_model_ready", "STT 모델 준비 여부 (1: ready)")
+ADMISSION_GAUGE = metrics_registry.gauge("audio_admission", "요청 수락 제어 상태 (inflight, waiting, rejected_total 등)", ("field",))
+TTS_CACHE_GAUGE = metrics_registry.gauge("audio_tts_cache", "TTS 캐시 카운터 (hits, misses, bytes 등)", ("field",))
+audio_rate_windows = {
+    "stt": metrics.RateWindow(METRICS_RATE_WINDOW_SECONDS),
+    "tts": metrics.RateWindow(METRICS_RATE_WINDOW_SECONDS),
+}
+
+if TRACE_ENABLED:
+    tracing.configure(TRACE_FILE)
+
+@contextmanager
+def time_stage(service, stage):
+    """단계 처리 시간을 메트릭에 기록하고, 요청에 턴 ID가 있으면 같은 턴의 서버 스팬('service.stage')으로도 남깁니다."""
+    turn = g.get('trace_turn') if has_request_context() else None # 합성 스레드 풀 안에서는 요청 컨텍스트 없음
+    if turn is None:
+        with STAGE_DURATION.time(service=service, stage=stage):
+            yield
+        return
+    with STAGE_DURATION.time(service=service, stage=stage), turn.span(f"{service}.{stage}"):
+        yield
+
+def record_audio_seconds(service, seconds):
+    """처리한 오디오 길이를 누적 카운터와 최근 구간 비율에 반영합니다."""
+    AUDIO_SECONDS_TOTAL.inc(seconds, service=service)
+    audio_rate_windows[service].add(seconds)
+
+@app.before_request
+def start_request_metrics():
+    """측정 대상 엔드포인트의 처리 중 요청 수 증가. (admit_request보다 먼저 등록되어 429도 집계)"""
+    if request.endpoint not in METRICS_ENDPOINTS:
+        return
+    turn_id = request.headers.get(tracing.TURN_ID_HEADER)
+    if TRACE_ENABLED and turn_id:
+        g.trace_turn = tracing.Turn(turn_id[:64], source="server")
+    g.metrics_started = time.perf_counter()
+    REQUESTS_IN_FLIGHT.inc(endpoint=METRICS_ENDPOINTS[request.endpoint][0])
+
+@app.after_request
+def finish_request_metrics(response):
+    """응답 본문 전송이 끝난 시점(call_on_close)에 요청 수/시간/응답 전송 단계를 기록합니다."""
+    started = g.pop('metrics_started', None)
+    if started is None:
+        return response
+    endpoint, service = METRICS_ENDPOINTS[request.endpoint]
+    status = str(response.status_code)
+    streamed = request.endpoint in METRICS_STREAMED_ENDPOINTS
+    response_ready = time.perf_counter()
+    turn = g.get('trace_turn')
 
-    whisper_model = whisper.load_model(WHISPER_MODEL_NAME)
-    print(f"Whisper 모델 '{WHISPER_MODEL_NAME}' 로드 완료.")
+    def on_close():
+        finished = time.perf_counter()
+        REQUESTS_IN_FLIGHT.dec(endpoint=endpoint)
+        REQUESTS_TOTAL.inc(endpoint=endpoint, status=status)
+        REQUEST_DURATION.observe(finished - started, endpoint=endpoint)
+        if not streamed: # 스트리밍 응답은 전송 시간에 생성 시간이 섞이므로 제외
+            STAGE_DURATION.observe(finished - response_ready, service=service, stage="response_write")
+        if turn is not None:
+            turn.record(f"request.{endpoint}", finished - started, started_perf=started, ok=response.status_code < 400,
+                        status=response.status_code)
+
+    response.call_on_close(on_close)
+    return response
+
+@app.teardown_request
+def abort_request_metrics(exc):
+    """after_request까지 가지 못한 요청(처리 중 예외)도 처리 중 수를 되돌리고 500으로 집계."""
+    if g.pop('metrics_started', None) is None:
+        return
+    endpoint = METRICS_ENDPOINTS[request.endpoint][0]
+    REQUESTS_IN_FLIGHT.dec(endpoint=endpoint)
+    REQUESTS_TOTAL.inc(endpoint=endpoint, status="500")
+
+admission_controller = admission.AdmissionController(ADMISSION_MAX_INFLIGHT, ADMISSION_MAX_QUEUE, ADMISSION_QUEUE_TIMEOUT)
+
+@app.before_request
+def admit_request():
+    """무거운 엔드포인트는 처리 슬롯을 얻은 뒤에만 실행. 대기열이 가득 차면 429 + Retry-After로 즉시 거절."""
+    if request.endpoint not in ADMISSION_ENDPOINTS:
+        return None
+    if not admission_controller.try_acquire():
+        print(f"요청 거절 (429): {request.path} - 서버 혼잡")
+        response = jsonify({"error": "서버가 혼잡합니다. 잠시 후 다시 시도하세요."})
+        response.status_code = 429
+        response.headers['Retry-After'] = str(ADMISSION_RETRY_AFTER_SECONDS)
+        return response
+    g.admitted = True
+    return None
+
+@app.teardown_request
+def release_admission(exc):
+    """요청(스트리밍 응답은 스트림 종료 시점)이 끝나면 처리 슬롯 반환."""
+    if g.pop('admitted', False):
+        admission_controller.release()
+
+# --- TTS 캐시 초기화 ---
+tts_result_cache = None
+if TTS_CACHE_ENABLED:
+    try:
+        tts_result_cache = tts_cache.TTSCache(
+            TTS_CACHE_DIR,
+            memory_limit_bytes=int(TTS_CACHE_MEMORY_MB * 1024 * 1024),
+            disk_limit_bytes=int(TTS_CACHE_DISK_MB * 1024 * 1024),
+        )
+    except OSError as e:
+        print(f"경고: TTS 캐시 초기화 실패 ({e}). 캐시 없이 동작합니다.")
+
+# --- 응답 생성 모듈 (/converse: 날씨 / LLM 분기를 서버에서 처리) ---
+try:
+    import weather_module
 except Exception as e:
-    print(f"Whisper 모델 로딩 오류: {e}")
-    print("torch 등 관련 라이브러리가 올바르게 설치되었는지 확인하세요.")
+    print(f"경고: weather_module 로드 실패 ({e}). /converse 날씨 기능이 비활성화됩니다.")
+    weather_module = None
+try:
+    import language_model
+except Exception as e:
+    print(f"경고: language_model 로드 실패 ({e}). /converse LLM 기능이 비활성화됩니다.")
+    language_model = None
+
+# --- STT 엔진(Whisper 모델) 로드 ---
+# 모델 로드는 수십 초가 걸리므로 백그라운드 스레드에서 수행하고, Flask는 바로 포트를 엽니다.
+# 준비 상태는 /healthz, /readyz 로 확인할 수 있으며, 준비 전 STT 요청은 503으로 즉시 거절합니다.
+stt_engine = None
+batcher = None
+preloaded_engine = None # serve.py: 포크 전에 로드만 해 둔 엔진 (워커에서 활성화)
+model_status = {
+    "state": "pending",      # pending → loading → (loaded →) warming → ready | failed
+    "loaded": False,
+    "warm": False,
+    "error": None,
+    "load_seconds": None,
+    "warmup_seconds": None,
+}
+
+def warmup_stt_engine(engine):
+    """합성 오디오(저음량 잡음 + 톤)로 추론을 한 번 수행하여 첫 실제 요청의 지연 초기화 비용을 없앱니다."""
+    sample_count = int(STT_WARMUP_SECONDS * audio_utils.WHISPER_SAMPLE_RATE)
+    t = np.arange(sample_count) / audio_utils.WHISPER_SAMPLE_RATE
+    rng = np.random.default_rng(0)
+    clip = (0.05 * np.sin(2 * np.pi * 220 * t) + 0.01 * rng.standard_normal(sample_count)).astype(np.float32)
+    engine.transcribe(clip)
+    if engine.supports_batching and STT_BATCHING:
+        engine.transcribe_batch([clip]) # 배치 디코딩 경로도 미리 실행
+
+def load_stt_engine(activate=True):
+    """
+    STT 엔진을 로드합니다. activate=True면 이어서 워밍업/배치 스케줄러 시작/공개까지 수행하고,
+    False면 로드만 한 뒤 preloaded_engine에 보관합니다 (serve.py: 포크 전 마스터 프로세스에서 사용).
+    """
+    global preloaded_engine
+    model_status["state"] = "loading"
+    model_status["error"] = None
+    print(f"STT 엔진 로딩 중: {STT_ENGINE}:{WHISPER_MODEL_NAME}...")
+    try:
+        if os.system("ffmpeg -version > nul 2>&1" if os.name == 'nt' else "ffmpeg -version > /dev/null 2>&1") != 0:
+             print("경고: ffmpeg가 설치되지 않았거나 PATH에 없습니다. Whisper/Pydub 작동에 실패할 수 있습니다.")
+             print("ffmpeg를 설치하고 환경 변수 PATH에 추가해주세요. (https://ffmpeg.org/download.html)")
+
+        started = time.monotonic()
+        engine = stt_engines.create_engine(STT_ENGINE, WHISPER_MODEL_NAME, threads=STT_THREADS, beam_size=STT_BEAM_SIZE)
+        model_status["load_seconds"] = round(time.monotonic() - started, 2)
+        model_status["loaded"] = True
+        print(f"STT 엔진 로드 완료: {engine.describe()} ({model_status['load_seconds']}초)")
+    except Exception as e:
+        model_status["state"] = "failed"
+        model_status["error"] = str(e)
+        print(f"STT 엔진 로딩 오류: {e}")
+        print("torch / faster-whisper 등 관련 라이브러리가 올바르게 설치되었는지 확인하세요.")
+        return
+
+    if activate:
+        activate_stt_engine(engine)
+    else:
+        preloaded_engine = engine
+        model_status["state"] = "loaded"
+
+def activate_stt_engine(engine):
+    """
+    워밍업 → 배치 스케줄러 시작 → 엔진 공개. 스레드를 띄우므로 요청을 처리할 프로세스 안에서 호출해야 합니다.
+    """
+    global stt_engine, batcher
+    try:
+        if STT_WARMUP_SECONDS > 0:
+            model_status["state"] = "warming"
+            started = time.monotonic()
+            warmup_stt_engine(engine)
+            model_status["warmup_seconds"] = round(time.monotonic() - started, 2)
+            print(f"STT 엔진 워밍업 완료 ({model_status['warmup_seconds']}초)")
+        model_status["warm"] = True
+
+        if engine.supports_batching and STT_BATCHING:
+            batcher = stt_batcher.STTBatcher(engine.transcribe_batch, window_ms=STT_BATCH_WINDOW_MS, max_batch_size=STT_BATCH_MAX_SIZE)
+            batcher.start()
+        stt_engine = engine # 모든 준비가 끝난 뒤에 공개 (요청 처리 스레드가 반쯤 준비된 엔진을 보지 않도록)
+        model_status["state"] = "ready"
+    except Exception as e:
+        model_status["state"] = "failed"
+        model_status["error"] = str(e)
+        print(f"STT 엔진 워밍업/활성화 오류: {e}")
+
+def start_worker_after_fork():
+    """
+    serve.py(gunicorn post_fork 훅)에서 워커마다 호출: 마스터가 포크 전에 로드해 둔 엔진을
+    이 워커에서 활성화합니다. 가중치 메모리는 포크 시 copy-on-write로 공유되고,
+    스레드와 잠금은 포크를 넘어오지 않으므로 여기서 새로 만듭니다.
+    """
+    admission_controller.reset_after_fork()
+    if preloaded_engine is None:
+        return
+    preloaded_engine.reset_after_fork()
+    threading.Thread(target=activate_stt_engine, args=(preloaded_engine,), name="stt-activate", daemon=True).start()
+
+def start_model_loading(background=STT_LOAD_IN_BACKGROUND):
+    """STT 엔진 로드를 시작합니다. background=False면 로드가 끝날 때까지 기다립니다."""
+    if model_status["state"] != "pending":
+        return
+    if background:
+        threading.Thread(target=load_stt_engine, name="stt-loader", daemon=True).start()
+    else:
+        load_stt_engine()
+
+def stt_unavailable_response():
+    """모델이 아직 준비되지 않았을 때의 응답 (로딩 중이면 503 + Retry-After, 실패면 500)."""
+    if model_status["state"] == "failed":
+        return jsonify({"error": f"Whisper 모델이 로드되지 않았습니다: {model_status['error']}"}), 500
+    response = jsonify({"error": "Whisper 모델 준비 중입니다. 잠시 후 다시 시도하세요.", "state": model_status["state"]})
+    response.status_code = 503
+    response.headers['Retry-After'] = str(STT_RETRY_AFTER_SECONDS)
+    return response
+
+if not STT_DEFER_LOAD:
+    start_model_loading()
+
+def transcribe_audio(audio):
+    """
+    16kHz float32 오디오를 텍스트로 변환합니다.
+    배치 가능한 엔진이면 30초 이하 오디오는 배치 스케줄러를 거치고,
+    더 긴 오디오는 슬라이딩 윈도우가 필요하므로 엔진의 transcribe()로 처리.
+    """
+    if batcher is not None and len(audio) <= stt_engine.max_batch_samples:
+        return batcher.transcribe(audio)
+    return stt_engine.transcribe(audio)["text"]
+
+def decode_audio_upload(audio_bytes):
+    """
+    업로드된 오디오를 Whisper 입력(16kHz float32)으로 디코딩합니다.
+    WAV(16비트 PCM / 32비트 float)는 요청 버퍼에서 바로 파싱·리샘플링하고 (임시 파일, ffmpeg 프로세스 없음),
+    FLAC / Ogg Opus(클라이언트 UPLOAD_FORMAT)는 soundfile이 있으면 프로세스 안에서 디코딩하며,
+    그 외 형식은 ffmpeg 파이프로 디코딩합니다. 16kHz로 올라온 오디오는 리샘플링하지 않습니다.
+    """
+    if audio_utils.is_flac_or_ogg(audio_bytes):
+        try:
+            audio, sample_rate = audio_utils.decode_with_soundfile(audio_bytes)
+            return audio_utils.resample(audio, sample_rate)
+        except ImportError:
+            print("soundfile이 설치되어 있지 않습니다. ffmpeg 디코딩으로 대체합니다.")
+        except RuntimeError as e:
+            print(f"soundfile 디코딩 실패 ({e}). ffmpeg 디코딩으로 대체합니다.")
+        return audio_utils.decode_with_ffmpeg(audio_bytes)
+
+    try:
+        audio, sample_rate = audio_utils.decode_wav(audio_bytes)
+        return audio_utils.resample(audio, sample_rate)
+    except ValueError as e:
+        print(f"WAV 빠른 경로 사용 불가 ({e}). ffmpeg 디코딩으로 대체합니다.")
+
+    return audio_utils.decode_with_ffmpeg(audio_bytes)
 
 # --- API 엔드포인트 ---
 
@@ -36,11 +391,123 @@ except Exception as e:
 def index():
     return jsonify({"status": "Audio API 서버 실행 중!"})
 
+def negotiate_tts_format(data):
+    """
+    요청 JSON('format', 'sample_rate') 또는 Accept 헤더로 TTS 출력 형식과 샘플 레이트를 결정합니다.
+
+    Returns:
+        tuple: (형식 이름, 샘플 레이트)
+
+    Raises:
+        ValueError: 지원하지 않는 형식/샘플 레이트인 경우.
+    """
+    output_format = data.get('format')
+    if output_format is None:
+        # JSON에 형식이 없으면 Accept 헤더에서 품질값(q) 순으로 선택
+        for mimetype, _ in request.accept_mimetypes:
+            output_format = TTS_ACCEPT_MIMETYPES.get(mimetype.split(';')[0].strip().lower())
+            if output_format:
+                break
+        else:
+            output_format = "wav"
+    output_format = str(output_format).lower()
+    if output_format not in TTS_OUTPUT_FORMATS:
+        raise ValueError(f"지원하지 않는 출력 형식입니다: '{output_format}' (사용 가능: {', '.join(TTS_OUTPUT_FORMATS)})")
+
+    try:
+        sample_rate = int(data.get('sample_rate', TTS_DEFAULT_SAMPLE_RATES[output_format]))
+    except (TypeError, ValueError):
+        raise ValueError("'sample_rate' 값이 올바르지 않습니다")
+    allowed = TTS_ALLOWED_SAMPLE_RATES[output_format]
+    if isinstance(allowed, range):
+        if sample_rate not in allowed:
+            raise ValueError(f"'{output_format}' 샘플 레이트는 {allowed.start}~{allowed.stop - 1}Hz 범위여야 합니다")
+    elif sample_rate not in allowed:
+        raise ValueError(f"'{output_format}' 샘플 레이트는 {', '.join(map(str, allowed))}Hz 중 하나여야 합니다")
+    return output_format, sample_rate
+
+def tts_mimetype(output_format, sample_rate):
+    """출력 형식의 Content-Type 값."""
+    if output_format == "pcm":
+        return f"audio/pcm;rate={sample_rate};channels=1;format=s16le"
+    return TTS_OUTPUT_FORMATS[output_format]
+
+def synthesize_audio(text, lang, output_format="wav", sample_rate=TARGET_SAMPLE_RATE):
+    """
+    gTTS로 MP3를 합성한 뒤 요청 형식으로 한 번에 변환합니다.
+    wav/pcm: MP3를 한 번 디코딩하고 리샘플링·16비트 패킹·헤더 작성은 모두 프로세스 내부(NumPy)에서 처리.
+    opus: MP3를 ffmpeg 한 번으로 바로 Ogg Opus로 트랜스코딩.
+    """
+    # 1. gTTS로 MP3 오디오를 메모리에 생성
+    with time_stage("tts", "synthesis"):
+        mp3_fp = io.BytesIO()
+        tts = gTTS(text=text, lang=lang)
+        tts.write_to_fp(mp3_fp)
+        mp3_bytes = mp3_fp.getvalue()
+
+    if output_format == "opus":
+        with time_stage("tts", "transcode"):
+            return audio_utils.encode_opus_with_ffmpeg(mp3_bytes, sample_rate)
+
+    # 2. Pydub으로 MP3 디코딩 (16비트 모노) → 목표 샘플 레이트 PCM
+    with time_stage("tts", "transcode"):
+        segment = AudioSegment.from_mp3(io.BytesIO(mp3_bytes)).set_channels(1).set_sample_width(2)
+        audio = audio_utils.resample(audio_utils.pcm16_to_float32(segment.raw_data), segment.frame_rate, sample_rate)
+        pcm = audio_utils.float32_to_pcm16(audio)
+    record_audio_seconds("tts", len(audio) / sample_rate)
+    if output_format == "pcm":
+        return pcm
+    return audio_utils.build_wav_header(sample_rate, data_size=len(pcm)) + pcm
+
+def get_tts_audio(text, lang, output_format="wav", sample_rate=TARGET_SAMPLE_RATE):
+    """
+    캐시를 먼저 조회하고, 없으면 합성하여 캐시에 저장합니다.
+
+    Returns:
+        tuple: (오디오 바이트, 캐시 키, 'HIT' 또는 'MISS')
+    """
+    cache_key = tts_cache.make_key(text, lang, sample_rate, output_format)
+    audio_bytes = tts_result_cache.get(cache_key) if tts_result_cache else None
+    if audio_bytes is not None:
+        return audio_bytes, cache_key, "HIT"
+    audio_bytes = synthesize_audio(text, lang, output_format, sample_rate)
+    if tts_result_cache:
+        tts_result_cache.put(cache_key, audio_bytes)
+    return audio_bytes, cache_key, "MISS"
+
+@app.route('/healthz', methods=['GET'])
+def healthz():
+    """프로세스 생존 확인 (모델 상태와 무관하게 항상 200). 모델 로드/워밍업 상태를 함께 보고."""
+    return jsonify({
+        "status": "ok",
+        "pid": os.getpid(),
+        "model": {"engine": f"{STT_ENGINE}:{WHISPER_MODEL_NAME}", **model_status},
+        "admission": admission_controller.stats(),
+    })
+
+@app.route('/readyz', methods=['GET'])
+def readyz():
+    """요청 처리 준비 확인: 모델 로드와 워밍업이 끝났으면 200, 아니면 503."""
+    ready = stt_engine is not None and model_status["warm"]
+    body = {"ready": ready, "state": model_status["state"]}
+    if ready:
+        return jsonify(body)
+    response = jsonify(body)
+    response.status_code = 503
+    if model_status["state"] != "failed":
+        response.headers['Retry-After'] = str(STT_RETRY_AFTER_SECONDS)
+    return response
+
 @app.route('/generate_tts', methods=['POST'])
 def generate_tts():
     """
-    텍스트를 입력받아 gTTS와 Pydub을 이용해 TTS 오디오(WAV) 생성.
-    WAV 파일을 표준 샘플 레이트(예: 44100Hz)로 변환하여 반환.
+    텍스트를 입력받아 gTTS를 이용해 TTS 오디오 생성.
+    출력 형식은 JSON의 'format'/'sample_rate' 또는 Accept 헤더로 협상:
+      - wav: 16비트 모노 WAV (16000/22050/24000Hz, 기존 호환용 44100Hz)
+      - pcm: 헤더 없는 S16_LE 모노 PCM (8000~48000Hz 중 요청한 값)
+      - opus: Ogg Opus
+    (텍스트, 언어, 샘플 레이트, 형식)이 같은 요청은 캐시에서 바로 반환하며,
+    약한 ETag를 붙여 클라이언트가 If-None-Match로 재검증(304)할 수 있습니다.
     """
     if not request.is_json:
         return jsonify({"error": "JSON 형식 요청이 필요합니다"}), 400
@@ -52,50 +519,223 @@ def generate_tts():
     if not text:
         return jsonify({"error": "텍스트가 없습니다"}), 400
 
-    print(f"TTS 요청 수신: lang='{lang}', text='{text[:50]}...'")
+    try:
+        output_format, sample_rate = negotiate_tts_format(data)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    print(f"TTS 요청 수신: lang='{lang}', format={output_format}@{sample_rate}Hz, text='{text[:50]}...'")
+
+    cache_key = tts_cache.make_key(text, lang, sample_rate, output_format)
+    if request.if_none_match.contains_weak(cache_key):
+        print("TTS 재검증 요청: 변경 없음 (304)")
+        response = app.response_class(status=304)
+        response.set_etag(cache_key, weak=True)
+        return response
 
     try:
-        # 1. gTTS로 MP3 오디오를 메모리에 생성
-        mp3_fp = io.BytesIO()
-        tts = gTTS(text=text, lang=lang)
-        tts.write_to_fp(mp3_fp)
-        mp3_fp.seek(0)
-
-        # 2. Pydub으로 MP3를 WAV로 변환 (샘플 레이트 지정 추가!)
-        audio = AudioSegment.from_mp3(mp3_fp)
-        wav_fp = io.BytesIO()
-        # --- 수정된 부분: parameters=["-ar", str(TARGET_SAMPLE_RATE)] 추가 ---
-        # frame_rate=TARGET_SAMPLE_RATE 로 직접 지정해도 됩니다.
-        audio.export(wav_fp, format="wav", parameters=["-ar", str(TARGET_SAMPLE_RATE)])
-        # 또는: audio.export(wav_fp, format="wav", frame_rate=TARGET_SAMPLE_RATE)
-        # -------------------------------------------------------------------
-        wav_fp.seek(0)
-
-        print(f"TTS 생성 완료 (Sample Rate: {TARGET_SAMPLE_RATE} Hz).")
-
-        # 3. WAV 파일 응답 전송
-        return send_file(
-            wav_fp,
-            mimetype='audio/wav',
-            as_attachment=False
-        )
+        audio_bytes, _, cache_status = get_tts_audio(text, lang, output_format, sample_rate)
+        if cache_status == "HIT":
+            print(f"TTS 캐시 적중 ({output_format}, {sample_rate} Hz, {len(audio_bytes)} bytes).")
+        else:
+            print(f"TTS 생성 완료 ({output_format}, {sample_rate} Hz, {len(audio_bytes)} bytes).")
+
+        # 3. 오디오 응답 전송
+        # (send_file은 direct_passthrough라 전송 완료 콜백이 호출되지 않으므로 일반 응답 사용)
+        response = Response(audio_bytes, mimetype=tts_mimetype(output_format, sample_rate))
+        response.set_etag(cache_key, weak=True)
+        response.headers['X-Cache'] = cache_status
+        response.headers['X-Sample-Rate'] = str(sample_rate)
+        response.vary.add('Accept')
+        return response
 
     except Exception as e:
         print(f"TTS 생성 중 오류 발생: {e}")
         return jsonify({"error": f"TTS 생성 실패: {e}"}), 500
 
+def stream_tts_pcm(sentences, lang, sample_rate):
+    """
+    문장별로 헤더 없는 PCM을 합성(캐시)하여 순서대로 TTS_STREAM_FRAME_BYTES 단위로 내보냅니다.
+    현재 문장을 포함해 최대 TTS_STREAM_PREFETCH개 문장만 미리 합성하고, 한 문장을 다 보낸 뒤에 다음 문장을 맡깁니다.
+    클라이언트가 연결을 끊으면(GeneratorExit) 아직 시작하지 않은 합성은 취소합니다.
+    """
+    prefetch = max(1, TTS_STREAM_PREFETCH)
+    executor = ThreadPoolExecutor(max_workers=prefetch)
+    pending = deque() # 전송 순서대로 대기 중인 합성 작업
+    try:
+        next_index = 0
+        for index in range(len(sentences)):
+            while next_index < len(sentences) and len(pending) < prefetch:
+                pending.append(executor.submit(get_tts_audio, sentences[next_index], lang, "pcm", sample_rate))
+                next_index += 1
+            pcm, _, cache_status = pending[0].result()
+            print(f"  -> 문장 {index + 1}/{len(sentences)} 전송 ({cache_status}, {len(pcm)} bytes)")
+            for offset in range(0, len(pcm), TTS_STREAM_FRAME_BYTES):
+                yield pcm[offset:offset + TTS_STREAM_FRAME_BYTES]
+            pending.popleft() # 전송을 마친 뒤에야 다음 문장 합성 자리가 남
+    finally:
+        for future in pending:
+            future.cancel()
+        executor.shutdown(wait=False)
+
+@app.route('/generate_tts_stream', methods=['POST'])
+def generate_tts_stream():
+    """
+    텍스트를 문장 단위로 나누어 순서대로 합성하고, 문장이 끝날 때마다 PCM 프레임을 바로 스트리밍.
+    응답은 길이를 모르는 스트리밍용 WAV 헤더(16비트 모노) + PCM 데이터이며 ('format': 'pcm'이면 헤더 없음),
+    첫 오디오까지의 지연은 전체 응답이 아니라 첫 문장 합성 시간으로 제한됩니다.
+    다음 문장들은 현재 문장을 보내는 동안 미리 합성합니다 (TTS_STREAM_PREFETCH).
+    """
+    if not request.is_json:
+        return jsonify({"error": "JSON 형식 요청이 필요합니다"}), 400
+
+    data = request.get_json()
+    text = data.get('text')
+    lang = data.get('lang', 'ko')
+
+    if not text:
+        return jsonify({"error": "텍스트가 없습니다"}), 400
+
+    try:
+        output_format, sample_rate = negotiate_tts_format(data)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    if output_format not in ("wav", "pcm"):
+        return jsonify({"error": "스트리밍 TTS는 'wav' 또는 'pcm' 형식만 지원합니다"}), 400
+
+    sentences = text_utils.split_sentences(text)
+    print(f"스트리밍 TTS 요청 수신: lang='{lang}', format={output_format}@{sample_rate}Hz, {len(sentences)}문장, text='{text[:50]}...'")
+
+    def generate():
+        try:
+            # 문장별 PCM 앞에 스트리밍용 헤더를 한 번만 붙임
+            if output_format == "wav":
+                yield audio_utils.build_wav_header(sample_rate)
+            yield from stream_tts_pcm(sentences, lang, sample_rate)
+            print("스트리밍 TTS 전송 완료.")
+        except Exception as e:
+            # 헤더를 이미 보냈으므로 상태 코드를 바꿀 수 없음: 스트림을 끊어 클라이언트에 알림
+            print(f"스트리밍 TTS 생성 중 오류 발생: {e}")
+            raise
+
+    response = Response(stream_with_context(generate()), mimetype=tts_mimetype(output_format, sample_rate))
+    response.headers['X-Sample-Rate'] = str(sample_rate)
+    return response
+
+@app.route('/converse', methods=['POST'])
+def converse():
+    """
+    한 번의 요청으로 STT → 응답 생성(날씨 / LLM) → 스트리밍 TTS를 서버에서 이어서 처리.
+    라즈베리파이가 /stt, LLM 서버, /generate_tts로 따로 왕복하던 것을 한 번의 왕복으로 줄입니다.
+
+    요청: multipart 'audio_file' + 선택 폼 필드 'lang'(기본 ko), 'format'(wav | pcm), 'sample_rate'
+    응답: converse_protocol 프레임 스트림 - T(인식 결과) → R(응답 텍스트) → A(오디오)... → E(종료)
+          인식 결과가 너무 짧으면 T 다음 바로 E, 응답 생성/합성 중 오류는 X 프레임으로 알림.
+    """
+    if stt_engine is None:
+         return stt_unavailable_response()
+
+    # 업로드 수신: Werkzeug는 첫 request.files 접근에서 multipart 본문 전체를 받아 파싱하므로 그 접근부터 측정
+    with time_stage("stt", "upload_read"):
+        file = request.files.get('audio_file')
+        audio_bytes = file.read() if file is not None and file.filename != '' else None
+
+    if file is None:
+        return jsonify({"error": "요청에 'audio_file' 파트가 없습니다"}), 400
+
+    if file.filename == '':
+        return jsonify({"error": "오디오 파일이 선택되지 않았습니다"}), 400
+
+    lang = request.form.get('lang', 'ko')
+    try:
+        output_format, sample_rate = negotiate_tts_format(request.form)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    if output_format not in ("wav", "pcm"):
+        return jsonify({"error": "/converse는 'wav' 또는 'pcm' 형식만 지원합니다"}), 400
+
+    print(f"대화 요청 수신: filename='{file.filename}', format={output_format}@{sample_rate}Hz")
+
+    # STT까지는 응답을 시작하기 전에 처리하여 실패 시 상태 코드로 알림
+    try:
+        with time_stage("stt", "decode"):
+            audio = decode_audio_upload(audio_bytes)
+        with time_stage("stt", "inference"):
+            transcribed_text = transcribe_audio(audio)
+        record_audio_seconds("stt", len(audio) / audio_utils.WHISPER_SAMPLE_RATE)
+    except Exception as e:
+        print(f"대화 요청 STT 처리 중 오류 발생: {e}")
+        return jsonify({"error": f"STT 처리 실패: {e}"}), 500
+
+    print(f"STT 변환 완료. Text: {transcribed_text[:100]}...")
+
+    def generate():
+        yield converse_protocol.encode_json_frame(converse_protocol.FRAME_TRANSCRIPT, {"text": transcribed_text})
+        if not conversation.is_valid_stt_text(transcribed_text):
+            print("인식된 텍스트가 너무 짧거나 비어있어 응답 생성을 건너뜁니다.")
+            yield converse_protocol.encode_frame(converse_protocol.FRAME_END)
+            return
+        try:
+            with time_stage("converse", "reply"):
+                route, target_city = conversation.route_request(transcribed_text, weather_module, language_model)
+                reply_text = conversation.build_response(transcribed_text, route, target_city, weather_module, language_model)
+            print(f"생성된 응답 ({route}): '{reply_text[:50]}...'")
+            yield converse_protocol.encode_json_frame(converse_protocol.FRAME_REPLY, {
+                "text": reply_text,
+                "route": route,
+                "audio": {"format": output_format, "sample_rate": sample_rate},
+            })
+
+            if output_format == "wav":
+                yield converse_protocol.encode_frame(converse_protocol.FRAME_AUDIO, audio_utils.build_wav_header(sample_rate))
+            for chunk in stream_tts_pcm(text_utils.split_sentences(reply_text), lang, sample_rate):
+                yield converse_protocol.encode_frame(converse_protocol.FRAME_AUDIO, chunk)
+            yield converse_protocol.encode_frame(converse_protocol.FRAME_END)
+            print("대화 응답 전송 완료.")
+        except Exception as e:
+            # 헤더를 이미 보냈으므로 오류 프레임으로 알림
+            print(f"대화 응답 생성 중 오류 발생: {e}")
+            yield converse_protocol.encode_json_frame(converse_protocol.FRAME_ERROR, {"error": f"응답 생성 실패: {e}"})
+
+    response = Response(stream_with_context(generate()), mimetype=converse_protocol.MIMETYPE)
+    response.headers['X-Sample-Rate'] = str(sample_rate)
+    return response
+
+@app.route('/tts_cache/stats', methods=['GET'])
+def tts_cache_stats():
+    """TTS 캐시 적중/실패 카운터와 사용량을 반환."""
+    if tts_result_cache is None:
+        return jsonify({"enabled": False})
+    return jsonify({"enabled": True, **tts_result_cache.stats()})
+
+@app.route('/metrics', methods=['GET'])
+def prometheus_metrics():
+    """Prometheus 텍스트 형식 메트릭 (요청 수, 처리 중 요청, 단계별 지연 히스토그램, 오디오 처리 비율 등)."""
+    for service, window in audio_rate_windows.items():
+        AUDIO_RATE.set(window.rate(), service=service)
+    MODEL_READY.set(1 if stt_engine is not None else 0)
+    for field, value in admission_controller.stats().items():
+        ADMISSION_GAUGE.set(value, field=field)
+    if tts_result_cache is not None:
+        for field, value in tts_result_cache.stats().items():
+            TTS_CACHE_GAUGE.set(value, field=field)
+    return Response(metrics_registry.render(), content_type=metrics.CONTENT_TYPE)
+
 @app.route('/stt', methods=['POST'])
 def speech_to_text():
     """
     오디오 파일을 입력받아 Whisper를 이용해 STT 수행.
     """
-    if whisper_model is None:
-         return jsonify({"error": "Whisper 모델이 로드되지 않았습니다"}), 500
+    if stt_engine is None:
+         return stt_unavailable_response()
 
-    if 'audio_file' not in request.files:
-        return jsonify({"error": "요청에 'audio_file' 파트가 없습니다"}), 400
+    # 업로드 수신: Werkzeug는 첫 request.files 접근에서 multipart 본문 전체를 받아 파싱하므로 그 접근부터 측정
+    with time_stage("stt", "upload_read"):
+        file = request.files.get('audio_file')
+        audio_bytes = file.read() if file is not None and file.filename != '' else None
 
-    file = request.files['audio_file']
+    if file is None:
+        return jsonify({"error": "요청에 'audio_file' 파트가 없습니다"}), 400
 
     if file.filename == '':
         return jsonify({"error": "오디오 파일이 선택되지 않았습니다"}), 400
@@ -103,24 +743,100 @@ def speech_to_text():
     print(f"STT 요청 수신: filename='{file.filename}'")
 
     try:
-        with tempfile.NamedTemporaryFile(delete=True, suffix=os.path.splitext(file.filename)[1]) as temp_audio:
-            file.save(temp_audio.name)
-            temp_audio_path = temp_audio.name
-            print(f"오디오 파일 임시 저장: {temp_audio_path}")
-
-            # --- 수정된 부분: language='ko' 추가 ---
-            result = whisper_model.transcribe(temp_audio_path, language='ko')
-            # ------------------------------------
-            transcribed_text = result["text"]
+        # 메모리로 받은 업로드를 16kHz로 디코딩한 뒤 배치 스케줄러를 통해 인식 (language='ko')
+        with time_stage("stt", "decode"):
+            audio = decode_audio_upload(audio_bytes)
+        with time_stage("stt", "inference"):
+            transcribed_text = transcribe_audio(audio)
+        record_audio_seconds("stt", len(audio) / audio_utils.WHISPER_SAMPLE_RATE)
 
-            print(f"STT 변환 완료. Text: {transcribed_text[:100]}...")
+        print(f"STT 변환 완료. Text: {transcribed_text[:100]}...")
 
-            return jsonify({"text": transcribed_text})
+        return jsonify({"text": transcribed_text})
 
     except Exception as e:
         print(f"STT 처리 중 오류 발생: {e}")
         return jsonify({"error": f"STT 처리 실패: {e}"}), 500
 
+@app.route('/stt_stream', methods=['POST'])
+def speech_to_text_stream():
+    """
+    청크 전송(Transfer-Encoding: chunked)으로 들어오는 PCM 프레임(S16_LE, 모노)을 녹음과 동시에 받아
+    점진적으로 STT를 수행하고, 부분/최종 결과를 NDJSON 스트림으로 반환.
+    쿼리 파라미터 'rate'로 입력 샘플 레이트를 지정 (기본 16000).
+
+    응답 각 줄: {"type": "partial" | "final", "text": "..."} 또는 {"type": "error", "error": "..."}
+    """
+    if stt_engine is None:
+         return stt_unavailable_response()
+
+    try:
+        input_rate = int(request.args.get('rate', audio_utils.WHISPER_SAMPLE_RATE))
+    except ValueError:
+        return jsonify({"error": "'rate' 파라미터가 올바르지 않습니다"}), 400
+    if input_rate <= 0:
+        return jsonify({"error": "'rate' 파라미터가 올바르지 않습니다"}), 400
+
+    print(f"스트리밍 STT 요청 수신: rate={input_rate}Hz")
+    bytes_per_second = input_rate * 2
+    partial_interval_bytes = int(STT_STREAM_PARTIAL_INTERVAL * bytes_per_second)
+
+    def transcribe_pcm(pcm_bytes):
+        with time_stage("stt", "decode"):
+            audio = audio_utils.resample(audio_utils.pcm16_to_float32(pcm_bytes), input_rate)
+        with time_stage("stt", "inference"):
+            return stt_engine.transcribe(audio)
+
+    def generate():
+        pcm_buffer = bytearray()  # 아직 확정되지 않은 오디오
+        committed_text = ""       # 확정된 세그먼트 텍스트
+        pending_bytes = 0         # 마지막 부분 인식 이후 새로 들어온 바이트 수
+        total_bytes = 0
+        upload_read_seconds = 0.0 # 업로드 수신 대기 시간 합계 (클라이언트 녹음 속도에 묶임)
+        stream = request.stream
+        try:
+            while True:
+                read_started = time.perf_counter()
+                chunk = stream.read(STT_STREAM_READ_SIZE)
+                upload_read_seconds += time.perf_counter() - read_started
+                if not chunk:
+                    break
+                pcm_buffer.extend(chunk)
+                total_bytes += len(chunk)
+                pending_bytes += len(chunk)
+                if pending_bytes < partial_interval_bytes:
+                    continue
+                pending_bytes = 0
+
+                # 부분 인식: 충분히 과거에 끝난 세그먼트는 확정하고 버퍼에서 잘라내어
+                # 최종 인식 시에는 남은 꼬리 부분만 처리하도록 함
+                result = transcribe_pcm(pcm_buffer)
+                buffer_seconds = len(pcm_buffer) / bytes_per_second
+                stable = [seg for seg in result.get("segments", [])
+                          if seg["end"] < buffer_seconds - STT_STREAM_STABLE_MARGIN]
+                if stable:
+                    committed_text += "".join(seg["text"] for seg in stable)
+                    cut = int(stable[-1]["end"] * input_rate) * 2
+                    del pcm_buffer[:cut]
+                    unstable_text = "".join(seg["text"] for seg in result["segments"][len(stable):])
+                else:
+                    unstable_text = result["text"]
+                yield json.dumps({"type": "partial", "text": committed_text + unstable_text}, ensure_ascii=False) + "\n"
+
+            STAGE_DURATION.observe(upload_read_seconds, service="stt", stage="upload_read")
+            final_text = committed_text
+            if len(pcm_buffer) >= 2:
+                final_text += transcribe_pcm(pcm_buffer)["text"]
+            record_audio_seconds("stt", total_bytes / bytes_per_second)
+            print(f"스트리밍 STT 완료. Text: {final_text[:100]}...")
+            yield json.dumps({"type": "final", "text": final_text}, ensure_ascii=False) + "\n"
+
+        except Exception as e:
+            print(f"스트리밍 STT 처리 중 오류 발생: {e}")
+            yield json.dumps({"type": "error", "error": f"STT 처리 실패: {e}"}, ensure_ascii=False) + "\n"
+
+    return Response(stream_with_context(generate()), mimetype='application/x-ndjson')
+
 # --- 앱 실행 ---
 if __name__ == '__main__':
     print("Flask 서버 시작 (host: 0.0.0.0, port: 5001)...")
@@ -0,0 +1,150 @@
+# -*- coding: utf-8 -*-
+"""
+지속 오디오 출력 스트림.
+응답마다 파일(response.wav)에 저장했다가 aplay를 새로 실행하는 대신, 한 번 연 출력 스트림에
+HTTP 응답으로 받은 PCM을 받는 즉시 써서 첫 버퍼가 도착하자마자 재생을 시작합니다.
+
+  - aplay 백엔드: 'aplay -t raw' 프로세스 하나의 표준 입력 파이프에 씀 (기본, alsa-utils만 필요)
+  - sounddevice 백엔드: PortAudio RawOutputStream에 직접 씀 (pip install sounddevice)
+
+출력 형식은 S16_LE 모노, 샘플 레이트는 스트림을 만들 때 고정합니다 (서버에 같은 레이트로 TTS를 요청).
+"""
+import subprocess
+import threading
+import time
+
+# --- 설정 ---
+DEFAULT_BACKEND = "aplay"
+BACKENDS = ("aplay", "sounddevice")
+DRAIN_MARGIN_SECONDS = 0.1 # 출력 장치 버퍼에 남은 소리까지 기다리는 여유 시간
+# --- 설정 끝 ---
+
+class PCMOutputStream:
+    """
+    S16_LE 모노 PCM을 받는 지속 출력 스트림. write()는 장치가 소비하는 속도에 맞춰 막힐 수 있습니다(역압).
+
+    interrupt()는 다른 스레드에서 호출해도 되며, 아직 재생되지 않은 소리를 버리고 즉시 멈춥니다
+    (다음 write()에서 출력이 다시 열립니다).
+    """
+
+    def __init__(self, sample_rate, device=None, backend=DEFAULT_BACKEND):
+        if backend not in BACKENDS:
+            raise ValueError(f"지원하지 않는 출력 백엔드입니다: {backend} (지원: {', '.join(BACKENDS)})")
+        self.sample_rate = sample_rate
+        self.device = device
+        self.backend = backend
+        self.bytes_per_second = sample_rate * 2
+        self._lock = threading.Lock()    # 출력 열기/닫기 보호 (write 중 막힘과는 별개)
+        self._process = None             # aplay 백엔드
+        self._stream = None              # sounddevice 백엔드
+        self._remainder = b''            # 프레임(2바이트) 경계에 맞추고 남은 바이트
+        self._play_end = 0.0             # 지금까지 쓴 소리가 모두 재생될 것으로 예상되는 시각 (monotonic)
+        self._interrupted = threading.Event()
+
+    def _open(self):
+        with self._lock:
+            if self.backend == "aplay":
+                if self._process is None or self._process.poll() is not None:
+                    command = ['aplay', '-q', '-t', 'raw', '-f', 'S16_LE', '-r', str(self.sample_rate), '-c', '1']
+                    if self.device:
+                        command += ['-D', self.device]
+                    self._process = subprocess.Popen(command + ['-'], stdin=subprocess.PIPE,
+                                                     stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+                return self._process
+            if self._stream is None:
+                import sounddevice
+                self._stream = sounddevice.RawOutputStream(samplerate=self.sample_rate, channels=1, dtype='int16',
+                                                           device=self.device)
+                self._stream.start()
+            return self._stream
+
+    def start(self):
+        """출력을 미리 엽니다 (첫 응답에서 프로세스/장치를 여는 지연 제거).
+
+        Raises:
+            FileNotFoundError: aplay 명령어가 없는 경우.
+            ImportError: sounddevice 백엔드인데 패키지가 없는 경우.
+        """
+        self._open()
+        print(f"오디오 출력 스트림 시작 ({self.backend}, {self.sample_rate}Hz{', ' + self.device if self.device else ''})")
+        return self
+
+    def write(self, pcm_bytes):
+        """
+        PCM 바이트를 출력합니다 (길이 무관, 프레임 경계는 내부에서 맞춤).
+
+        Returns:
+            bool: 썼으면 True, interrupt()로 중단되었으면 False.
+        """
+        self._interrupted.clear()
+        data = self._remainder + bytes(pcm_bytes)
+        usable = len(data) - len(data) % 2
+        self._remainder = data[usable:]
+        if not usable:
+            return True
+        data = data[:usable]
+
+        now = time.monotonic()
+        self._play_end = max(now, self._play_end) + usable / self.bytes_per_second
+        output = self._open()
+        try:
+            if self.backend == "aplay":
+                output.stdin.write(data)
+                output.stdin.flush()
+            else:
+                output.write(data)
+        except (BrokenPipeError, OSError, ValueError) as e:
+            if self._interrupted.is_set():
+                return False
+            raise RuntimeError(f"오디오 출력 실패: {e}")
+        except Exception:
+            # sounddevice는 abort() 중 쓰기에서 PortAudioError를 냄
+            if self._interrupted.is_set():
+                return False
+            raise
+        return not self._interrupted.is_set()
+
+    def drain(self):
+        """
+        지금까지 쓴 소리가 재생될 때까지 기다립니다 (interrupt()되면 바로 반환).
+
+        Returns:
+            bool: 끝까지 재생되었으면 True, 중단되었으면 False.
+        """
+        remaining = self._play_end - time.monotonic()
+        if remaining > 0:
+            return not self._interrupted.wait(remaining + DRAIN_MARGIN_SECONDS)
+        return not self._interrupted.is_set()
+
+    def interrupt(self):
+        """재생 중이거나 버퍼에 남은 소리를 즉시 버립니다."""
+        self._interrupted.set()
+        self._play_end = 0.0
+        self._remainder = b''
+        with self._lock:
+            if self._process is not None:
+                self._process.kill()
+                self._process.wait()
+                self._process = None
+            if self._stream is not None:
+                try:
+                    self._stream.abort()
+                    self._stream.close()
+                finally:
+                    self._stream = None
+
+    def close(self):
+        """출력을 닫습니다 (남은 소리는 재생 후 종료)."""
+        with self._lock:
+            if self._process is not None:
+                try:
+                    self._process.stdin.close()
+                except OSError:
+                    pass
+                self._process.wait()
+                self._process = None
+            if self._stream is not None:
+                self._stream.stop()
+                self._stream.close()
+                self._stream = None
+        print("오디오 출력 스트림 종료.")
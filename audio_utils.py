@@ -0,0 +1,397 @@
+# -*- coding: utf-8 -*-
+"""
+오디오 공용 유틸리티 (PCM 변환, WAV/FLAC/Opus 인코딩·디코딩, 리샘플링).
+app.py(서버)와 main.py(라즈베리파이 클라이언트)가 함께 사용합니다.
+"""
+import io
+import math
+import struct
+import subprocess
+import numpy as np
+
+# --- 설정 ---
+WHISPER_SAMPLE_RATE = 16000 # Whisper 모델 입력 샘플 레이트
+RESAMPLE_FILTER_TAPS = 63   # 다운샘플링 전 저역 통과 필터 탭 수 (홀수)
+
+# 폴리페이즈 리샘플러 (클라이언트 업로드 전 다운샘플링)
+POLY_ZERO_CROSSINGS = 10    # 필터 한쪽의 싱크 영점 수 (클수록 천이 대역이 좁고 계산량 증가)
+POLY_ROLLOFF = 0.95         # 차단 주파수 = 목표 나이퀴스트 * rolloff
+POLY_KAISER_BETA = 8.6      # 카이저 윈도우 beta (저지 대역 감쇠 약 -80dB)
+POLY_BLOCK_SIZE = 8192      # 한 번에 계산할 출력 샘플 수 (메모리 사용량 제한)
+
+# 업로드 오디오 형식
+UPLOAD_FORMATS = ("wav", "flac", "opus")
+OPUS_UPLOAD_BITRATE = "24k" # 16kHz 음성 인식용으로 충분한 비트레이트
+
+# WAV fmt 청크 포맷 태그
+WAVE_FORMAT_PCM = 0x0001
+WAVE_FORMAT_IEEE_FLOAT = 0x0003
+WAVE_FORMAT_EXTENSIBLE = 0xFFFE
+# --- 설정 끝 ---
+
+def pcm16_to_float32(pcm_bytes):
+    """
+    16비트 리틀엔디언(S16_LE) 모노 PCM 바이트를 [-1.0, 1.0] 범위의 float32 배열로 변환합니다.
+
+    Args:
+        pcm_bytes (bytes): S16_LE PCM 데이터. 홀수 길이면 마지막 바이트는 무시합니다.
+
+    Returns:
+        np.ndarray: float32 오디오 샘플.
+    """
+    usable = len(pcm_bytes) - (len(pcm_bytes) % 2)
+    samples = np.frombuffer(memoryview(pcm_bytes)[:usable], dtype='<i2')
+    return samples.astype(np.float32) / 32768.0
+
+def float32_to_pcm16(audio):
+    """
+    [-1.0, 1.0] 범위의 float32 오디오를 16비트 리틀엔디언 PCM 바이트로 변환합니다 (범위 밖 값은 잘라냄).
+
+    Args:
+        audio (np.ndarray): float32 모노 오디오.
+
+    Returns:
+        bytes: S16_LE PCM 데이터.
+    """
+    return (np.clip(audio, -1.0, 32767 / 32768) * 32768.0).astype('<i2').tobytes()
+
+def resample(audio, orig_sr, target_sr=WHISPER_SAMPLE_RATE):
+    """
+    float32 오디오를 target_sr로 리샘플링합니다 (NumPy 벡터 연산만 사용).
+    다운샘플링 시에는 윈도우드 싱크 저역 통과 필터로 에일리어싱을 막은 뒤 선형 보간합니다.
+
+    Args:
+        audio (np.ndarray): float32 모노 오디오.
+        orig_sr (int): 원본 샘플 레이트.
+        target_sr (int): 목표 샘플 레이트.
+
+    Returns:
+        np.ndarray: 리샘플링된 float32 오디오.
+    """
+    if orig_sr == target_sr or len(audio) == 0:
+        return audio.astype(np.float32, copy=False)
+
+    if target_sr < orig_sr:
+        # 저역 통과 필터 (차단 주파수: 목표 나이퀴스트)
+        cutoff = 0.5 * target_sr / orig_sr
+        n = np.arange(RESAMPLE_FILTER_TAPS) - (RESAMPLE_FILTER_TAPS - 1) / 2
+        taps = 2 * cutoff * np.sinc(2 * cutoff * n) * np.hamming(RESAMPLE_FILTER_TAPS)
+        taps /= taps.sum()
+        audio = np.convolve(audio, taps, mode='same')
+
+    duration = len(audio) / orig_sr
+    target_len = int(round(duration * target_sr))
+    src_times = np.arange(len(audio)) / orig_sr
+    dst_times = np.arange(target_len) / target_sr
+    return np.interp(dst_times, src_times, audio).astype(np.float32)
+
+class PolyphaseResampler:
+    """
+    정수비(up/down) 폴리페이즈 FIR 리샘플러 (NumPy 벡터 연산, 청크 단위 스트리밍 가능).
+    44.1kHz → 16kHz처럼 up=160, down=441이면 출력 샘플마다 필요한 위상의 탭만 곱하므로
+    0 삽입 업샘플링 후 필터링하는 방식보다 계산량이 up배 적습니다.
+
+    process()로 청크를 넣을 때마다 지금까지 계산 가능한 출력을 돌려주고, 마지막에 flush()로 꼬리를 내보냅니다.
+    """
+
+    def __init__(self, orig_sr, target_sr=WHISPER_SAMPLE_RATE, zero_crossings=POLY_ZERO_CROSSINGS):
+        g = math.gcd(int(orig_sr), int(target_sr))
+        self.orig_sr = int(orig_sr)
+        self.target_sr = int(target_sr)
+        self.up = self.target_sr // g
+        self.down = self.orig_sr // g
+
+        # 업샘플링된 레이트 기준 저역 통과 필터 (차단: 두 나이퀴스트 중 낮은 쪽), 통과 대역 이득 = up
+        half_len = zero_crossings * max(self.up, self.down)
+        n = np.arange(-half_len, half_len + 1)
+        cutoff = POLY_ROLLOFF / (2 * max(self.up, self.down))
+        taps = 2 * cutoff * np.sinc(2 * cutoff * n) * np.kaiser(len(n), POLY_KAISER_BETA) * self.up
+        self.taps_per_phase = -(-len(taps) // self.up)
+        taps = np.concatenate([taps, np.zeros(self.taps_per_phase * self.up - len(taps))])
+        # _phases[p, j] = taps[p + j * up]: 위상 p의 출력은 입력 x[i], x[i-1], ... 에 이 탭들을 곱한 합
+        self._phases = np.ascontiguousarray(taps.reshape(self.taps_per_phase, self.up).T, dtype=np.float32)
+        self._delay = half_len # 필터 중심 (업샘플링 레이트 기준 군지연)
+
+        # 음수 인덱스 입력은 0으로 취급하도록 앞쪽에 0을 채워 둠
+        self._buffer = np.zeros(self.taps_per_phase - 1, dtype=np.float32)
+        self._buffer_start = -(self.taps_per_phase - 1) # _buffer[0]의 절대 입력 인덱스
+        self._consumed = 0                              # 지금까지 받은 입력 샘플 수
+        self._next_out = 0                              # 다음에 계산할 출력 인덱스
+
+    def process(self, audio):
+        """
+        float32 오디오 청크를 넣고, 지금까지 들어온 입력으로 계산 가능한 출력을 반환합니다.
+
+        Args:
+            audio (np.ndarray): float32 모노 오디오 (orig_sr).
+
+        Returns:
+            np.ndarray: 리샘플링된 float32 오디오 (target_sr). 필터 지연만큼 입력보다 늦게 나옵니다.
+        """
+        audio = np.asarray(audio, dtype=np.float32)
+        if self.up == self.down:
+            return audio
+        self._buffer = np.concatenate([self._buffer, audio])
+        self._consumed += len(audio)
+        # 출력 n이 필요로 하는 가장 최근 입력 인덱스 (n*down + delay) // up 가 이미 들어온 것까지만 계산
+        return self._emit((self._consumed * self.up - 1 - self._delay) // self.down + 1)
+
+    def flush(self):
+        """입력 끝 뒤를 0으로 채워 남은 출력을 모두 내보냅니다 (전체 출력 길이 = ceil(입력 길이 * up / down))."""
+        if self.up == self.down:
+            return np.zeros(0, dtype=np.float32)
+        self._buffer = np.concatenate([self._buffer, np.zeros(self._delay // self.up + 2, dtype=np.float32)])
+        return self._emit(-(-self._consumed * self.up // self.down))
+
+    def _emit(self, n_end):
+        if n_end <= self._next_out:
+            return np.zeros(0, dtype=np.float32)
+        t = np.arange(self._next_out, n_end) * self.down + self._delay
+        phase = t % self.up
+        newest = t // self.up - self._buffer_start
+        offsets = np.arange(self.taps_per_phase)
+        out = np.empty(len(t), dtype=np.float32)
+        for start in range(0, len(t), POLY_BLOCK_SIZE):
+            end = start + POLY_BLOCK_SIZE
+            window = self._buffer[newest[start:end, None] - offsets[None, :]]
+            out[start:end] = np.einsum('ij,ij->i', self._phases[phase[start:end]], window)
+        self._next_out = n_end
+
+        # 다음 출력부터 더 이상 쓰이지 않는 입력은 버림
+        keep_from = (n_end * self.down + self._delay) // self.up - (self.taps_per_phase - 1) - self._buffer_start
+        if keep_from > 0:
+            self._buffer = self._buffer[keep_from:]
+            self._buffer_start += keep_from
+        return out
+
+def resample_poly(audio, orig_sr, target_sr=WHISPER_SAMPLE_RATE):
+    """
+    float32 오디오 전체를 폴리페이즈 필터로 리샘플링합니다 (출력 길이 = ceil(입력 길이 * target_sr / orig_sr)).
+
+    Args:
+        audio (np.ndarray): float32 모노 오디오.
+        orig_sr (int): 원본 샘플 레이트.
+        target_sr (int): 목표 샘플 레이트.
+
+    Returns:
+        np.ndarray: 리샘플링된 float32 오디오.
+    """
+    if orig_sr == target_sr or len(audio) == 0:
+        return audio.astype(np.float32, copy=False)
+    resampler = PolyphaseResampler(orig_sr, target_sr)
+    return np.concatenate([resampler.process(audio), resampler.flush()])
+
+def parse_wav(wav_bytes):
+    """
+    메모리상의 WAV 데이터에서 fmt 정보와 PCM 데이터 구간을 찾습니다 (복사 없음).
+
+    Args:
+        wav_bytes (bytes): WAV 파일 전체 데이터.
+
+    Returns:
+        tuple: ((format_tag, channels, sample_rate, bits_per_sample), memoryview PCM 데이터)
+
+    Raises:
+        ValueError: WAV 형식이 아니거나 필수 청크가 없는 경우.
+    """
+    if len(wav_bytes) < 12 or wav_bytes[0:4] != b'RIFF' or wav_bytes[8:12] != b'WAVE':
+        raise ValueError("RIFF/WAVE 헤더가 아닙니다")
+
+    fmt = None
+    offset = 12
+    while offset + 8 <= len(wav_bytes):
+        chunk_id = wav_bytes[offset:offset + 4]
+        chunk_size = struct.unpack_from('<I', wav_bytes, offset + 4)[0]
+        body_start = offset + 8
+        if chunk_id == b'fmt ':
+            if chunk_size < 16:
+                raise ValueError("fmt 청크가 너무 짧습니다")
+            format_tag, channels, sample_rate, _, _, bits = struct.unpack_from('<HHIIHH', wav_bytes, body_start)
+            if format_tag == WAVE_FORMAT_EXTENSIBLE and chunk_size >= 40:
+                # SubFormat GUID의 앞 2바이트가 실제 포맷 태그
+                format_tag = struct.unpack_from('<H', wav_bytes, body_start + 24)[0]
+            fmt = (format_tag, channels, sample_rate, bits)
+        elif chunk_id == b'data':
+            if fmt is None:
+                raise ValueError("data 청크 앞에 fmt 청크가 없습니다")
+            # 스트리밍으로 기록된 WAV(arecord 파이프 등)는 크기 필드가 0 또는 최대값일 수 있음
+            if chunk_size in (0, 0xFFFFFFFF) or body_start + chunk_size > len(wav_bytes):
+                chunk_size = len(wav_bytes) - body_start
+            return fmt, memoryview(wav_bytes)[body_start:body_start + chunk_size]
+        offset = body_start + chunk_size + (chunk_size & 1) # 청크는 2바이트 정렬
+    raise ValueError("data 청크를 찾을 수 없습니다")
+
+def decode_wav(wav_bytes):
+    """
+    메모리상의 WAV 데이터를 파싱하여 float32 모노 오디오로 변환합니다 (ffmpeg/임시 파일 불필요).
+    16비트 PCM과 32비트 float 형식을 지원하며, 다채널은 평균으로 모노 변환합니다.
+
+    Args:
+        wav_bytes (bytes): WAV 파일 전체 데이터.
+
+    Returns:
+        tuple: (np.ndarray float32 오디오, int 샘플 레이트)
+
+    Raises:
+        ValueError: WAV 형식이 아니거나 지원하지 않는 인코딩인 경우.
+    """
+    fmt, data = parse_wav(wav_bytes)
+    return _pcm_to_mono_float32(data, *fmt)
+
+def build_wav_header(sample_rate, channels=1, bits=16, data_size=None):
+    """
+    PCM WAV 헤더(44바이트)를 만듭니다.
+
+    Args:
+        sample_rate (int): 샘플 레이트.
+        channels (int): 채널 수.
+        bits (int): 샘플당 비트 수.
+        data_size (int): PCM 데이터 바이트 수. None이면 길이를 모르는 스트리밍용 헤더(최대값)를 만듭니다.
+
+    Returns:
+        bytes: WAV 헤더.
+    """
+    block_align = channels * bits // 8
+    if data_size is None:
+        data_size = 0xFFFFFFFF - 36
+    riff_size = min(36 + data_size, 0xFFFFFFFF)
+    return (b'RIFF' + struct.pack('<I', riff_size) + b'WAVE'
+            + b'fmt ' + struct.pack('<IHHIIHH', 16, WAVE_FORMAT_PCM, channels, sample_rate,
+                                    sample_rate * block_align, block_align, bits)
+            + b'data' + struct.pack('<I', data_size))
+
+def _pcm_to_mono_float32(data, format_tag, channels, sample_rate, bits):
+    if format_tag == WAVE_FORMAT_PCM and bits == 16:
+        dtype, scale = '<i2', 32768.0
+    elif format_tag == WAVE_FORMAT_IEEE_FLOAT and bits == 32:
+        dtype, scale = '<f4', 1.0
+    else:
+        raise ValueError(f"지원하지 않는 WAV 인코딩입니다 (format={format_tag}, bits={bits})")
+    if channels < 1:
+        raise ValueError("채널 수가 올바르지 않습니다")
+
+    frame_bytes = channels * bits // 8
+    usable = len(data) - (len(data) % frame_bytes)
+    samples = np.frombuffer(data[:usable], dtype=dtype).astype(np.float32)
+    if scale != 1.0:
+        samples /= scale
+    if channels > 1:
+        samples = samples.reshape(-1, channels).mean(axis=1)
+    return samples, sample_rate
+
+def encode_pcm16(pcm_bytes, sample_rate, output_format="wav"):
+    """
+    S16_LE 모노 PCM을 업로드용 오디오 파일 데이터로 인코딩합니다 (메모리/파이프, 임시 파일 없음).
+    FLAC은 soundfile(libsndfile)이 있으면 프로세스 안에서, 없으면 ffmpeg로 인코딩하고 Opus는 ffmpeg(libopus)를 사용합니다.
+
+    Args:
+        pcm_bytes (bytes): S16_LE 모노 PCM 데이터.
+        sample_rate (int): 샘플 레이트.
+        output_format (str): "wav" | "flac"(무손실) | "opus"(Ogg Opus, 손실).
+
+    Returns:
+        bytes: 인코딩된 오디오 데이터.
+
+    Raises:
+        ValueError: 지원하지 않는 형식인 경우.
+        RuntimeError: ffmpeg 실행 또는 인코딩에 실패한 경우.
+    """
+    if output_format == "wav":
+        return build_wav_header(sample_rate, data_size=len(pcm_bytes)) + bytes(pcm_bytes)
+    if output_format == "flac":
+        try:
+            import soundfile
+        except ImportError:
+            return _encode_pcm16_with_ffmpeg(pcm_bytes, sample_rate, ['-c:a', 'flac', '-f', 'flac'])
+        samples = np.frombuffer(pcm_bytes, dtype='<i2', count=len(pcm_bytes) // 2)
+        buffer = io.BytesIO()
+        soundfile.write(buffer, samples, sample_rate, format='FLAC', subtype='PCM_16')
+        return buffer.getvalue()
+    if output_format == "opus":
+        return _encode_pcm16_with_ffmpeg(pcm_bytes, sample_rate,
+                                         ['-c:a', 'libopus', '-b:a', OPUS_UPLOAD_BITRATE, '-application', 'voip', '-f', 'ogg'])
+    raise ValueError(f"지원하지 않는 업로드 형식입니다: {output_format} (지원: {', '.join(UPLOAD_FORMATS)})")
+
+def _encode_pcm16_with_ffmpeg(pcm_bytes, sample_rate, output_args):
+    command = ['ffmpeg', '-nostdin', '-f', 's16le', '-ar', str(sample_rate), '-ac', '1', '-i', 'pipe:0'] + output_args + ['pipe:1']
+    try:
+        result = subprocess.run(command, input=bytes(pcm_bytes), capture_output=True, check=True)
+    except FileNotFoundError:
+        raise RuntimeError("ffmpeg를 찾을 수 없습니다. ffmpeg를 설치하거나 UPLOAD_FORMAT=wav를 사용하세요.")
+    except subprocess.CalledProcessError as e:
+        raise RuntimeError(f"ffmpeg 인코딩 실패: {e.stderr.decode(errors='replace').strip()[-200:]}")
+    return result.stdout
+
+def is_flac_or_ogg(audio_bytes):
+    """FLAC('fLaC') 또는 Ogg('OggS', Opus/Vorbis) 데이터인지 시그니처로 확인합니다."""
+    return audio_bytes[:4] in (b'fLaC', b'OggS')
+
+def decode_with_soundfile(audio_bytes):
+    """
+    FLAC / Ogg(Opus, Vorbis) 데이터를 soundfile(libsndfile)로 프로세스 안에서 디코딩합니다 (ffmpeg 프로세스 없음).
+    Ogg Opus는 libsndfile 1.0.29 이상이 필요합니다.
+
+    Args:
+        audio_bytes (bytes): 인코딩된 오디오 데이터.
+
+    Returns:
+        tuple: (np.ndarray float32 모노 오디오, int 샘플 레이트)
+
+    Raises:
+        ImportError: soundfile이 설치되어 있지 않은 경우.
+        RuntimeError: libsndfile이 디코딩하지 못한 경우.
+    """
+    import soundfile
+    samples, sample_rate = soundfile.read(io.BytesIO(audio_bytes), dtype='float32', always_2d=True)
+    if samples.shape[1] > 1:
+        return samples.mean(axis=1), sample_rate
+    return samples[:, 0], sample_rate
+
+def decode_with_ffmpeg(audio_bytes, target_sr=WHISPER_SAMPLE_RATE):
+    """
+    WAV 외 형식(MP3, FLAC, OGG 등)을 ffmpeg 파이프(stdin/stdout)로 디코딩합니다 (임시 파일 없음).
+
+    Args:
+        audio_bytes (bytes): 인코딩된 오디오 데이터.
+        target_sr (int): 출력 샘플 레이트.
+
+    Returns:
+        np.ndarray: float32 모노 오디오.
+
+    Raises:
+        RuntimeError: ffmpeg 실행 또는 디코딩에 실패한 경우.
+    """
+    command = ['ffmpeg', '-nostdin', '-threads', '0', '-i', 'pipe:0',
+               '-f', 's16le', '-ac', '1', '-acodec', 'pcm_s16le', '-ar', str(target_sr), 'pipe:1']
+    try:
+        result = subprocess.run(command, input=audio_bytes, capture_output=True, check=True)
+    except FileNotFoundError:
+        raise RuntimeError("ffmpeg를 찾을 수 없습니다. ffmpeg를 설치하고 PATH에 추가해주세요.")
+    except subprocess.CalledProcessError as e:
+        raise RuntimeError(f"ffmpeg 디코딩 실패: {e.stderr.decode(errors='replace').strip()[-200:]}")
+    return pcm16_to_float32(result.stdout)
+
+def encode_opus_with_ffmpeg(audio_bytes, sample_rate=24000, bitrate="24k"):
+    """
+    인코딩된 오디오(MP3 등)를 ffmpeg 한 번으로 Ogg Opus 모노로 트랜스코딩합니다 (파이프 입출력).
+
+    Args:
+        audio_bytes (bytes): 입력 오디오 데이터.
+        sample_rate (int): Opus 입력 샘플 레이트 (8000/12000/16000/24000/48000).
+        bitrate (str): 목표 비트레이트 (예: "24k").
+
+    Returns:
+        bytes: Ogg Opus 데이터.
+
+    Raises:
+        RuntimeError: ffmpeg 실행 또는 인코딩에 실패한 경우.
+    """
+    command = ['ffmpeg', '-nostdin', '-i', 'pipe:0', '-ac', '1', '-ar', str(sample_rate),
+               '-c:a', 'libopus', '-b:a', bitrate, '-application', 'voip', '-f', 'ogg', 'pipe:1']
+    try:
+        result = subprocess.run(command, input=audio_bytes, capture_output=True, check=True)
+    except FileNotFoundError:
+        raise RuntimeError("ffmpeg를 찾을 수 없습니다. ffmpeg를 설치하고 PATH에 추가해주세요.")
+    except subprocess.CalledProcessError as e:
+        raise RuntimeError(f"ffmpeg Opus 인코딩 실패: {e.stderr.decode(errors='replace').strip()[-200:]}")
+    return result.stdout
@@ -0,0 +1,145 @@
+# -*- coding: utf-8 -*-
+"""
+끼어들기(barge-in) 감지와 턴 취소.
+응답을 생성하거나 재생하는 동안 상시 캡처 오디오를 감시하다가 사용자가 말을 시작하면(또는 호출어를 말하면)
+CancelToken을 취소합니다. 토큰에 등록된 콜백이 재생 중인 aplay를 종료하고 진행 중인 HTTP 응답을 닫으므로
+main.py는 긴 응답이 끝날 때까지 기다리지 않고 바로 다음 녹음으로 넘어갑니다.
+
+주의: 에코 제거(AEC)가 없으므로 스피커 소리가 마이크로 크게 들어오는 환경에서는
+VAD 방식 대신 호출어 방식(WAKE_WORD_ENABLED=1)을 사용하세요.
+"""
+import threading
+
+import audio_utils
+import vad
+
+# --- 설정 ---
+DEFAULT_THRESHOLD_DB = 15.0     # 배경 잡음 대비 이 이상 커야 끼어들기 후보 (녹음 VAD보다 높게: 재생 소리 오검출 방지)
+DEFAULT_MIN_SPEECH_MS = 200     # 이만큼 음성 프레임이 연속되면 끼어들기로 판정
+DEFAULT_PRE_ROLL_MS = vad.DEFAULT_PRE_ROLL_MS # 다음 녹음에 포함할 발화 시작 전 오디오
+POLL_SECONDS = 0.05             # 캡처 버퍼 대기 주기 (모니터 종료 반응 시간)
+# --- 설정 끝 ---
+
+class CancelToken:
+    """한 턴의 취소 신호. cancel()이 호출되면 등록된 콜백(재생 종료, 응답 닫기 등)을 모두 실행합니다. 스레드 안전합니다."""
+
+    def __init__(self):
+        self._event = threading.Event()
+        self._lock = threading.Lock()
+        self._callbacks = []
+
+    @property
+    def cancelled(self):
+        return self._event.is_set()
+
+    def cancel(self):
+        """취소하고 등록된 콜백을 실행합니다 (이미 취소되었으면 무시)."""
+        with self._lock:
+            if self._event.is_set():
+                return
+            self._event.set()
+            callbacks, self._callbacks = self._callbacks, []
+        for callback in callbacks:
+            try:
+                callback()
+            except Exception as e:
+                print(f"경고: 취소 콜백 실행 중 오류: {e}")
+
+    def on_cancel(self, callback):
+        """
+        취소 시 실행할 콜백을 등록합니다. 이미 취소되었으면 바로 실행합니다.
+
+        Returns:
+            callable: remove()에 넘길 등록 핸들 (callback 그대로).
+        """
+        with self._lock:
+            if not self._event.is_set():
+                self._callbacks.append(callback)
+                return callback
+        callback()
+        return callback
+
+    def remove(self, callback):
+        """on_cancel()로 등록한 콜백을 해제합니다 (작업이 정상적으로 끝났을 때)."""
+        with self._lock:
+            if callback in self._callbacks:
+                self._callbacks.remove(callback)
+
+    def wait(self, timeout=None):
+        """취소될 때까지 최대 timeout초 기다립니다. 취소되었으면 True."""
+        return self._event.wait(timeout)
+
+class SpeechOnsetDetector:
+    """
+    발화 시작만 빠르게 판정하는 VAD (끼어들기용).
+    feed()가 True를 반환하면 lookback_samples만큼 앞에서 발화가 시작된 것입니다 (프리롤 포함).
+    """
+
+    def __init__(self, sample_rate, threshold_db=DEFAULT_THRESHOLD_DB, min_speech_ms=DEFAULT_MIN_SPEECH_MS,
+                 pre_roll_ms=DEFAULT_PRE_ROLL_MS):
+        self.vad = vad.FrameVAD(sample_rate, threshold_db=threshold_db)
+        self.frame_bytes = self.vad.frame_samples * 2
+        frame_ms = self.vad.frame_samples * 1000.0 / sample_rate
+        self._onset_frames = max(1, int(round(min_speech_ms / frame_ms)))
+        self.lookback_samples = self._onset_frames * self.vad.frame_samples + int(sample_rate * pre_roll_ms / 1000)
+        self._pending = b''
+        self._speech_run = 0
+
+    def feed(self, pcm_bytes):
+        data = self._pending + pcm_bytes
+        usable = len(data) - len(data) % self.frame_bytes
+        self._pending = data[usable:]
+        for offset in range(0, usable, self.frame_bytes):
+            frame = audio_utils.pcm16_to_float32(data[offset:offset + self.frame_bytes])
+            self._speech_run = self._speech_run + 1 if self.vad.is_speech(frame) else 0
+            if self._speech_run >= self._onset_frames:
+                self._speech_run = 0
+                return True
+        return False
+
+class BargeInMonitor:
+    """
+    상시 캡처 스트림을 백그라운드 스레드에서 감시하며 detector.feed()가 True를 반환하면 token을 취소합니다.
+
+    detector는 feed(pcm_bytes) -> bool을 가진 객체입니다 (SpeechOnsetDetector, wake_word.WakeWordDetector 등).
+    detector에 lookback_samples가 있으면 그만큼 앞을 다음 녹음 시작 위치(resume_position)로 잡습니다.
+    """
+
+    def __init__(self, capture, detector, token=None):
+        self.capture = capture
+        self.detector = detector
+        self.token = token or CancelToken()
+        self.resume_position = None # 끼어들기 발화가 시작된 캡처 위치 (감지되지 않았으면 None)
+        self._stopped = threading.Event()
+        self._thread = None
+
+    def start(self):
+        """감시를 시작합니다 (캡처의 현재 위치부터)."""
+        start = self.capture.position
+        self._thread = threading.Thread(target=self._run, args=(start,), name="barge-in-monitor", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        """
+        감시를 멈춥니다.
+
+        Returns:
+            int: 끼어들기가 감지되었으면 다음 녹음을 시작할 캡처 위치, 아니면 None.
+        """
+        self._stopped.set()
+        if self._thread is not None:
+            self._thread.join(timeout=1)
+        return self.resume_position
+
+    def _run(self, position):
+        start = position
+        while not self._stopped.is_set() and not self.token.cancelled:
+            data, position = self.capture.read(position, timeout=POLL_SECONDS)
+            if not data or not self.detector.feed(data):
+                continue
+            lookback = getattr(self.detector, "lookback_samples", 0) * 2
+            self.resume_position = max(start, position - lookback)
+            print("[barge-in] 사용자 발화 감지 - 응답을 중단합니다.")
+            self.token.cancel()
+            return
@@ -0,0 +1,383 @@
+# -*- coding: utf-8 -*-
+"""
+PC 서버(app.py / serve.py) 부하 테스트.
+녹음된 WAV 발화 디렉토리와 텍스트 코퍼스를 /stt, /generate_tts에 반복해서 보내며 서버 한 대가 감당하는 처리량을 잽니다.
+
+부하 방식:
+  - 폐쇄형(closed loop, --concurrency): 클라이언트 N개가 응답을 받자마자 다음 요청을 보냄.
+    '1,2,4,8'처럼 여러 값을 주면 단계마다 --step-duration초씩 늘려 가며 측정합니다.
+  - 개방형(open loop, --rate / --profile): 응답과 무관하게 정해진 도착률(요청/초)로 요청을 보냄 (기본 포아송 도착).
+    --profile '30:1,60:1-8,30:8'은 '지속 시간:도착률' 단계 목록이며 '1-8'은 단계 동안 도착률을 선형으로 올립니다.
+    지연 시간은 예정된 도착 시각부터 재므로 서버가 밀려도 측정이 낙관적으로 치우치지 않습니다(coordinated omission 방지).
+
+결과 (단계 / 엔드포인트별):
+  - 처리량(성공 응답/초), 지연 시간 p50/p95/p99, 오류율, 429 비율
+  - RTF: STT는 처리 시간 / 입력 오디오 길이, TTS는 처리 시간 / 생성된 오디오 길이
+  - --slo-p99 를 지키는 최대 처리량과 --client-interval(Pi 한 대의 요청 간격)로 추정한 Pi 클라이언트 수
+
+재시도는 하지 않습니다 (http_client의 재시도 대신 응답을 그대로 집계).
+
+사용 예:
+    python benchmark_load.py --server http://127.0.0.1:5000 --audio-dir bench_audio --concurrency 1,2,4,8
+    python benchmark_load.py --server http://127.0.0.1:5000 --audio-dir bench_audio --text-file corpus.txt \\
+        --endpoint mix --profile 30:1,120:1-10 --output load.json
+"""
+import argparse
+import concurrent.futures
+import json
+import os
+import random
+import statistics
+import threading
+import time
+
+import requests
+
+import audio_utils
+import tracing
+
+# --- 설정 ---
+DEFAULT_TEXTS = (
+    "안녕하세요, 무엇을 도와드릴까요?",
+    "오늘 서울의 날씨는 맑고 기온은 이십 도입니다.",
+    "좋은 질문이에요. 조금 더 자세히 설명해 드릴게요.",
+    "알람을 오전 일곱 시로 맞춰 두었습니다.",
+)
+DEFAULT_SLO_P99 = 2.0          # 처리 가능 판정에 쓰는 p99 지연 시간 상한 (초)
+DEFAULT_MAX_ERROR_RATE = 0.01  # 처리 가능 판정에 쓰는 오류율(429 포함) 상한
+DEFAULT_CLIENT_INTERVAL = 20.0 # Pi 한 대가 STT/TTS 요청을 보내는 평균 간격 (초, 클라이언트 수 추정용)
+REQUEST_TIMEOUT = (5, 60)      # (연결, 읽기) 초
+PERCENTILES = (50, 95, 99)
+# --- 설정 끝 ---
+
+def load_audio_corpus(audio_dir):
+    """디렉토리의 WAV 파일을 이름 순으로 읽어 (파일명, 원본 바이트, 길이 초) 리스트로 반환합니다."""
+    corpus = []
+    for name in sorted(os.listdir(audio_dir)):
+        if not name.lower().endswith('.wav'):
+            continue
+        with open(os.path.join(audio_dir, name), 'rb') as f:
+            wav_bytes = f.read()
+        audio, sample_rate = audio_utils.decode_wav(wav_bytes)
+        corpus.append((name, wav_bytes, len(audio) / sample_rate))
+    return corpus
+
+def load_text_corpus(path):
+    """텍스트 파일의 비어 있지 않은 줄 목록 (없으면 기본 문장)."""
+    if not path:
+        return list(DEFAULT_TEXTS)
+    with open(path, encoding='utf-8') as f:
+        return [line.strip() for line in f if line.strip()]
+
+def parse_profile(text):
+    """
+    '30:1,60:1-8' 형식의 개방형 부하 단계 목록을 해석합니다.
+
+    Returns:
+        list: [(지속 시간 초, 시작 도착률, 끝 도착률)]
+    """
+    stages = []
+    for part in text.split(','):
+        duration, _, rate = part.strip().partition(':')
+        start, _, end = rate.partition('-')
+        if not duration or not start:
+            raise ValueError(f"부하 단계 형식이 올바르지 않습니다: '{part}' (예: 30:2 또는 60:1-8)")
+        stages.append((float(duration), float(start), float(end or start)))
+    return stages
+
+class RequestFactory:
+    """코퍼스를 순환하며 엔드포인트 요청을 보냅니다. 스레드마다 별도 세션(연결 재사용)을 씁니다."""
+
+    def __init__(self, server_url, audio_corpus, texts, endpoint="stt", tts_ratio=0.5, tts_format="pcm",
+                 tts_sample_rate=24000, unique_text=False):
+        self.server_url = server_url.rstrip('/')
+        self.audio_corpus = audio_corpus
+        self.texts = texts
+        self.endpoint = endpoint
+        self.tts_ratio = tts_ratio
+        self.tts_format = tts_format
+        self.tts_sample_rate = tts_sample_rate
+        self.unique_text = unique_text
+        self._counter = 0
+        self._lock = threading.Lock()
+        self._local = threading.local()
+
+    def _session(self):
+        session = getattr(self._local, "session", None)
+        if session is None:
+            session = self._local.session = requests.Session()
+        return session
+
+    def _next_index(self):
+        with self._lock:
+            self._counter += 1
+            return self._counter
+
+    def pick(self):
+        """다음 요청의 엔드포인트 ('stt' 또는 'tts')."""
+        if self.endpoint == "mix":
+            return "tts" if random.random() < self.tts_ratio else "stt"
+        return self.endpoint
+
+    def send(self, endpoint):
+        """
+        요청 하나를 보내고 결과를 반환합니다 (예외는 오류 결과로 변환).
+
+        Returns:
+            dict: status(예외면 None), error, audio_seconds(RTF 분모), cache(TTS X-Cache).
+        """
+        index = self._next_index()
+        result = {"endpoint": endpoint, "status": None, "error": None, "audio_seconds": 0.0, "cache": None}
+        try:
+            if endpoint == "stt":
+                name, wav_bytes, duration = self.audio_corpus[index % len(self.audio_corpus)]
+                result["audio_seconds"] = duration
+                response = self._session().post(f"{self.server_url}/stt", files={'audio_file': (name, wav_bytes)},
+                                                timeout=REQUEST_TIMEOUT)
+                result["status"] = response.status_code
+                if response.ok:
+                    response.json()
+            else:
+                text = self.texts[index % len(self.texts)]
+                if self.unique_text:
+                    text = f"{text} ({index})" # 서버 TTS 캐시를 우회
+                response = self._session().post(f"{self.server_url}/generate_tts", timeout=REQUEST_TIMEOUT, json={
+                    "text": text, "lang": "ko", "format": self.tts_format, "sample_rate": self.tts_sample_rate})
+                result["status"] = response.status_code
+                result["cache"] = response.headers.get("X-Cache")
+                if response.ok:
+                    result["audio_seconds"] = self._tts_seconds(response)
+            if not response.ok:
+                result["error"] = f"HTTP {response.status_code}"
+        except requests.exceptions.RequestException as e:
+            result["error"] = type(e).__name__
+        return result
+
+    def _tts_seconds(self, response):
+        if self.tts_format == "wav":
+            (_, channels, sample_rate, bits), data = audio_utils.parse_wav(response.content)
+            return len(data) / (sample_rate * channels * bits // 8)
+        sample_rate = int(response.headers.get("X-Sample-Rate", self.tts_sample_rate))
+        return len(response.content) / (sample_rate * 2)
+
+def _timed(factory, endpoint, scheduled, step):
+    started = time.monotonic()
+    result = factory.send(endpoint)
+    finished = time.monotonic()
+    result.update(step=step, scheduled=scheduled, started=started, finished=finished,
+                  latency=finished - scheduled, queue_delay=started - scheduled)
+    return result
+
+def run_closed_loop(factory, concurrency_levels, step_duration, think_time=0.0):
+    """
+    단계마다 클라이언트 N개가 step_duration초 동안 응답을 받자마자 다음 요청을 보냅니다.
+
+    Returns:
+        tuple: (요청 결과 리스트, [(단계 이름, 단계 길이 초)])
+    """
+    results = []
+    steps = []
+    lock = threading.Lock()
+    for step, concurrency in enumerate(concurrency_levels):
+        label = f"동시 {concurrency}"
+        print(f"[{label}] {step_duration:.0f}초 측정 중...")
+        deadline = time.monotonic() + step_duration
+
+        def client():
+            while time.monotonic() < deadline:
+                result = _timed(factory, factory.pick(), time.monotonic(), step)
+                with lock:
+                    results.append(result)
+                if think_time > 0:
+                    time.sleep(random.expovariate(1.0 / think_time))
+
+        threads = [threading.Thread(target=client, name=f"load-client-{i}", daemon=True) for i in range(concurrency)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        steps.append((label, step_duration))
+    return results, steps
+
+def arrival_times(stages, poisson=True):
+    """
+    부하 단계 목록에 따른 도착 시각(시작 기준 초)을 만듭니다.
+
+    Yields:
+        tuple: (단계 번호, 도착 시각)
+    """
+    offset = 0.0
+    for step, (duration, start_rate, end_rate) in enumerate(stages):
+        t = 0.0
+        while True:
+            rate = start_rate + (end_rate - start_rate) * t / duration # 현재 시점의 도착률 (선형 램프)
+            if rate <= 0:
+                break
+            t += random.expovariate(rate) if poisson else 1.0 / rate
+            if t >= duration:
+                break
+            yield step, offset + t
+        offset += duration
+
+def run_open_loop(factory, stages, max_inflight, poisson=True):
+    """
+    정해진 도착률로 요청을 보냅니다. 동시 요청이 max_inflight를 넘으면 클라이언트 쪽에서 대기하며,
+    이 대기도 지연 시간에 포함됩니다 (queue_delay로 따로 보고).
+
+    Returns:
+        tuple: (요청 결과 리스트, [(단계 이름, 단계 길이 초)])
+    """
+    steps = [(f"{start:g}/s" if start == end else f"{start:g}→{end:g}/s", duration) for duration, start, end in stages]
+    futures = []
+    current_step = -1
+    with concurrent.futures.ThreadPoolExecutor(max_workers=max_inflight, thread_name_prefix="load") as executor:
+        origin = time.monotonic()
+        for step, at in arrival_times(stages, poisson):
+            if step != current_step:
+                current_step = step
+                print(f"[{steps[step][0]}] {steps[step][1]:.0f}초 측정 중...")
+            scheduled = origin + at
+            delay = scheduled - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+            futures.append(executor.submit(_timed, factory, factory.pick(), scheduled, step))
+        remaining = origin + sum(duration for duration, _, _ in stages) - time.monotonic()
+        if remaining > 0:
+            time.sleep(remaining) # 마지막 단계의 남은 시간 (도착이 없는 구간)
+    return [future.result() for future in futures], steps
+
+# --- 집계 ---
+def _percentiles(values):
+    values = sorted(values)
+    return {p: tracing.percentile(values, p) for p in PERCENTILES}
+
+def summarize_step(results, duration):
+    """한 단계 / 엔드포인트의 결과 요약."""
+    ok = [r for r in results if r["error"] is None]
+    rejected = sum(1 for r in results if r["status"] == 429)
+    rtf = [r["latency"] / r["audio_seconds"] for r in ok if r["audio_seconds"] > 0]
+    cached = [r for r in ok if r["cache"] is not None]
+    return {
+        "requests": len(results),
+        "ok": len(ok),
+        "throughput": len(ok) / duration if duration > 0 else 0.0,
+        "latency": _percentiles([r["latency"] for r in ok]),
+        "queue_delay_p99": _percentiles([r["queue_delay"] for r in results])[99],
+        "error_rate": (len(results) - len(ok)) / len(results) if results else 0.0,
+        "rate_429": rejected / len(results) if results else 0.0,
+        "errors": dict(sorted({r["error"]: sum(1 for x in results if x["error"] == r["error"])
+                               for r in results if r["error"]}.items())),
+        "rtf_p50": statistics.median(rtf) if rtf else None,
+        "audio_per_second": sum(r["audio_seconds"] for r in ok) / duration if duration > 0 else 0.0,
+        "cache_hit_rate": sum(1 for r in cached if r["cache"] == "HIT") / len(cached) if cached else None,
+    }
+
+def summarize(results, steps, slo_p99=DEFAULT_SLO_P99, max_error_rate=DEFAULT_MAX_ERROR_RATE):
+    """
+    단계 / 엔드포인트별 요약과 SLO를 지킨 최대 처리량을 계산합니다.
+
+    Returns:
+        dict: {"steps": [{"step", "duration", "endpoints": {엔드포인트: 요약}, "within_slo"}], "capacity": 요청/초}
+    """
+    rows = []
+    capacity = 0.0
+    for index, (label, duration) in enumerate(steps):
+        step_results = [r for r in results if r["step"] == index]
+        endpoints = {"all": summarize_step(step_results, duration)}
+        for endpoint in sorted({r["endpoint"] for r in step_results}):
+            endpoints[endpoint] = summarize_step([r for r in step_results if r["endpoint"] == endpoint], duration)
+        total = endpoints["all"]
+        within = bool(total["ok"]) and total["latency"][99] <= slo_p99 and total["error_rate"] <= max_error_rate
+        if within:
+            capacity = max(capacity, total["throughput"])
+        rows.append({"step": label, "duration": duration, "endpoints": endpoints, "within_slo": within})
+    return {"steps": rows, "capacity": capacity}
+
+def _fmt(value, spec=">7.2f"):
+    return format(value, spec) if value is not None else f"{'-':>{spec[1:].split('.')[0]}}"
+
+def print_report(summary, slo_p99, client_interval):
+    print("\n=== 부하 테스트 결과 (지연 시간 초, 도착 예정 시각 기준) ===")
+    print(f"{'단계':<14} {'대상':<5} {'요청':>6} {'처리량/s':>8} {'p50':>7} {'p95':>7} {'p99':>7} "
+          f"{'오류율':>7} {'429':>6} {'RTF':>6} {'대기p99':>7}  SLO")
+    for row in summary["steps"]:
+        endpoints = list(row["endpoints"].items())
+        if len(endpoints) == 2:
+            endpoints = endpoints[1:] # 엔드포인트가 하나면 합계 행 생략
+        for index, (endpoint, stats) in enumerate(endpoints):
+            latency = stats["latency"]
+            slo = ("OK" if row["within_slo"] else "초과") if index == 0 else ""
+            print(f"{row['step']:<14} {endpoint:<5} {stats['requests']:>6} {stats['throughput']:>8.2f} "
+                  f"{_fmt(latency[50])} {_fmt(latency[95])} {_fmt(latency[99])} {stats['error_rate']:>7.1%} "
+                  f"{stats['rate_429']:>6.1%} {_fmt(stats['rtf_p50'], '>6.2f')} {_fmt(stats['queue_delay_p99'])}  {slo}")
+            if stats["errors"]:
+                print(f"{'':<14} {'':<5} 오류: " + ", ".join(f"{error} {count}개" for error, count in stats["errors"].items()))
+    capacity = summary["capacity"]
+    print(f"\np99 ≤ {slo_p99:g}s 를 지킨 최대 처리량: {capacity:.2f} 요청/초")
+    if capacity > 0:
+        print(f"Pi 한 대가 평균 {client_interval:g}초마다 요청한다면 약 {int(capacity * client_interval)}대까지 감당 가능")
+
+def main():
+    parser = argparse.ArgumentParser(description="PC 서버 /stt, /generate_tts 부하 테스트")
+    parser.add_argument('--server', default="http://127.0.0.1:5000", help="PC 서버 주소")
+    parser.add_argument('--audio-dir', help="STT에 보낼 WAV 발화 디렉토리 (stt/mix에 필요)")
+    parser.add_argument('--text-file', help="TTS에 보낼 문장 파일 (한 줄에 한 문장, 없으면 기본 문장)")
+    parser.add_argument('--endpoint', choices=("stt", "tts", "mix"), default="stt", help="부하 대상")
+    parser.add_argument('--tts-ratio', type=float, default=0.5, help="mix일 때 TTS 요청 비율")
+    parser.add_argument('--tts-format', choices=("pcm", "wav"), default="pcm", help="TTS 요청 형식")
+    parser.add_argument('--tts-sample-rate', type=int, default=24000, help="TTS 요청 샘플 레이트")
+    parser.add_argument('--unique-text', action='store_true', help="문장마다 번호를 붙여 서버 TTS 캐시를 우회")
+    parser.add_argument('--concurrency', default="1", help="폐쇄형 부하 클라이언트 수 (쉼표로 여러 단계, 예: 1,2,4,8)")
+    parser.add_argument('--step-duration', type=float, default=30.0, help="폐쇄형 단계 / --rate 측정 시간 (초)")
+    parser.add_argument('--think-time', type=float, default=0.0, help="폐쇄형 클라이언트의 요청 사이 평균 대기 (초)")
+    parser.add_argument('--rate', type=float, help="개방형 부하: 고정 도착률 (요청/초)")
+    parser.add_argument('--profile', help="개방형 부하: '지속 시간:도착률[-끝 도착률]' 단계 목록 (예: 30:1,60:1-8)")
+    parser.add_argument('--uniform', action='store_true', help="개방형 도착 간격을 포아송 대신 일정하게")
+    parser.add_argument('--max-inflight', type=int, default=64, help="개방형 부하의 최대 동시 요청 수 (클라이언트 쪽)")
+    parser.add_argument('--warmup', type=int, default=2, help="측정 전 엔드포인트별 워밍업 요청 수")
+    parser.add_argument('--slo-p99', type=float, default=DEFAULT_SLO_P99, help="처리 가능 판정 p99 상한 (초)")
+    parser.add_argument('--max-error-rate', type=float, default=DEFAULT_MAX_ERROR_RATE, help="처리 가능 판정 오류율 상한")
+    parser.add_argument('--client-interval', type=float, default=DEFAULT_CLIENT_INTERVAL,
+                        help="Pi 한 대의 평균 요청 간격 (초, 클라이언트 수 추정용)")
+    parser.add_argument('--seed', type=int, default=0, help="도착 시각 / 요청 선택 난수 시드")
+    parser.add_argument('--output', help="결과 JSON 저장 경로")
+    args = parser.parse_args()
+    random.seed(args.seed)
+
+    audio_corpus = []
+    if args.endpoint in ("stt", "mix"):
+        if not args.audio_dir:
+            parser.error("stt/mix 부하에는 --audio-dir 가 필요합니다")
+        audio_corpus = load_audio_corpus(args.audio_dir)
+        if not audio_corpus:
+            print(f"오류: '{args.audio_dir}'에 WAV 파일이 없습니다.")
+            return
+        print(f"발화 코퍼스: {len(audio_corpus)}개 파일, 총 {sum(d for _, _, d in audio_corpus):.1f}초")
+    texts = load_text_corpus(args.text_file)
+    factory = RequestFactory(args.server, audio_corpus, texts, args.endpoint, args.tts_ratio, args.tts_format,
+                             args.tts_sample_rate, args.unique_text)
+
+    endpoints = ("stt", "tts") if args.endpoint == "mix" else (args.endpoint,)
+    for endpoint in endpoints:
+        for _ in range(args.warmup):
+            result = factory.send(endpoint)
+            if result["error"]:
+                print(f"경고: {endpoint} 워밍업 요청 실패 ({result['error']})")
+
+    if args.profile or args.rate:
+        stages = parse_profile(args.profile) if args.profile else [(args.step_duration, args.rate, args.rate)]
+        results, steps = run_open_loop(factory, stages, args.max_inflight, poisson=not args.uniform)
+    else:
+        levels = [int(level) for level in args.concurrency.split(',')]
+        results, steps = run_closed_loop(factory, levels, args.step_duration, args.think_time)
+
+    summary = summarize(results, steps, args.slo_p99, args.max_error_rate)
+    print_report(summary, args.slo_p99, args.client_interval)
+    if args.output:
+        os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump({"server": args.server, "scenario": vars(args), **summary}, f, ensure_ascii=False, indent=2)
+        print(f"결과 저장: {args.output}")
+
+if __name__ == "__main__":
+    main()
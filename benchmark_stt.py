@@ -0,0 +1,107 @@
+# -*- coding: utf-8 -*-
+"""
+STT 백엔드 실시간 계수(RTF) 비교 벤치마크.
+고정된 WAV 오디오 세트를 각 백엔드로 인식시키고, 처리 시간 / 오디오 길이(RTF)를 비교합니다.
+RTF가 1보다 작을수록 실시간보다 빠릅니다.
+
+사용 예:
+    python benchmark_stt.py --audio-dir bench_audio \\
+        --engine whisper:small --engine faster-whisper:small --threads 4 --beam-size 1
+"""
+import argparse
+import os
+import statistics
+import time
+
+import audio_utils
+import stt_engines
+
+def load_audio_set(audio_dir):
+    """디렉토리의 WAV 파일을 이름 순으로 읽어 (파일명, 16kHz 오디오) 리스트로 반환합니다."""
+    audio_set = []
+    for name in sorted(os.listdir(audio_dir)):
+        if not name.lower().endswith('.wav'):
+            continue
+        with open(os.path.join(audio_dir, name), 'rb') as f:
+            audio, sample_rate = audio_utils.decode_wav(f.read())
+        audio_set.append((name, audio_utils.resample(audio, sample_rate)))
+    return audio_set
+
+def benchmark_engine(engine, audio_set, repeat):
+    """
+    엔진 하나로 오디오 세트를 repeat회 인식하고 결과를 요약합니다.
+    첫 파일로 워밍업 추론을 한 번 수행한 뒤 측정합니다.
+
+    Returns:
+        dict: 총 오디오 길이, 총 처리 시간, 전체 RTF, 파일별 RTF 분포, 인식 결과.
+    """
+    engine.transcribe(audio_set[0][1]) # 워밍업 (지연 초기화 비용 제외)
+
+    per_file_rtf = []
+    total_audio = 0.0
+    total_elapsed = 0.0
+    transcripts = {}
+    for _ in range(repeat):
+        for name, audio in audio_set:
+            duration = len(audio) / audio_utils.WHISPER_SAMPLE_RATE
+            started = time.perf_counter()
+            result = engine.transcribe(audio)
+            elapsed = time.perf_counter() - started
+            total_audio += duration
+            total_elapsed += elapsed
+            per_file_rtf.append(elapsed / duration if duration > 0 else 0.0)
+            transcripts[name] = result["text"].strip()
+    return {
+        "audio_seconds": total_audio,
+        "elapsed_seconds": total_elapsed,
+        "rtf": total_elapsed / total_audio if total_audio > 0 else 0.0,
+        "rtf_median": statistics.median(per_file_rtf),
+        "rtf_max": max(per_file_rtf),
+        "transcripts": transcripts,
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="STT 백엔드 RTF 비교 벤치마크")
+    parser.add_argument('--audio-dir', required=True, help="WAV 파일이 들어있는 디렉토리")
+    parser.add_argument('--engine', action='append', default=[],
+                        help="'백엔드:모델' 형식 (여러 번 지정 가능, 예: faster-whisper:small)")
+    parser.add_argument('--threads', type=int, default=0, help="CPU 추론 스레드 수 (0: 기본값)")
+    parser.add_argument('--beam-size', type=int, default=1, help="빔 서치 크기")
+    parser.add_argument('--repeat', type=int, default=1, help="오디오 세트 반복 횟수")
+    parser.add_argument('--show-text', action='store_true', help="파일별 인식 결과 출력")
+    args = parser.parse_args()
+
+    engine_specs = args.engine or ["whisper:small", "faster-whisper:small"]
+    audio_set = load_audio_set(args.audio_dir)
+    if not audio_set:
+        print(f"오류: '{args.audio_dir}'에 WAV 파일이 없습니다.")
+        return
+    print(f"오디오 세트: {len(audio_set)}개 파일, "
+          f"총 {sum(len(a) for _, a in audio_set) / audio_utils.WHISPER_SAMPLE_RATE:.1f}초")
+
+    rows = []
+    for spec in engine_specs:
+        backend, _, model_name = spec.partition(':')
+        try:
+            load_started = time.perf_counter()
+            engine = stt_engines.create_engine(backend, model_name or "small",
+                                               threads=args.threads, beam_size=args.beam_size)
+            load_seconds = time.perf_counter() - load_started
+            print(f"\n[{engine.describe()}] 로드 {load_seconds:.1f}초, 측정 중...")
+            summary = benchmark_engine(engine, audio_set, args.repeat)
+        except Exception as e:
+            print(f"\n[{spec}] 벤치마크 실패: {e}")
+            continue
+        rows.append((engine.describe(), load_seconds, summary))
+        if args.show_text:
+            for name, text in summary["transcripts"].items():
+                print(f"  {name}: {text}")
+
+    print("\n=== 결과 (RTF = 처리 시간 / 오디오 길이) ===")
+    print(f"{'엔진':<55} {'로드(s)':>8} {'처리(s)':>8} {'RTF':>7} {'RTF p50':>8} {'RTF max':>8}")
+    for description, load_seconds, summary in rows:
+        print(f"{description:<55} {load_seconds:>8.1f} {summary['elapsed_seconds']:>8.1f} "
+              f"{summary['rtf']:>7.3f} {summary['rtf_median']:>8.3f} {summary['rtf_max']:>8.3f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,599 @@
+# -*- coding: utf-8 -*-
+"""
+main.py 턴 루프 종단 간(end-to-end) 벤치마크.
+마이크, 라즈베리파이, Whisper PC 서버, LM Studio 없이 어떤 리눅스 PC에서나 main.run_turn()을 그대로 실행하고
+턴 지연 시간 분포를 측정합니다. 실제 클라이언트 코드(녹음 VAD, 업로드 인코딩, HTTP 세션, 문장 파이프라인,
+직접 재생)는 그대로 두고 바깥쪽만 로컬 대역(stand-in)으로 바꿉니다:
+
+  - 스텁 HTTP 서버 (표준 라이브러리): PC 서버 /stt, /stt_stream, /generate_tts(_stream), /converse,
+    OpenAI 호환 /v1/chat/completions (SSE 스트리밍), 날씨 API, ipinfo - 지연 시간 / 응답 길이 설정 가능
+  - FileCaptureStream: arecord 대신 배경 잡음 + 발화 WAV(또는 합성 발화)를 실시간 속도로 링 버퍼에 채움
+  - FileOutputSink: aplay 대신 받은 PCM을 재생 시간만큼 소비 (선택적으로 WAV 파일로 저장)
+
+측정 항목 (턴마다):
+  - response_latency: 발화가 끝난 순간 → 첫 응답 소리 (사용자가 체감하는 지연)
+  - turn_after_speech: 발화가 끝난 순간 → 턴 종료 (응답 재생 완료 포함)
+  - turn_total: run_turn() 전체 (발화 시작 대기, 발화 길이 포함)
+  - 단계별 스팬: tracing.py 기록 (record, encode, stt, llm, tts, playback ...)
+
+사용 예:
+    python benchmark_turns.py --turns 20 --output bench/base.json
+    python benchmark_turns.py --turns 20 --mode converse --compare bench/base.json
+    python benchmark_turns.py --turns 20 --stt-latency 0.8 --llm-first-token 0.5 --tts-latency 0.3 --jitter 0.2
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import random
+import re
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.parse
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import numpy as np
+
+import audio_utils
+import capture_stream
+import converse_protocol
+import text_utils
+import tracing
+
+# --- 설정 ---
+DEFAULT_TRANSCRIPTS = ("오늘 하루 어땠는지 이야기해 줘", "서울 날씨 알려줘")
+DEFAULT_REPLY = "좋은 질문이에요. 오늘은 조금 바빴지만 보람 있는 하루였어요. 당신의 하루는 어땠나요?"
+FEED_MS = 20                 # 캡처 스트림에 한 번에 채우는 오디오 길이
+NOISE_DB = -65.0             # 배경 잡음 수준 (dBFS, VAD 최소 에너지보다 작게)
+SPEECH_DB = -20.0            # 합성 발화 수준 (dBFS)
+SINK_BUFFER_SECONDS = 0.5    # 출력 대역이 미리 받아 두는 오디오 길이 (aplay 파이프 + ALSA 버퍼 흉내)
+TTS_SECONDS_PER_CHAR = 0.12  # 스텁 TTS가 만드는 오디오 길이 (글자당 초)
+LLM_CHARS_PER_TOKEN = 2      # 스텁 LLM이 한 번에 보내는 글자 수
+REGRESSION_THRESHOLD = 0.10  # 비교 시 이 비율 이상 느려지면 회귀로 표시
+METRICS = ("response_latency", "turn_after_speech", "turn_total")
+# --- 설정 끝 ---
+
+def tone_pcm(seconds, rate, level_db=SPEECH_DB):
+    """스텁 TTS 출력용 사인파 PCM (S16_LE)."""
+    t = np.arange(int(seconds * rate)) / rate
+    return audio_utils.float32_to_pcm16((10 ** (level_db / 20) * np.sin(2 * np.pi * 220.0 * t)).astype(np.float32))
+
+def synthetic_utterance(seconds, rate):
+    """VAD가 음성으로 판정하는 합성 발화 (150Hz 배음 300~1500Hz, 4Hz 음절 변조)."""
+    t = np.arange(int(seconds * rate)) / rate
+    voiced = sum(np.sin(2 * np.pi * 150.0 * k * t) / k for k in range(2, 11))
+    envelope = 0.6 + 0.4 * np.sin(2 * np.pi * 4.0 * t)
+    audio = voiced * envelope
+    audio *= 10 ** (SPEECH_DB / 20) / (np.sqrt(np.mean(audio ** 2)) + 1e-9)
+    return audio_utils.float32_to_pcm16(audio.astype(np.float32))
+
+def load_utterance(path, rate):
+    """발화 WAV를 캡처 레이트 PCM으로 읽습니다."""
+    with open(path, 'rb') as f:
+        audio, sample_rate = audio_utils.decode_wav(f.read())
+    return audio_utils.float32_to_pcm16(audio_utils.resample_poly(audio, sample_rate, rate))
+
+# --- 스텁 서버 ---
+class StubScenario:
+    """스텁 서버의 응답 지연 / 길이 설정. 지연 값은 jitter 비율만큼 무작위로 흔들립니다."""
+
+    def __init__(self, args):
+        self.stt_latency = args.stt_latency
+        self.tts_latency = args.tts_latency
+        self.tts_seconds_per_char = args.tts_seconds_per_char
+        self.llm_first_token = args.llm_first_token
+        self.llm_token_interval = args.llm_token_interval
+        self.weather_latency = args.weather_latency
+        self.jitter = args.jitter
+        self.reply = args.reply
+        self.transcript = DEFAULT_TRANSCRIPTS[0] # 턴마다 벤치마크가 바꿈
+        self.connections = 0
+        self.requests = {}
+        self._lock = threading.Lock()
+
+    def delay(self, seconds):
+        if seconds > 0:
+            time.sleep(max(0.0, seconds * (1 + random.uniform(-self.jitter, self.jitter))))
+
+    def count_request(self, path):
+        with self._lock:
+            self.requests[path] = self.requests.get(path, 0) + 1
+
+    def count_connection(self):
+        with self._lock:
+            self.connections += 1
+
+class StubHandler(BaseHTTPRequestHandler):
+    """PC 서버 / LM Studio / 날씨 API를 흉내 내는 요청 처리기 (keep-alive 지원)."""
+    protocol_version = "HTTP/1.1"
+
+    @property
+    def scenario(self):
+        return self.server.scenario
+
+    def setup(self):
+        super().setup()
+        self.server.scenario.count_connection()
+
+    def log_message(self, format, *args):
+        pass
+
+    def _read_body(self):
+        if self.headers.get('Transfer-Encoding', '').lower() == 'chunked':
+            chunks = []
+            while True:
+                size = int(self.rfile.readline().split(b';')[0].strip() or b'0', 16)
+                if size == 0:
+                    while self.rfile.readline() not in (b'\r\n', b'\n', b''):
+                        pass
+                    return b''.join(chunks)
+                chunks.append(self.rfile.read(size))
+                self.rfile.readline()
+        return self.rfile.read(int(self.headers.get('Content-Length', 0)))
+
+    def _send(self, content_type, body, status=200):
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _send_json(self, obj, status=200):
+        self._send('application/json', json.dumps(obj, ensure_ascii=False).encode('utf-8'), status)
+
+    def _start_chunked(self, content_type):
+        self.send_response(200)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Transfer-Encoding', 'chunked')
+        self.end_headers()
+
+    def _write_chunk(self, data):
+        self.wfile.write(b'%x\r\n' % len(data) + data + b'\r\n')
+        self.wfile.flush()
+
+    def _end_chunked(self):
+        self.wfile.write(b'0\r\n\r\n')
+        self.wfile.flush()
+
+    def _tts_audio(self, text, sample_rate):
+        self.scenario.delay(self.scenario.tts_latency)
+        return tone_pcm(max(0.2, len(text) * self.scenario.tts_seconds_per_char), sample_rate)
+
+    def do_GET(self):
+        path = urllib.parse.urlparse(self.path).path
+        self.scenario.count_request(path)
+        if path == '/ipinfo':
+            self.scenario.delay(self.scenario.weather_latency)
+            self._send_json({"city": "Seoul"})
+        elif path == '/weather':
+            self.scenario.delay(self.scenario.weather_latency)
+            self._send_json({"cod": 200, "main": {"temp": 21.5, "feels_like": 21.0, "humidity": 40},
+                             "weather": [{"description": "맑음"}]})
+        else:
+            self._send_json({"error": "not found"}, status=404)
+
+    def do_POST(self):
+        path = urllib.parse.urlparse(self.path).path
+        self.scenario.count_request(path)
+        body = self._read_body()
+        handler = {
+            '/stt': self._handle_stt,
+            '/stt_stream': self._handle_stt_stream,
+            '/generate_tts': self._handle_tts,
+            '/generate_tts_stream': self._handle_tts_stream,
+            '/converse': self._handle_converse,
+            '/v1/chat/completions': self._handle_chat,
+        }.get(path)
+        if handler is None:
+            self._send_json({"error": "not found"}, status=404)
+            return
+        handler(body)
+
+    def _handle_stt(self, body):
+        self.scenario.delay(self.scenario.stt_latency)
+        self._send_json({"text": self.scenario.transcript})
+
+    def _handle_stt_stream(self, body):
+        self.scenario.delay(self.scenario.stt_latency) # 업로드가 끝난 뒤 최종 인식 시간
+        self._send('application/x-ndjson', (json.dumps({"type": "final", "text": self.scenario.transcript},
+                                                       ensure_ascii=False) + "\n").encode('utf-8'))
+
+    def _tts_request(self, body):
+        payload = json.loads(body or b'{}')
+        output_format = payload.get("format", "wav")
+        sample_rate = int(payload.get("sample_rate", 24000))
+        content_type = f"audio/pcm;rate={sample_rate};channels=1;format=s16le" if output_format == "pcm" else "audio/wav"
+        return payload.get("text", ""), output_format, sample_rate, content_type
+
+    def _handle_tts(self, body):
+        text, output_format, sample_rate, content_type = self._tts_request(body)
+        pcm = self._tts_audio(text, sample_rate)
+        if output_format != "pcm":
+            pcm = audio_utils.build_wav_header(sample_rate, data_size=len(pcm)) + pcm
+        self._send(content_type, pcm)
+
+    def _handle_tts_stream(self, body):
+        text, output_format, sample_rate, content_type = self._tts_request(body)
+        self._start_chunked(content_type)
+        if output_format != "pcm":
+            self._write_chunk(audio_utils.build_wav_header(sample_rate))
+        for sentence in text_utils.split_sentences(text):
+            self._write_chunk(self._tts_audio(sentence, sample_rate))
+        self._end_chunked()
+
+    def _handle_converse(self, body):
+        fields = dict(re.findall(rb'name="(\w+)"\r\n\r\n([^\r]*)\r\n', body)) # multipart 폼 필드 (오디오 파트 제외)
+        output_format = fields.get(b"format", b"wav").decode()
+        sample_rate = int(fields.get(b"sample_rate", 24000))
+        self.scenario.delay(self.scenario.stt_latency)
+        self._start_chunked(converse_protocol.MIMETYPE)
+        self._write_chunk(converse_protocol.encode_json_frame(converse_protocol.FRAME_TRANSCRIPT,
+                                                              {"text": self.scenario.transcript}))
+        reply = self.scenario.reply
+        self.scenario.delay(self.scenario.llm_first_token
+                            + self.scenario.llm_token_interval * len(reply) / LLM_CHARS_PER_TOKEN)
+        self._write_chunk(converse_protocol.encode_json_frame(converse_protocol.FRAME_REPLY, {
+            "text": reply, "route": "llm", "audio": {"format": output_format, "sample_rate": sample_rate}}))
+        if output_format == "wav":
+            self._write_chunk(converse_protocol.encode_frame(converse_protocol.FRAME_AUDIO,
+                                                             audio_utils.build_wav_header(sample_rate)))
+        for sentence in text_utils.split_sentences(reply):
+            self._write_chunk(converse_protocol.encode_frame(converse_protocol.FRAME_AUDIO,
+                                                             self._tts_audio(sentence, sample_rate)))
+        self._write_chunk(converse_protocol.encode_frame(converse_protocol.FRAME_END))
+        self._end_chunked()
+
+    def _handle_chat(self, body):
+        payload = json.loads(body or b'{}')
+        reply = self.scenario.reply
+        tokens = [reply[i:i + LLM_CHARS_PER_TOKEN] for i in range(0, len(reply), LLM_CHARS_PER_TOKEN)]
+        if not payload.get("stream"):
+            self.scenario.delay(self.scenario.llm_first_token + self.scenario.llm_token_interval * len(tokens))
+            self._send_json({"choices": [{"message": {"role": "assistant", "content": reply}}]})
+            return
+        self._start_chunked('text/event-stream')
+        self.scenario.delay(self.scenario.llm_first_token)
+        for index, token in enumerate(tokens):
+            if index:
+                self.scenario.delay(self.scenario.llm_token_interval)
+            event = {"choices": [{"delta": {"content": token}}]}
+            self._write_chunk(f"data: {json.dumps(event, ensure_ascii=False)}\n\n".encode('utf-8'))
+        self._write_chunk(b"data: [DONE]\n\n")
+        self._end_chunked()
+
+def start_stub_server(scenario):
+    """스텁 서버를 임의 포트에서 백그라운드로 시작합니다. Returns: (서버, 기본 URL)"""
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StubHandler)
+    server.daemon_threads = True
+    server.scenario = scenario
+    threading.Thread(target=server.serve_forever, name="stub-server", daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}"
+
+# --- 오디오 입출력 대역 ---
+class FileCaptureStream(capture_stream.CaptureStream):
+    """
+    arecord 대신 배경 잡음을 실시간 속도로 링 버퍼에 채우고, speak()로 넣은 발화 PCM을 그 사이에 섞는 캡처 스트림.
+    마지막 발화 샘플을 버퍼에 넣은 시각을 speech_ended_at(monotonic)에 기록합니다.
+    """
+
+    def __init__(self, rate, buffer_seconds=capture_stream.DEFAULT_BUFFER_SECONDS):
+        super().__init__("file", rate=rate, buffer_seconds=buffer_seconds)
+        self.speech_ended_at = None
+        self._speech = bytearray()
+        self._noise = audio_utils.float32_to_pcm16(
+            (10 ** (NOISE_DB / 20) * np.random.default_rng(0).standard_normal(rate)).astype(np.float32))
+        self._noise_offset = 0
+
+    def start(self):
+        if self._running:
+            return
+        self._running = True
+        self._thread = threading.Thread(target=self._feed, name="file-capture", daemon=True)
+        self._thread.start()
+
+    def speak(self, pcm):
+        """발화를 다음 프레임부터 캡처 스트림에 넣습니다."""
+        with self._cond:
+            self.speech_ended_at = None
+            self._speech.extend(pcm)
+
+    def _next_noise(self, size):
+        data = b''
+        while len(data) < size:
+            piece = self._noise[self._noise_offset:self._noise_offset + size - len(data)]
+            self._noise_offset = (self._noise_offset + len(piece)) % len(self._noise)
+            data += piece
+        return data
+
+    def _feed(self):
+        frame_bytes = int(self.rate * FEED_MS / 1000) * 2
+        next_time = time.monotonic()
+        while self._running:
+            with self._cond:
+                speech = bytes(self._speech[:frame_bytes])
+                del self._speech[:frame_bytes]
+                finished = bool(speech) and not self._speech
+            chunk = speech + self._next_noise(frame_bytes - len(speech))
+            self._append(chunk)
+            if finished:
+                self.speech_ended_at = time.monotonic()
+            next_time += FEED_MS / 1000
+            time.sleep(max(0.0, next_time - time.monotonic()))
+        with self._cond:
+            self._cond.notify_all()
+
+class FileOutputSink:
+    """
+    aplay 대신 PCM을 받아 재생 시간만큼 소비하는 출력 (audio_output.PCMOutputStream과 같은 메서드).
+    SINK_BUFFER_SECONDS보다 많이 앞서 쓰면 write()가 막혀 실제 장치의 역압을 흉내 냅니다.
+    """
+
+    def __init__(self, sample_rate, wav_path=None):
+        self.sample_rate = sample_rate
+        self.bytes_per_second = sample_rate * 2
+        self.wav_path = wav_path
+        self.first_write_at = None # 이번 턴 첫 소리 시각 (monotonic)
+        self.bytes_written = 0
+        self._recorded = bytearray() if wav_path else None
+        self._play_end = 0.0
+        self._interrupted = threading.Event()
+
+    def reset_turn(self):
+        self.first_write_at = None
+
+    def start(self):
+        return self
+
+    def write(self, pcm_bytes):
+        self._interrupted.clear()
+        now = time.monotonic()
+        if self.first_write_at is None and pcm_bytes:
+            self.first_write_at = now
+        self.bytes_written += len(pcm_bytes)
+        if self._recorded is not None:
+            self._recorded.extend(pcm_bytes)
+        self._play_end = max(now, self._play_end) + len(pcm_bytes) / self.bytes_per_second
+        ahead = self._play_end - time.monotonic() - SINK_BUFFER_SECONDS
+        if ahead > 0 and self._interrupted.wait(ahead):
+            return False
+        return not self._interrupted.is_set()
+
+    def drain(self):
+        remaining = self._play_end - time.monotonic()
+        if remaining > 0:
+            return not self._interrupted.wait(remaining)
+        return not self._interrupted.is_set()
+
+    def interrupt(self):
+        self._interrupted.set()
+        self._play_end = 0.0
+
+    def close(self):
+        if self._recorded is not None:
+            with open(self.wav_path, 'wb') as f:
+                f.write(audio_utils.build_wav_header(self.sample_rate, data_size=len(self._recorded)) + self._recorded)
+
+# --- 측정 / 보고 ---
+def distribution(values):
+    """값 목록의 요약 (초 단위 값을 ms로)."""
+    values = sorted(v * 1000 for v in values if v is not None)
+    if not values:
+        return {"count": 0}
+    return {
+        "count": len(values),
+        "mean": statistics.fmean(values),
+        "p50": tracing.percentile(values, 50),
+        "p95": tracing.percentile(values, 95),
+        "p99": tracing.percentile(values, 99),
+        "max": values[-1],
+    }
+
+def git_revision():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True, timeout=5,
+                              cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+@contextlib.contextmanager
+def quiet(enabled):
+    """main.py의 진행 출력을 숨깁니다 (--verbose면 그대로)."""
+    if not enabled:
+        yield
+        return
+    with contextlib.redirect_stdout(io.StringIO()):
+        yield
+
+def configure_environment(args, server_url, trace_path):
+    """main.py를 import하기 전에 설정 환경 변수를 지정합니다 (.env보다 우선)."""
+    os.environ.update({
+        "PC_SERVER_URL": server_url,
+        "LM_STUDIO_URL": f"{server_url}/v1",
+        "AUDIO_RECORD_RATE": str(args.capture_rate),
+        "VAD_RECORDING": "1",
+        "PERSISTENT_CAPTURE": "1",
+        "STT_STREAMING": "1" if args.mode == "stt_stream" else "0",
+        "CONVERSE_MODE": "1" if args.mode == "converse" else "0",
+        "PIPELINED_TURNS": "0" if args.no_pipeline else "1",
+        "WAKE_WORD_ENABLED": "0",
+        "FAST_STARTUP": "0", # 날씨/LLM 모듈을 import 시점에 로드 (run_turn()만 호출하므로 백그라운드 초기화 없음)
+        "BARGE_IN_ENABLED": "0", # 출력 대역의 소리는 마이크로 돌아오지 않으므로 끼어들기 감시 불필요
+        "TRACE_FILE": trace_path,
+    })
+
+def run_benchmark(args):
+    scenario = StubScenario(args)
+    server, server_url = start_stub_server(scenario)
+    trace_dir = tempfile.mkdtemp(prefix="bench_traces_")
+    trace_path = os.path.join(trace_dir, "turns.jsonl")
+    configure_environment(args, server_url, trace_path)
+
+    with quiet(not args.verbose):
+        import main # 환경 변수 설정 후 import (모듈 수준 설정값)
+    if main.weather_module is not None:
+        main.weather_module.BASE_URL = f"{server_url}/weather?"
+        main.weather_module.IPINFO_URL = f"{server_url}/ipinfo"
+        main.weather_module.API_KEY = "benchmark"
+    tracing.configure(trace_path, propagate_to=[server_url])
+
+    capture = FileCaptureStream(args.capture_rate)
+    capture.start()
+    sink = FileOutputSink(main.TTS_SAMPLE_RATE, wav_path=args.sink_wav)
+    main.audio_capture = capture
+    main.output_stream = sink
+    main.wake_detector = None
+    utterance = load_utterance(args.utterance, args.capture_rate) if args.utterance else \
+        synthetic_utterance(args.utterance_seconds, args.capture_rate)
+    transcripts = args.transcript or list(DEFAULT_TRANSCRIPTS)
+
+    samples = {name: [] for name in METRICS}
+    total = args.warmup + args.turns
+    print(f"스텁 서버 {server_url}, 모드 {args.mode}{'' if not args.no_pipeline else ' (파이프라인 끔)'}, "
+          f"턴 {args.turns}회 (+워밍업 {args.warmup})")
+    try:
+        for index in range(total):
+            scenario.transcript = transcripts[index % len(transcripts)]
+            sink.reset_turn()
+            speaker = threading.Timer(args.lead_silence, capture.speak, args=(utterance,))
+            started = time.monotonic()
+            speaker.start()
+            with quiet(not args.verbose):
+                main.run_turn()
+            ended = time.monotonic()
+            speaker.join()
+            speech_end = capture.speech_ended_at
+            measured = {
+                "response_latency": sink.first_write_at - speech_end if sink.first_write_at and speech_end else None,
+                "turn_after_speech": ended - speech_end if speech_end else None,
+                "turn_total": ended - started,
+            }
+            label = "워밍업" if index < args.warmup else f"{index - args.warmup + 1}/{args.turns}"
+            latency = measured["response_latency"]
+            print(f"  [{label}] '{scenario.transcript}': 응답 지연 "
+                  f"{latency * 1000:.0f}ms, 턴 {measured['turn_total']:.2f}s" if latency is not None else
+                  f"  [{label}] '{scenario.transcript}': 응답 소리 없음, 턴 {measured['turn_total']:.2f}s")
+            if index >= args.warmup:
+                for name, value in measured.items():
+                    samples[name].append(value)
+            time.sleep(args.pause)
+    finally:
+        with quiet(not args.verbose):
+            capture.stop()
+        sink.close()
+        tracing.close()
+        main.http_client.close()
+        server.shutdown()
+
+    # 워밍업 턴의 스팬은 제외 ('turn' 스팬 시작 순서로 판단)
+    spans = tracing.load_spans([trace_path])
+    turn_order = sorted((span["ts"], span["turn"]) for span in spans if span.get("stage") == "turn")
+    measured_turns = {turn_id for _, turn_id in turn_order[args.warmup:]}
+    stages = {}
+    for source, stage, count, failed, percentiles, maximum in tracing.summarize(
+            [span for span in spans if span.get("turn") in measured_turns and span.get("source") == "device"]):
+        stages[stage] = {"count": count, "failed": failed, "p50": percentiles[50], "p95": percentiles[95],
+                         "p99": percentiles[99], "max": maximum}
+
+    return {
+        "revision": git_revision(),
+        "created": time.strftime("%Y-%m-%d %H:%M:%S"),
+        "scenario": {key: value for key, value in vars(args).items() if key not in ("output", "compare", "verbose")},
+        "metrics": {name: distribution(values) for name, values in samples.items()},
+        "stages": stages,
+        "http": {"connections": scenario.connections, "requests": scenario.requests},
+    }
+
+def print_report(result):
+    print(f"\n=== 턴 지연 시간 (ms, revision {result['revision'] or '?'}) ===")
+    print(f"{'metric':<20} {'count':>6} {'mean':>8} {'p50':>8} {'p95':>8} {'p99':>8} {'max':>8}")
+    for name, summary in result["metrics"].items():
+        if not summary["count"]:
+            print(f"{name:<20} {0:>6}")
+            continue
+        print(f"{name:<20} {summary['count']:>6} " + " ".join(f"{summary[key]:>8.0f}" for key in ("mean", "p50", "p95", "p99", "max")))
+    print("\n=== 단계별 스팬 (ms) ===")
+    print(f"{'stage':<30} {'count':>6} {'fail':>5} {'p50':>8} {'p95':>8} {'p99':>8}")
+    for stage, summary in result["stages"].items():
+        values = " ".join(f"{summary[key]:>8.0f}" if summary[key] is not None else f"{'-':>8}" for key in ("p50", "p95", "p99"))
+        print(f"{stage:<30} {summary['count']:>6} {summary['failed']:>5} {values}")
+    requests_total = sum(result["http"]["requests"].values())
+    print(f"\nHTTP: 요청 {requests_total}개, 새 연결 {result['http']['connections']}개")
+
+def compare_results(baseline, current, threshold=REGRESSION_THRESHOLD):
+    """
+    기준 결과와 비교한 표를 출력합니다.
+
+    Returns:
+        bool: threshold 이상 느려진 지표(p50/p95)가 있으면 True.
+    """
+    print(f"\n=== 비교: {baseline.get('revision') or '기준'} → {current.get('revision') or '현재'} "
+          f"(회귀 기준 +{threshold:.0%}) ===")
+    print(f"{'metric':<36} {'기준':>9} {'현재':>9} {'변화':>9}")
+    regressed = False
+    rows = [(f"{name} {key}", baseline["metrics"].get(name, {}).get(key), current["metrics"][name].get(key))
+            for name in METRICS for key in ("p50", "p95")]
+    rows += [(f"stage {stage} p50", baseline.get("stages", {}).get(stage, {}).get("p50"), summary["p50"])
+             for stage, summary in current["stages"].items()]
+    for label, before, after in rows:
+        if before is None or after is None:
+            continue
+        change = (after - before) / before if before else 0.0
+        flag = ""
+        if change >= threshold and not label.startswith("stage"):
+            flag = "  << 회귀"
+            regressed = True
+        elif change <= -threshold:
+            flag = "  개선"
+        print(f"{label:<36} {before:>9.0f} {after:>9.0f} {change:>+8.1%}{flag}")
+    return regressed
+
+def main():
+    parser = argparse.ArgumentParser(description="main.py 턴 루프 종단 간 벤치마크 (로컬 스텁 서버)")
+    parser.add_argument('--turns', type=int, default=10, help="측정할 턴 수")
+    parser.add_argument('--warmup', type=int, default=1, help="측정에서 제외할 첫 턴 수 (연결/캐시 준비)")
+    parser.add_argument('--mode', choices=("stt", "stt_stream", "converse"), default="stt",
+                        help="턴 처리 방식 (stt: 녹음 후 /stt, stt_stream: /stt_stream, converse: /converse)")
+    parser.add_argument('--no-pipeline', action='store_true', help="PIPELINED_TURNS=0 (전체 응답 후 TTS/재생)")
+    parser.add_argument('--capture-rate', type=int, default=44100, help="캡처 샘플 레이트 (AUDIO_RECORD_RATE)")
+    parser.add_argument('--utterance', help="발화 WAV 파일 (없으면 합성 발화)")
+    parser.add_argument('--utterance-seconds', type=float, default=1.5, help="합성 발화 길이 (초)")
+    parser.add_argument('--lead-silence', type=float, default=0.5, help="턴 시작 후 발화 전 무음 (초)")
+    parser.add_argument('--pause', type=float, default=0.2, help="턴 사이 대기 (초)")
+    parser.add_argument('--transcript', action='append', help="스텁 STT 결과 (여러 번 지정하면 턴마다 순환)")
+    parser.add_argument('--reply', default=DEFAULT_REPLY, help="스텁 LLM 응답 텍스트")
+    parser.add_argument('--stt-latency', type=float, default=0.4, help="스텁 STT 처리 시간 (초)")
+    parser.add_argument('--tts-latency', type=float, default=0.25, help="스텁 TTS 문장당 합성 시간 (초)")
+    parser.add_argument('--tts-seconds-per-char', type=float, default=TTS_SECONDS_PER_CHAR, help="스텁 TTS 오디오 길이 (글자당 초)")
+    parser.add_argument('--llm-first-token', type=float, default=0.4, help="스텁 LLM 첫 토큰 시간 (초)")
+    parser.add_argument('--llm-token-interval', type=float, default=0.03, help="스텁 LLM 토큰 간격 (초)")
+    parser.add_argument('--weather-latency', type=float, default=0.1, help="스텁 날씨/ipinfo 응답 시간 (초)")
+    parser.add_argument('--jitter', type=float, default=0.1, help="스텁 지연 무작위 변동 비율 (0.1 = ±10%%)")
+    parser.add_argument('--seed', type=int, default=0, help="지연 변동 난수 시드")
+    parser.add_argument('--sink-wav', help="재생된 응답 오디오를 저장할 WAV 경로")
+    parser.add_argument('--output', help="결과 JSON 저장 경로 (다음 실행의 --compare 기준)")
+    parser.add_argument('--compare', help="비교할 기준 결과 JSON")
+    parser.add_argument('--threshold', type=float, default=REGRESSION_THRESHOLD, help="회귀로 표시할 느려짐 비율")
+    parser.add_argument('--verbose', action='store_true', help="main.py 진행 출력 표시")
+    args = parser.parse_args()
+    random.seed(args.seed)
+
+    result = run_benchmark(args)
+    print_report(result)
+    if args.output:
+        os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(result, f, ensure_ascii=False, indent=2)
+        print(f"결과 저장: {args.output}")
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as f:
+            baseline = json.load(f)
+        if compare_results(baseline, result, args.threshold):
+            sys.exit(1)
+
+if __name__ == "__main__":
+    main()
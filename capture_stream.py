@@ -0,0 +1,142 @@
+# -*- coding: utf-8 -*-
+"""
+상시 오디오 캡처 스트림.
+시작 시 arecord를 한 번만 실행하고, 읽기 스레드가 raw PCM을 메모리 링 버퍼에 계속 채웁니다.
+main.py는 턴마다 프로세스를 새로 띄우거나 장치를 다시 열지 않고, 이 버퍼에서 발화를 잘라 씁니다
+(녹음 파일을 SD 카드에 쓰지 않음).
+"""
+import subprocess
+import threading
+import time
+
+# --- 설정 ---
+DEFAULT_BUFFER_SECONDS = 30  # 링 버퍼에 보관할 오디오 길이 (초)
+DEFAULT_READ_BYTES = 4096    # 파이프에서 한 번에 읽을 바이트 수
+RESTART_DELAY_SECONDS = 1.0  # arecord가 종료되었을 때 다시 시작하기 전 대기 시간
+# --- 설정 끝 ---
+
+class CaptureStream:
+    """
+    arecord 한 개(S16_LE 모노 raw 출력)에서 읽은 오디오를 고정 크기 링 버퍼에 보관합니다.
+
+    버퍼 위치는 시작 이후 누적 바이트 수(절대 위치)로 다루며, 읽는 쪽은 chunks()로
+    원하는 위치부터 새 오디오를 받아 갑니다. 여러 소비자가 동시에 읽어도 됩니다.
+    """
+
+    def __init__(self, device, format="S16_LE", rate=44100, buffer_seconds=DEFAULT_BUFFER_SECONDS,
+                 read_bytes=DEFAULT_READ_BYTES):
+        self.device = device
+        self.format = format
+        self.rate = rate
+        self.read_bytes = read_bytes
+        self.capacity = int(rate * buffer_seconds) * 2
+        self._buffer = bytearray(self.capacity)
+        self._write_pos = 0 # 지금까지 받은 총 바이트 수
+        self._cond = threading.Condition()
+        self._process = None
+        self._thread = None
+        self._running = False
+
+    @property
+    def position(self):
+        """현재(가장 최근) 절대 위치. chunks(start=...)에 넘기면 그 시점부터 읽습니다."""
+        with self._cond:
+            return self._write_pos
+
+    def start(self):
+        """arecord를 실행하고 읽기 스레드를 시작합니다 (이미 실행 중이면 무시).
+
+        Raises:
+            FileNotFoundError: arecord 명령어가 없는 경우.
+        """
+        if self._running:
+            return
+        self._running = True
+        self._spawn()
+        self._thread = threading.Thread(target=self._run, name="capture-stream", daemon=True)
+        self._thread.start()
+        print(f"상시 캡처 스트림 시작 ('{self.device}', {self.rate}Hz, 버퍼 {self.capacity // 2 // self.rate}초)")
+
+    def stop(self):
+        """읽기 스레드와 arecord를 종료합니다."""
+        self._running = False
+        process = self._process
+        if process is not None and process.poll() is None:
+            process.terminate()
+            process.wait()
+        with self._cond:
+            self._cond.notify_all()
+        if self._thread is not None:
+            self._thread.join(timeout=2)
+        print("상시 캡처 스트림 종료.")
+
+    def _spawn(self):
+        command = ['arecord', '-D', self.device, '-f', self.format, '-r', str(self.rate), '-c', '1', '-t', 'raw', '-q']
+        print(f"[capture_stream] 실행 명령어: {' '.join(command)}")
+        self._process = subprocess.Popen(command, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+
+    def _run(self):
+        while self._running:
+            chunk = self._process.stdout.read(self.read_bytes)
+            if chunk:
+                self._append(chunk)
+                continue
+            # 장치 오류 등으로 arecord가 끝났으면 잠시 후 다시 시작
+            self._process.wait()
+            if not self._running:
+                break
+            stderr = self._process.stderr.read().decode(errors='replace').strip()
+            print(f"경고: 캡처 arecord 종료 (코드 {self._process.returncode}). {RESTART_DELAY_SECONDS}초 후 재시작합니다. {stderr}")
+            time.sleep(RESTART_DELAY_SECONDS)
+            try:
+                self._spawn()
+            except OSError as e:
+                print(f"오류: 캡처 arecord 재시작 실패: {e}")
+                self._running = False
+        with self._cond:
+            self._cond.notify_all()
+
+    def _append(self, chunk):
+        with self._cond:
+            offset = self._write_pos % self.capacity
+            first = min(len(chunk), self.capacity - offset)
+            self._buffer[offset:offset + first] = chunk[:first]
+            if first < len(chunk):
+                self._buffer[:len(chunk) - first] = chunk[first:]
+            self._write_pos += len(chunk)
+            self._cond.notify_all()
+
+    def read(self, start, timeout=1.0):
+        """
+        절대 위치 start부터 지금까지 쌓인 오디오를 읽습니다. 새 데이터가 없으면 최대 timeout초 기다립니다.
+
+        Returns:
+            tuple: (PCM 바이트, 다음 읽기 위치). 버퍼에서 이미 밀려난 구간은 건너뜁니다.
+        """
+        with self._cond:
+            if self._write_pos <= start and self._running:
+                self._cond.wait(timeout)
+            end = self._write_pos
+            if end - start > self.capacity:
+                print(f"경고: 캡처 버퍼 초과 - {(end - start - self.capacity) // 2}개 샘플을 건너뜁니다.")
+                start = end - self.capacity
+            if end <= start:
+                return b'', start
+            first_offset = start % self.capacity
+            last_offset = end % self.capacity
+            if first_offset < last_offset:
+                data = bytes(self._buffer[first_offset:last_offset])
+            else:
+                data = bytes(self._buffer[first_offset:]) + bytes(self._buffer[:last_offset])
+            return data, end
+
+    def chunks(self, start=None):
+        """
+        start 위치(기본: 지금)부터 들어오는 오디오를 차례로 내보내는 제너레이터.
+        스트림이 멈추면 종료합니다.
+        """
+        position = self.position if start is None else start
+        while self._running:
+            data, position = self.read(position)
+            if data:
+                yield data
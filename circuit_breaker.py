@@ -0,0 +1,164 @@
+# -*- coding: utf-8 -*-
+"""
+원격 의존성(PC 서버, LM Studio, 날씨 API)별 회로 차단기.
+연속 실패가 기준을 넘으면 회로를 열어(open) 이후 요청을 네트워크에 보내지 않고 즉시 실패시킵니다.
+서버가 꺼져 있을 때 턴마다 연결/읽기 타임아웃(수십 초~2분)을 기다리는 대신 수 밀리초 안에 대체 응답으로 넘어갑니다.
+
+  - closed: 정상. 연속 실패가 failure_threshold에 도달하면 open.
+  - open: 요청 즉시 거절. probe가 있으면 백그라운드 스레드가 probe_interval마다 상태 확인을 보내 성공하면 half_open,
+          없으면 reset_timeout이 지나면 half_open.
+  - half_open: 시험 요청 하나만 통과. success_threshold번 성공하면 closed, 실패하면 다시 open.
+               시험 요청 결과가 reset_timeout 동안 보고되지 않으면 다음 요청을 새 시험 요청으로 통과시킵니다.
+"""
+import threading
+import time
+
+# --- 설정 ---
+DEFAULT_FAILURE_THRESHOLD = 3    # 이만큼 연속 실패하면 회로를 엶
+DEFAULT_RESET_TIMEOUT = 30.0     # 상태 확인이 없을 때 open 상태를 유지하는 시간 (초)
+DEFAULT_SUCCESS_THRESHOLD = 1    # half_open에서 이만큼 성공하면 회로를 닫음
+DEFAULT_PROBE_INTERVAL = 5.0     # open 상태에서 상태 확인 주기 (초)
+# --- 설정 끝 ---
+
+STATE_CLOSED = "closed"
+STATE_OPEN = "open"
+STATE_HALF_OPEN = "half_open"
+
+class CircuitOpenError(Exception):
+    """회로가 열려 있어 요청을 보내지 않았을 때 발생합니다."""
+
+    def __init__(self, name, retry_in=None):
+        self.name = name
+        self.retry_in = retry_in
+        detail = f", 약 {retry_in:.0f}초 후 재시도" if retry_in else ""
+        super().__init__(f"'{name}' 회로 차단 중 (원격 서비스 응답 없음{detail})")
+
+class CircuitBreaker:
+    """
+    의존성 하나의 회로 차단기. 스레드 안전합니다.
+
+    probe는 인자 없이 호출하면 True(정상)/False를 반환하는 함수입니다 (예: /healthz 요청).
+    주어지면 회로가 열려 있는 동안 백그라운드 스레드가 주기적으로 호출합니다.
+    """
+
+    def __init__(self, name, failure_threshold=DEFAULT_FAILURE_THRESHOLD, reset_timeout=DEFAULT_RESET_TIMEOUT,
+                 success_threshold=DEFAULT_SUCCESS_THRESHOLD, probe=None, probe_interval=DEFAULT_PROBE_INTERVAL):
+        self.name = name
+        self.failure_threshold = max(1, failure_threshold)
+        self.reset_timeout = reset_timeout
+        self.success_threshold = max(1, success_threshold)
+        self.probe = probe
+        self.probe_interval = probe_interval
+        self._lock = threading.Lock()
+        self._state = STATE_CLOSED
+        self._failures = 0        # 연속 실패 수 (closed)
+        self._successes = 0       # 연속 성공 수 (half_open)
+        self._opened_at = 0.0
+        self._trial_inflight = False
+        self._trial_started = 0.0
+        self._probe_thread = None
+        self._rejected_total = 0
+        self._opened_total = 0
+
+    @property
+    def state(self):
+        with self._lock:
+            self._maybe_half_open()
+            return self._state
+
+    def _maybe_half_open(self):
+        # 상태 확인이 없으면 reset_timeout 경과 후 시험 요청 허용 (_lock 보유 상태에서 호출)
+        if self._state == STATE_OPEN and self.probe is None and time.monotonic() - self._opened_at >= self.reset_timeout:
+            self._set_state(STATE_HALF_OPEN)
+
+    def _set_state(self, state, reason=""):
+        if state == self._state:
+            return
+        self._state = state
+        self._successes = 0
+        self._trial_inflight = False
+        if state == STATE_OPEN:
+            self._opened_at = time.monotonic()
+            self._opened_total += 1
+        elif state == STATE_CLOSED:
+            self._failures = 0
+        print(f"[circuit] {self.name}: {state}{f' ({reason})' if reason else ''}")
+        if state == STATE_OPEN and self.probe is not None and (self._probe_thread is None or not self._probe_thread.is_alive()):
+            self._probe_thread = threading.Thread(target=self._probe_loop, name=f"circuit-probe-{self.name}", daemon=True)
+            self._probe_thread.start()
+
+    def before_request(self):
+        """
+        요청을 보내기 전에 호출합니다.
+
+        Raises:
+            CircuitOpenError: 회로가 열려 있거나, half_open에서 이미 시험 요청이 진행 중인 경우.
+        """
+        with self._lock:
+            self._maybe_half_open()
+            if self._state == STATE_CLOSED:
+                return
+            if self._state == STATE_HALF_OPEN and (not self._trial_inflight or
+                                                   time.monotonic() - self._trial_started >= self.reset_timeout):
+                self._trial_inflight = True
+                self._trial_started = time.monotonic()
+                return
+            self._rejected_total += 1
+            retry_in = None # 상태 확인을 쓰면 복구 시점을 알 수 없음
+            if self._state == STATE_OPEN and self.probe is None:
+                retry_in = max(0.0, self.reset_timeout - (time.monotonic() - self._opened_at))
+        raise CircuitOpenError(self.name, retry_in)
+
+    def record_success(self):
+        with self._lock:
+            if self._state == STATE_HALF_OPEN:
+                self._trial_inflight = False
+                self._successes += 1
+                if self._successes >= self.success_threshold:
+                    self._set_state(STATE_CLOSED, "복구 확인")
+            else:
+                self._failures = 0
+
+    def record_failure(self, reason=""):
+        with self._lock:
+            if self._state == STATE_HALF_OPEN:
+                self._set_state(STATE_OPEN, f"시험 요청 실패{': ' + reason if reason else ''}")
+            elif self._state == STATE_CLOSED:
+                self._failures += 1
+                if self._failures >= self.failure_threshold:
+                    self._set_state(STATE_OPEN, f"연속 실패 {self._failures}회{': ' + reason if reason else ''}")
+
+    def record_ignored(self):
+        """성공/실패로 판단하지 않는 결과 (잘못된 요청 등): half_open 시험 요청 자리만 반납합니다."""
+        with self._lock:
+            self._trial_inflight = False
+
+    def _probe_loop(self):
+        # 회로가 닫힐 때까지 유지 (half_open 시험 요청이 실패해 다시 열리면 이어서 상태 확인)
+        while True:
+            time.sleep(self.probe_interval)
+            with self._lock:
+                if self._state == STATE_CLOSED:
+                    self._probe_thread = None
+                    return
+                if self._state != STATE_OPEN:
+                    continue
+            try:
+                healthy = bool(self.probe())
+            except Exception:
+                healthy = False
+            if healthy:
+                with self._lock:
+                    if self._state == STATE_OPEN:
+                        self._set_state(STATE_HALF_OPEN, "상태 확인 성공")
+
+    def stats(self):
+        """현재 상태와 누적 차단 횟수."""
+        with self._lock:
+            self._maybe_half_open()
+            return {
+                "state": self._state,
+                "consecutive_failures": self._failures,
+                "opened_total": self._opened_total,
+                "rejected_total": self._rejected_total,
+            }
@@ -0,0 +1,152 @@
+# -*- coding: utf-8 -*-
+"""
+인식된 텍스트를 날씨 조회 / LLM 대화로 분기하고 응답 문장을 만드는 공용 로직.
+main.py(라즈베리파이, 단계별 요청)와 app.py(/converse, 서버 측 일괄 처리)가 함께 사용합니다.
+"""
+import os
+import threading
+
+import intent_router
+import text_utils
+
+# --- 설정 ---
+WEATHER_KEYWORDS = ("날씨", "기온", "온도")
+CURRENT_LOCATION_WORDS = ("여기", "현재", "지금")
+MIN_STT_TEXT_LENGTH = 2 # 이보다 짧은 인식 결과는 처리하지 않음
+
+# 의도 / 감정 / 위치 / 도시 키워드 설정 파일 (intent_router.py 형식, 없으면 DEFAULT_INTENTS)
+INTENTS_FILE = os.getenv("INTENTS_FILE", os.path.join(os.path.dirname(os.path.abspath(__file__)), "intents.json"))
+DEFAULT_INTENTS = {
+    "intents": {"weather": list(WEATHER_KEYWORDS)},
+    "emotions": {
+        "sad": {"keywords": ["우울"], "color": "blue"},
+        "irritated": {"keywords": ["예민", "짜증"], "color": "red"},
+        "calm": {"keywords": ["안정", "차분", "평온"], "color": "green"},
+        "happy": {"keywords": ["기뻐", "행복", "신나"], "color": "yellow"},
+    },
+    "locations": {"here": list(CURRENT_LOCATION_WORDS)},
+}
+
+FALLBACK_UNAVAILABLE_TEXT = "죄송합니다. 날씨나 일반 대화 기능을 사용할 수 없습니다."
+FALLBACK_FAILED_TEXT = "죄송합니다. 요청을 처리하지 못했습니다."
+# --- 설정 끝 ---
+
+# 분기 결과
+ROUTE_WEATHER = "weather"
+ROUTE_LLM = "llm"
+ROUTE_UNAVAILABLE = "unavailable"
+
+INTENT_WEATHER = "weather"
+LOCATION_HERE = "here"
+
+_routers = {} # weather_module별 컴파일된 라우터 (도시 목록이 다름)
+_routers_lock = threading.Lock()
+
+def is_valid_stt_text(stt_text):
+    """처리할 만한 인식 결과인지 확인합니다 (비어있지 않고 최소 길이 이상)."""
+    return stt_text is not None and len(stt_text.strip()) >= MIN_STT_TEXT_LENGTH
+
+def get_router(weather_module=None):
+    """
+    설정 파일과 weather_module의 도시 목록을 컴파일한 라우터를 반환합니다 (처음 한 번만 컴파일).
+    설정 파일의 "cities"는 weather_module의 한/영 도시 이름 표에도 등록되어 get_weather()가 영어 이름으로 조회합니다.
+    """
+    key = id(weather_module)
+    router = _routers.get(key)
+    if router is not None:
+        return router
+    with _routers_lock:
+        if key not in _routers:
+            config = intent_router.load_config(INTENTS_FILE, DEFAULT_INTENTS)
+            cities = getattr(weather_module, "CITY_NAME_MAP_KO_EN", None)
+            router = intent_router.IntentRouter(config, cities)
+            if cities is not None:
+                for city_ko, city_en in config.get("cities", {}).items():
+                    weather_module.CITY_NAME_MAP_KO_EN.setdefault(city_ko, city_en)
+                    weather_module.CITY_NAME_MAP_EN_KO.setdefault(city_en, city_ko)
+            print(f"의도 라우터 컴파일 완료 (도시 {len(router.city_names)}개)")
+            _routers[key] = router
+        return _routers[key]
+
+def analyze_text(stt_text, weather_module=None):
+    """인식된 텍스트의 의도 / 감정 / 위치 / 도시를 한 번에 찾습니다 (intent_router.TextAnalysis)."""
+    return get_router(weather_module).analyze(stt_text)
+
+def detect_weather_city(stt_text, weather_module, analysis=None):
+    """
+    텍스트에서 날씨를 조회할 도시를 찾습니다.
+    이미 분석한 결과(analyze_text())가 있으면 analysis로 넘겨 다시 분석하지 않습니다.
+
+    Returns:
+        str: 한국어 도시 이름, 현재 위치 요청이면 'auto', 언급이 없으면 기본 도시.
+    """
+    if analysis is None:
+        analysis = analyze_text(stt_text, weather_module)
+    target_city = weather_module.DEFAULT_CITY_KO
+    if analysis.cities:
+        target_city = analysis.cities[0]
+        print(f"-> 대상 도시 감지: {target_city}")
+    if LOCATION_HERE in analysis.locations:
+        target_city = 'auto'
+        print("-> 현재 위치 날씨 요청 감지")
+    return target_city
+
+def route_request(stt_text, weather_module=None, language_model=None, analysis=None):
+    """
+    인식된 텍스트를 어느 기능으로 처리할지 결정합니다.
+    이미 분석한 결과(analyze_text())가 있으면 analysis로 넘겨 다시 분석하지 않습니다 (main.py: 감정 LED와 공유).
+
+    Returns:
+        tuple: (ROUTE_WEATHER | ROUTE_LLM | ROUTE_UNAVAILABLE, 날씨 대상 도시 또는 None)
+    """
+    if weather_module and analysis is None:
+        analysis = analyze_text(stt_text, weather_module)
+    if weather_module and analysis.has_intent(INTENT_WEATHER):
+        print("날씨 관련 키워드 감지됨.")
+        return ROUTE_WEATHER, detect_weather_city(stt_text, weather_module, analysis)
+    if language_model:
+        return ROUTE_LLM, None
+    return ROUTE_UNAVAILABLE, None
+
+def build_response(stt_text, route, target_city=None, weather_module=None, language_model=None):
+    """
+    route_request() 결과에 따라 응답 문장을 만듭니다. 실패하면 안내 문구로 대체합니다.
+
+    Returns:
+        str: TTS로 읽어줄 응답 문장 (항상 비어있지 않음).
+    """
+    response_text = None
+    if route == ROUTE_WEATHER:
+        print("날씨 정보 조회 시도...")
+        response_text = weather_module.get_weather(target_city)
+        print(f"-> 날씨 정보 조회 결과: {response_text if response_text else '정보 없음'}")
+    elif route == ROUTE_LLM:
+        print("LLM 응답 생성 시도...")
+        response_text = language_model.get_llm_response(stt_text)
+    else:
+        response_text = FALLBACK_UNAVAILABLE_TEXT
+
+    if not response_text:
+        response_text = FALLBACK_FAILED_TEXT
+    return response_text
+
+def stream_response_sentences(stt_text, route, target_city=None, weather_module=None, language_model=None, cancel_token=None):
+    """
+    build_response()의 스트리밍 버전: 응답을 문장 단위로 완성되는 대로 내보냅니다.
+    LLM 분기는 language_model.stream_llm_response()의 출력을 문장으로 끊어 바로 전달하고,
+    아무 문장도 나오지 않으면 안내 문구로 대체합니다 (cancel_token으로 취소된 경우는 제외).
+
+    Yields:
+        str: TTS로 읽어줄 응답 문장.
+    """
+    if route == ROUTE_LLM and hasattr(language_model, "stream_llm_response"):
+        print("LLM 스트리밍 응답 생성 시도...")
+        produced = False
+        deltas = language_model.stream_llm_response(stt_text, cancel_token=cancel_token) if cancel_token else language_model.stream_llm_response(stt_text)
+        for sentence in text_utils.split_sentence_stream(deltas):
+            produced = True
+            yield sentence
+        if not produced and not (cancel_token is not None and cancel_token.cancelled):
+            yield FALLBACK_FAILED_TEXT
+        return
+    yield from text_utils.split_sentences(build_response(stt_text, route, target_city, weather_module, language_model))
@@ -0,0 +1,61 @@
+# -*- coding: utf-8 -*-
+"""
+/converse 응답 스트림의 프레임 형식.
+한 응답 안에 인식 텍스트, 응답 텍스트, 합성 오디오를 순서대로 담기 위해
+[종류 1바이트][길이 4바이트 빅엔디언][페이로드] 프레임을 이어 붙입니다.
+
+  T: 인식 결과 JSON      {"text": ...}
+  R: 응답 JSON           {"text": ..., "route": ..., "audio": {"format": ..., "sample_rate": ...}}
+  A: 오디오 바이트       (wav 형식이면 첫 A 프레임이 스트리밍용 WAV 헤더)
+  X: 오류 JSON           {"error": ...}
+  E: 종료 (페이로드 없음)
+"""
+import json
+import struct
+
+FRAME_TRANSCRIPT = b'T'
+FRAME_REPLY = b'R'
+FRAME_AUDIO = b'A'
+FRAME_ERROR = b'X'
+FRAME_END = b'E'
+
+_HEADER = struct.Struct('>cI')
+MIMETYPE = 'application/x-converse-frames'
+
+def encode_frame(kind, payload=b''):
+    """프레임 하나를 바이트로 만듭니다."""
+    return _HEADER.pack(kind, len(payload)) + payload
+
+def encode_json_frame(kind, obj):
+    """JSON 페이로드 프레임을 만듭니다."""
+    return encode_frame(kind, json.dumps(obj, ensure_ascii=False).encode('utf-8'))
+
+def _read_exact(stream, size):
+    chunks = []
+    remaining = size
+    while remaining > 0:
+        chunk = stream.read(remaining)
+        if not chunk:
+            raise EOFError("프레임을 읽는 중 스트림이 끝났습니다")
+        chunks.append(chunk)
+        remaining -= len(chunk)
+    return b''.join(chunks)
+
+def read_frames(stream):
+    """
+    파일 형태의 스트림(read(n) 지원, 예: requests의 response.raw)에서 프레임을 차례로 읽습니다.
+
+    Yields:
+        tuple: (종류 바이트, 페이로드 bytes). JSON 프레임은 json.loads(payload)로 해석합니다.
+    """
+    while True:
+        header = stream.read(_HEADER.size)
+        if not header:
+            return
+        if len(header) < _HEADER.size:
+            header += _read_exact(stream, _HEADER.size - len(header))
+        kind, length = _HEADER.unpack(header)
+        payload = _read_exact(stream, length) if length else b''
+        yield kind, payload
+        if kind == FRAME_END:
+            return
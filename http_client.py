@@ -0,0 +1,279 @@
+# -*- coding: utf-8 -*-
+"""
+공용 HTTP 클라이언트 (연결 재사용 세션).
+main.py, language_model.py, weather_module.py가 요청마다 새 TCP(+TLS) 연결을 맺지 않도록
+호스트별 연결 풀과 keep-alive를 가진 requests.Session 하나를 프로세스 안에서 공유합니다.
+
+  - 재시도: 연결 실패는 모든 요청, 502/503/504/429 응답은 GET만 재시도 (지터가 섞인 지수 백오프)
+  - 타임아웃: 엔드포인트별 (연결, 읽기) 기본값, HTTP_TIMEOUT_<엔드포인트> 환경 변수로 변경
+  - 압축: HTTP_COMPRESSION=1이면 gzip/deflate 응답을 요청 (0이면 identity)
+  - 추적: 진행 중인 턴이 있으면 PC 서버 요청에 턴 ID 헤더를 붙임 (tracing.py)
+  - 회로 차단: 엔드포인트별로 연속 실패(연결 실패, 타임아웃, 5xx)가 쌓이면 이후 요청을 보내지 않고
+    CircuitOpenError(requests ConnectionError의 하위 클래스)를 즉시 발생 (circuit_breaker.py, 상태 확인 URL 등록 시 백그라운드 확인)
+    stream=True 요청은 헤더 도착이 아니라 본문을 다 읽은 결과로 판정하므로, 본문을 읽는 구간을
+    stream_outcome(response)로 감싸야 합니다 (중간에 멈춘 LLM 스트림 / 대화 프레임도 실패로 셈)
+
+예외는 requests 예외(requests.exceptions.*)가 그대로 올라오므로 호출부의 기존 예외 처리가 유지됩니다.
+"""
+import contextlib
+import os
+import random
+import threading
+
+import requests
+from dotenv import load_dotenv
+from requests.adapters import HTTPAdapter
+from urllib3.exceptions import ProtocolError, ReadTimeoutError
+from urllib3.util.retry import Retry
+
+import circuit_breaker
+import tracing
+
+# --- 설정 ---
+load_dotenv()
+
+HTTP_POOL_CONNECTIONS = int(os.getenv("HTTP_POOL_CONNECTIONS", 4)) # 연결 풀을 유지할 호스트 수 (PC 서버, LM Studio, OpenWeather, ipinfo)
+HTTP_POOL_MAXSIZE = int(os.getenv("HTTP_POOL_MAXSIZE", 4))         # 호스트당 유지할 연결 수 (동시 TTS 합성 수 이상)
+HTTP_RETRIES = int(os.getenv("HTTP_RETRIES", 2))                   # 최대 재시도 횟수 (0이면 재시도 안 함)
+HTTP_BACKOFF_FACTOR = float(os.getenv("HTTP_BACKOFF_FACTOR", 0.3)) # 재시도 대기 = factor * 2^(n-1) 초 (지터 적용 전)
+HTTP_BACKOFF_MAX = float(os.getenv("HTTP_BACKOFF_MAX", 5.0))       # 재시도 대기 상한 (초)
+HTTP_COMPRESSION = os.getenv("HTTP_COMPRESSION", "1") == "1"       # 압축 응답(gzip/deflate) 허용
+
+RETRY_STATUS_CODES = (429, 502, 503, 504)
+
+# 엔드포인트별 기본 타임아웃 (연결, 읽기) 초
+DEFAULT_TIMEOUTS = {
+    "stt": (5, 30),
+    "stt_stream": (5, 30),
+    "tts": (5, 30),
+    "converse": (10, 150),  # LLM 응답 시간(최대 120초) 포함
+    "llm": (5, 120),
+    "ipinfo": (3, 5),
+    "weather": (3, 10),
+}
+DEFAULT_TIMEOUT = (5, 30) # 목록에 없는 엔드포인트
+
+# 회로 차단 (endpoint를 지정한 요청에만 적용)
+CIRCUIT_ENABLED = os.getenv("CIRCUIT_ENABLED", "1") == "1"
+CIRCUIT_FAILURE_THRESHOLD = int(os.getenv("CIRCUIT_FAILURE_THRESHOLD", circuit_breaker.DEFAULT_FAILURE_THRESHOLD)) # 회로를 여는 연속 실패 수
+CIRCUIT_RESET_SECONDS = float(os.getenv("CIRCUIT_RESET_SECONDS", circuit_breaker.DEFAULT_RESET_TIMEOUT))         # 상태 확인 URL이 없을 때 시험 요청까지 대기
+CIRCUIT_SUCCESS_THRESHOLD = int(os.getenv("CIRCUIT_SUCCESS_THRESHOLD", circuit_breaker.DEFAULT_SUCCESS_THRESHOLD)) # 회로를 닫는 시험 요청 성공 수
+CIRCUIT_PROBE_INTERVAL = float(os.getenv("CIRCUIT_PROBE_INTERVAL", circuit_breaker.DEFAULT_PROBE_INTERVAL))      # 상태 확인 주기 (초)
+CIRCUIT_PROBE_TIMEOUT = float(os.getenv("CIRCUIT_PROBE_TIMEOUT", 1.0))                                           # 상태 확인 요청 타임아웃 (초)
+CIRCUIT_FAILURE_STATUS_CODES = (500, 502, 503, 504) # 실패로 세는 응답 (429 과부하 거절은 서버가 살아 있으므로 제외)
+# 스트리밍 본문을 읽다가 나면 실패로 세는 예외 (response.raw를 직접 읽으면 urllib3 예외가 그대로 올라옴)
+STREAM_FAILURE_ERRORS = (requests.exceptions.ConnectionError, requests.exceptions.Timeout,
+                         requests.exceptions.ChunkedEncodingError, ReadTimeoutError, ProtocolError, TimeoutError)
+# --- 설정 끝 ---
+
+_session = None
+_session_pid = None
+_session_lock = threading.Lock()
+_breakers = {}     # 엔드포인트별 회로 차단기
+_probe_urls = {}   # 엔드포인트별 상태 확인 URL (configure_circuit)
+_breakers_pid = None
+
+class CircuitOpenError(circuit_breaker.CircuitOpenError, requests.exceptions.ConnectionError):
+    """회로가 열려 요청을 보내지 않음. 기존의 requests 예외 처리(연결 실패)로 그대로 처리됩니다."""
+
+class JitteredRetry(Retry):
+    """지수 백오프 대기 시간에 무작위 지터를 섞어, 여러 클라이언트가 같은 순간에 다시 몰리지 않게 합니다."""
+
+    def get_backoff_time(self):
+        backoff = min(HTTP_BACKOFF_MAX, super().get_backoff_time())
+        if backoff <= 0:
+            return 0
+        # 'equal jitter': 대기 시간의 절반은 보장하고 나머지 절반은 무작위
+        return backoff / 2 + random.uniform(0, backoff / 2)
+
+def _parse_timeout(value, default):
+    """'30' 또는 '5,30' 형식의 환경 변수 값을 (연결, 읽기) 튜플로 바꿉니다."""
+    try:
+        parts = [float(part) for part in value.split(",")]
+    except ValueError:
+        print(f"경고: 잘못된 타임아웃 값 '{value}' - 기본값 {default} 사용")
+        return default
+    if len(parts) == 1:
+        return (default[0], parts[0])
+    return (parts[0], parts[1])
+
+def timeout_for(endpoint):
+    """
+    엔드포인트의 (연결, 읽기) 타임아웃을 반환합니다.
+
+    Args:
+        endpoint (str): DEFAULT_TIMEOUTS의 키 (예: "stt", "llm"). 환경 변수 HTTP_TIMEOUT_<ENDPOINT>가 있으면 우선.
+
+    Returns:
+        tuple: (연결 타임아웃, 읽기 타임아웃) 초.
+    """
+    default = DEFAULT_TIMEOUTS.get(endpoint, DEFAULT_TIMEOUT)
+    override = os.getenv(f"HTTP_TIMEOUT_{endpoint.upper()}") if endpoint else None
+    return _parse_timeout(override, default) if override else default
+
+def create_session():
+    """재시도/연결 풀/압축 설정을 적용한 새 requests.Session을 만듭니다."""
+    retry = JitteredRetry(
+        total=HTTP_RETRIES,
+        connect=HTTP_RETRIES,
+        read=HTTP_RETRIES,      # 읽기 오류는 allowed_methods(GET 등 멱등 요청)만 재시도
+        status=HTTP_RETRIES,
+        status_forcelist=RETRY_STATUS_CODES,
+        backoff_factor=HTTP_BACKOFF_FACTOR,
+        respect_retry_after_header=True,
+        raise_on_status=False,  # 재시도 후에도 실패 응답이면 그대로 반환 (호출부에서 raise_for_status)
+    )
+    adapter = HTTPAdapter(pool_connections=HTTP_POOL_CONNECTIONS, pool_maxsize=HTTP_POOL_MAXSIZE, max_retries=retry)
+    session = requests.Session()
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    session.headers["Accept-Encoding"] = "gzip, deflate" if HTTP_COMPRESSION else "identity"
+    return session
+
+def get_session():
+    """
+    프로세스 공용 세션을 반환합니다 (처음 호출 시 생성).
+    포크된 자식 프로세스(serve.py 워커)에서는 부모의 소켓을 공유하지 않도록 새로 만듭니다.
+    """
+    global _session, _session_pid
+    pid = os.getpid()
+    if _session is not None and _session_pid == pid:
+        return _session
+    with _session_lock:
+        if _session is None or _session_pid != pid:
+            _session = create_session()
+            _session_pid = pid
+        return _session
+
+def _probe(url):
+    # 상태 확인은 재시도 없는 짧은 요청 (공용 세션의 재시도/긴 타임아웃을 쓰지 않음)
+    return requests.get(url, timeout=CIRCUIT_PROBE_TIMEOUT).status_code < 500
+
+def configure_circuit(endpoint, probe_url=None):
+    """
+    엔드포인트의 상태 확인 URL을 등록합니다. 회로가 열려 있는 동안 이 URL이 응답하면 시험 요청을 허용합니다
+    (등록하지 않으면 CIRCUIT_RESET_SECONDS 후 시험 요청).
+    """
+    with _session_lock:
+        _probe_urls[endpoint] = probe_url
+        _breakers.pop(endpoint, None) # 다음 요청에서 새 설정으로 생성
+
+def get_breaker(endpoint):
+    """엔드포인트의 회로 차단기 (처음 호출 시 생성, 포크된 자식 프로세스에서는 새로 생성)."""
+    global _breakers_pid
+    with _session_lock:
+        if _breakers_pid != os.getpid():
+            _breakers.clear()
+            _breakers_pid = os.getpid()
+        breaker = _breakers.get(endpoint)
+        if breaker is None:
+            probe_url = _probe_urls.get(endpoint)
+            breaker = _breakers[endpoint] = circuit_breaker.CircuitBreaker(
+                endpoint, failure_threshold=CIRCUIT_FAILURE_THRESHOLD, reset_timeout=CIRCUIT_RESET_SECONDS,
+                success_threshold=CIRCUIT_SUCCESS_THRESHOLD, probe_interval=CIRCUIT_PROBE_INTERVAL,
+                probe=(lambda: _probe(probe_url)) if probe_url else None)
+        return breaker
+
+def circuit_open(endpoint):
+    """엔드포인트의 회로가 열려 있어 요청이 즉시 거절되는 상태인지 확인합니다."""
+    return CIRCUIT_ENABLED and get_breaker(endpoint).state == circuit_breaker.STATE_OPEN
+
+def circuit_stats():
+    """엔드포인트별 회로 상태 (지금까지 요청한 엔드포인트만)."""
+    with _session_lock:
+        breakers = dict(_breakers)
+    return {endpoint: breaker.stats() for endpoint, breaker in breakers.items()}
+
+def request(method, url, endpoint=None, **kwargs):
+    """
+    공용 세션으로 HTTP 요청을 보냅니다. timeout을 주지 않으면 엔드포인트 기본 타임아웃을 사용합니다.
+    추적 전파 대상 URL이면 현재 턴 ID 헤더(X-Turn-Id)를 붙입니다.
+
+    Args:
+        method (str): HTTP 메서드.
+        url (str): 요청 URL.
+        endpoint (str): 타임아웃 설정 키 (timeout_for 참고).
+        **kwargs: requests.Session.request 인자.
+
+    Returns:
+        requests.Response: 응답 객체.
+
+    Raises:
+        CircuitOpenError: 엔드포인트의 회로가 열려 있어 요청을 보내지 않은 경우.
+    """
+    kwargs.setdefault("timeout", timeout_for(endpoint))
+    trace_headers = tracing.propagation_headers(url)
+    if trace_headers:
+        kwargs["headers"] = {**trace_headers, **(kwargs.get("headers") or {})}
+    if not (CIRCUIT_ENABLED and endpoint):
+        return get_session().request(method, url, **kwargs)
+
+    breaker = get_breaker(endpoint)
+    try:
+        breaker.before_request()
+    except circuit_breaker.CircuitOpenError as e:
+        raise CircuitOpenError(e.name, e.retry_in) from None
+    try:
+        response = get_session().request(method, url, **kwargs)
+    except (requests.exceptions.ConnectionError, requests.exceptions.Timeout) as e:
+        breaker.record_failure(type(e).__name__)
+        raise
+    except BaseException:
+        breaker.record_ignored()
+        raise
+    if response.status_code in CIRCUIT_FAILURE_STATUS_CODES:
+        breaker.record_failure(f"HTTP {response.status_code}")
+    elif kwargs.get("stream"):
+        response._circuit_breaker = breaker # 본문을 다 읽은 뒤 stream_outcome()에서 판정
+    else:
+        breaker.record_success()
+    return response
+
+def finish_stream(response, ok, reason=""):
+    """
+    stream=True 응답의 결과를 회로에 한 번만 기록합니다 (ok: True 성공, False 실패, None 판단하지 않음).
+    보통은 stream_outcome()이 호출합니다.
+    """
+    breaker = response.__dict__.pop("_circuit_breaker", None)
+    if breaker is None:
+        return
+    if ok is None:
+        breaker.record_ignored()
+    elif ok:
+        breaker.record_success()
+    else:
+        breaker.record_failure(reason)
+
+@contextlib.contextmanager
+def stream_outcome(response, cancel_token=None):
+    """
+    stream=True 응답 본문을 읽는 구간을 감싸 결과를 엔드포인트 회로에 기록합니다.
+    끝까지 읽으면 성공, 읽는 중 연결 끊김/읽기 시간 초과(STREAM_FAILURE_ERRORS)면 실패로 셉니다.
+    cancel_token(끼어들기)이 취소되어 멈췄거나 다른 예외(잘못된 응답 형식 등)로 끝나면 판단하지 않습니다.
+    """
+    cancelled = lambda: cancel_token is not None and cancel_token.cancelled
+    try:
+        yield response
+    except STREAM_FAILURE_ERRORS as e:
+        finish_stream(response, None if cancelled() else False, f"스트림 중단: {type(e).__name__}")
+        raise
+    except BaseException:
+        finish_stream(response, None)
+        raise
+    finish_stream(response, None if cancelled() else True)
+
+def get(url, endpoint=None, **kwargs):
+    """공용 세션으로 GET 요청을 보냅니다."""
+    return request("GET", url, endpoint=endpoint, **kwargs)
+
+def post(url, endpoint=None, **kwargs):
+    """공용 세션으로 POST 요청을 보냅니다 (연결 실패만 재시도, 응답 상태 재시도 없음)."""
+    return request("POST", url, endpoint=endpoint, **kwargs)
+
+def close():
+    """공용 세션의 연결을 모두 닫습니다 (프로그램 종료 시)."""
+    global _session
+    with _session_lock:
+        if _session is not None:
+            _session.close()
+            _session = None
@@ -0,0 +1,199 @@
+# -*- coding: utf-8 -*-
+"""
+설정 파일 기반 다중 키워드 의도 라우터.
+의도(날씨 등), 감정, 위치 표현, 도시 이름 키워드를 한 번에 Aho-Corasick 오토마톤으로 컴파일하고,
+인식된 텍스트를 한 번 훑어서 일치하는 의도 / 감정 / 개체를 모두 찾습니다.
+키워드가 수십 개에서 도시 수천 개로 늘어나도 한 번의 분석 비용은 텍스트 길이(+ 일치 수)에만 비례합니다.
+
+설정 파일 (JSON, conversation.py의 INTENTS_FILE):
+  {
+    "intents":   {"weather": ["날씨", "기온"]},            텍스트 어디에든 있으면 일치 (부분 문자열)
+    "emotions":  {"sad": {"keywords": ["우울"], "color": "blue"}},  먼저 적힌 감정이 우선
+    "locations": {"here": ["여기", "현재"]},               단어 시작 위치에서만 일치 ("지금은" O, "방금" X)
+    "cities":    {"대구": "Daegu"}                        단어 시작 위치에서만 일치 ("서울의" O, "경서울" X)
+  }
+영문 키워드는 대소문자를 구분하지 않습니다.
+"""
+import json
+import os
+import unicodedata
+from collections import deque
+
+# --- 설정 ---
+KIND_INTENT = "intent"
+KIND_EMOTION = "emotion"
+KIND_LOCATION = "location"
+KIND_CITY = "city"
+WORD_START_KINDS = (KIND_LOCATION, KIND_CITY) # 단어 시작 위치에서만 일치시키는 종류
+# --- 설정 끝 ---
+
+class KeywordAutomaton:
+    """
+    Aho-Corasick 다중 패턴 검색기. add()로 (패턴, 값)을 모두 넣고 build()한 뒤 find_all()로 검색합니다.
+    노드는 리스트 인덱스로 다루며, 각 노드의 출력에는 실패 링크로 이어지는 더 짧은 패턴들도 미리 합쳐 둡니다.
+    """
+
+    def __init__(self):
+        self._goto = [{}]    # 노드별 {문자: 다음 노드}
+        self._fail = [0]     # 노드별 실패 링크
+        self._output = [[]]  # 노드별 [(패턴 길이, 값)]
+        self._built = False
+
+    def add(self, pattern, value):
+        """패턴을 추가합니다 (build() 전에만)."""
+        if self._built:
+            raise RuntimeError("build() 이후에는 패턴을 추가할 수 없습니다")
+        if not pattern:
+            return
+        node = 0
+        for char in pattern:
+            next_node = self._goto[node].get(char)
+            if next_node is None:
+                next_node = len(self._goto)
+                self._goto[node][char] = next_node
+                self._goto.append({})
+                self._fail.append(0)
+                self._output.append([])
+            node = next_node
+        self._output[node].append((len(pattern), value))
+
+    def build(self):
+        """실패 링크를 계산합니다 (너비 우선)."""
+        queue = deque(self._goto[0].values())
+        while queue:
+            node = queue.popleft()
+            for char, child in self._goto[node].items():
+                queue.append(child)
+                if node:
+                    fail = self._fail[node]
+                    while fail and char not in self._goto[fail]:
+                        fail = self._fail[fail]
+                    self._fail[child] = self._goto[fail].get(char, 0)
+                self._output[child] = self._output[child] + self._output[self._fail[child]]
+        self._built = True
+        return self
+
+    def find_all(self, text):
+        """
+        text에서 일치하는 모든 패턴을 찾습니다 (겹치는 일치 포함).
+
+        Yields:
+            tuple: (시작 인덱스, 끝 인덱스(미포함), 값)
+        """
+        if not self._built:
+            self.build()
+        goto, fail, output = self._goto, self._fail, self._output
+        node = 0
+        for index, char in enumerate(text):
+            while node and char not in goto[node]:
+                node = fail[node]
+            node = goto[node].get(char, 0)
+            for length, value in output[node]:
+                yield index + 1 - length, index + 1, value
+
+    def __len__(self):
+        return len(self._goto)
+
+def normalize(text):
+    """검색용 정규화: NFC(한글 자모 조합 통일) + 소문자."""
+    return unicodedata.normalize("NFC", text).casefold()
+
+def _is_word_start(text, index):
+    return index == 0 or not text[index - 1].isalnum()
+
+class TextAnalysis:
+    """한 텍스트의 분석 결과. 감정을 뺀 목록은 텍스트에 나온 순서입니다."""
+
+    def __init__(self, intents, emotions, locations, cities):
+        self.intents = intents       # 일치한 의도 이름 목록
+        self.emotions = emotions     # 일치한 감정 이름 목록 (설정 우선순위 순)
+        self.locations = locations   # 일치한 위치 표현 이름 목록 (예: "here")
+        self.cities = cities         # 언급된 도시 이름 목록 (설정의 한국어 이름)
+
+    @property
+    def emotion(self):
+        """가장 우선순위가 높은 감정 (없으면 None)."""
+        return self.emotions[0] if self.emotions else None
+
+    def has_intent(self, name):
+        return name in self.intents
+
+    def __repr__(self):
+        return (f"TextAnalysis(intents={self.intents}, emotions={self.emotions}, "
+                f"locations={self.locations}, cities={self.cities})")
+
+class IntentRouter:
+    """
+    설정(dict)을 오토마톤 하나로 컴파일한 라우터. 만든 뒤에는 키워드가 바뀌지 않으므로 스레드 간에 공유해도 됩니다.
+
+    cities 인자로 받은 {한국어 이름: 영어 이름}은 설정의 "cities"와 합쳐집니다 (예: weather_module의 도시 목록).
+    """
+
+    def __init__(self, config, cities=None):
+        self.config = config
+        self.emotion_colors = {}
+        self.city_names = dict(cities or {})
+        self.city_names.update(config.get("cities", {}))
+        self._emotion_rank = {}
+        automaton = KeywordAutomaton()
+        for name, keywords in config.get("intents", {}).items():
+            for keyword in keywords:
+                automaton.add(normalize(keyword), (KIND_INTENT, name))
+        for rank, (name, spec) in enumerate(config.get("emotions", {}).items()):
+            keywords = spec.get("keywords", []) if isinstance(spec, dict) else spec
+            self._emotion_rank[name] = rank
+            if isinstance(spec, dict) and spec.get("color"):
+                self.emotion_colors[name] = spec["color"]
+            for keyword in keywords:
+                automaton.add(normalize(keyword), (KIND_EMOTION, name))
+        for name, keywords in config.get("locations", {}).items():
+            for keyword in keywords:
+                automaton.add(normalize(keyword), (KIND_LOCATION, name))
+        for city_ko in self.city_names:
+            automaton.add(normalize(city_ko), (KIND_CITY, city_ko))
+        self._automaton = automaton.build()
+
+    def analyze(self, text):
+        """
+        텍스트를 한 번 훑어 의도 / 감정 / 위치 / 도시를 모두 찾습니다.
+
+        Returns:
+            TextAnalysis: 분석 결과 (text가 비어 있으면 빈 결과).
+        """
+        normalized = normalize(text or "")
+        found = {KIND_INTENT: [], KIND_EMOTION: [], KIND_LOCATION: [], KIND_CITY: []}
+        city_spans = {} # 시작 위치별 가장 긴 도시 이름 ("부산" / "부산진"이 겹치면 "부산진")
+        for start, end, (kind, name) in self._automaton.find_all(normalized):
+            if kind in WORD_START_KINDS and not _is_word_start(normalized, start):
+                continue
+            if kind == KIND_CITY:
+                if end - start > city_spans.get(start, (0, None))[0]:
+                    city_spans[start] = (end - start, name)
+                continue
+            if name not in found[kind]:
+                found[kind].append(name)
+        cities = []
+        for start in sorted(city_spans):
+            name = city_spans[start][1]
+            if name not in cities:
+                cities.append(name)
+        emotions = sorted(found[KIND_EMOTION], key=self._emotion_rank.get)
+        return TextAnalysis(found[KIND_INTENT], emotions, found[KIND_LOCATION], cities)
+
+def load_config(path, default=None):
+    """
+    JSON 설정 파일을 읽습니다. 파일이 없거나 형식이 잘못되었으면 경고 후 default를 반환합니다.
+    """
+    if not path or not os.path.exists(path):
+        if path:
+            print(f"경고: 의도 설정 파일 '{path}'이 없습니다. 기본 키워드를 사용합니다.")
+        return default or {}
+    try:
+        with open(path, encoding='utf-8') as f:
+            config = json.load(f)
+        if not isinstance(config, dict):
+            raise ValueError("최상위 값이 객체가 아닙니다")
+        return config
+    except (OSError, ValueError) as e:
+        print(f"경고: 의도 설정 파일 '{path}'을 읽지 못했습니다 ({e}). 기본 키워드를 사용합니다.")
+        return default or {}
@@ -1,4 +1,5 @@
 import requests
+import http_client # 공용 HTTP 세션 (keep-alive / 재시도)
 import os
 import json
 from dotenv import load_dotenv
@@ -13,9 +14,10 @@ load_dotenv()
 DEFAULT_LM_STUDIO_BASE_URL = "http://172.30.1.80:5412/v1" # 사용자가 알려준 주소 기반
 LM_STUDIO_URL = os.getenv("LM_STUDIO_URL", DEFAULT_LM_STUDIO_BASE_URL)
 CHAT_ENDPOINT = f"{LM_STUDIO_URL}/chat/completions" # 채팅 완료 엔드포인트
+http_client.configure_circuit("llm", f"{LM_STUDIO_URL}/models") # 회로가 열려 있는 동안 LM Studio 상태 확인
 
-# API 요청 타임아웃 (초)
-REQUEST_TIMEOUT = 120 # LLM 응답은 시간이 걸릴 수 있으므로 길게 설정
+# API 요청 타임아웃 (연결, 읽기) 초 - LLM 응답은 시간이 걸릴 수 있으므로 길게 설정 (HTTP_TIMEOUT_LLM으로 변경)
+REQUEST_TIMEOUT = http_client.timeout_for("llm")
 # --- 설정 끝 ---
 
 def get_llm_response(prompt, max_tokens=150, temperature=0.7):
@@ -53,7 +55,7 @@ def get_llm_response(prompt, max_tokens=150, temperature=0.7):
     try:
         print(f"LM Studio 요청 시작 (Endpoint: {CHAT_ENDPOINT})...")
         print(f"  - 프롬프트: {prompt[:50]}...") # 프롬프트 일부만 출력
-        response = requests.post(CHAT_ENDPOINT, headers=headers, json=payload, timeout=REQUEST_TIMEOUT)
+        response = http_client.post(CHAT_ENDPOINT, endpoint="llm", headers=headers, json=payload)
         response.raise_for_status() # HTTP 오류 발생 시 예외 처리
 
         # 응답 JSON 파싱
@@ -79,7 +81,7 @@ def get_llm_response(prompt, max_tokens=150, temperature=0.7):
             return None
 
     except requests.exceptions.Timeout:
-        print(f"오류: LM Studio API 요청 시간 초과 ({REQUEST_TIMEOUT}초)")
+        print(f"오류: LM Studio API 요청 시간 초과 ({REQUEST_TIMEOUT[1]}초)")
         return None
     except requests.exceptions.RequestException as req_err:
         print(f"LM Studio API 요청 오류 발생: {req_err}")
@@ -93,6 +95,75 @@ def get_llm_response(prompt, max_tokens=150, temperature=0.7):
         print(f"LLM 응답 처리 중 예상치 못한 오류 발생: {e}")
         return None
 
+def stream_llm_response(prompt, max_tokens=150, temperature=0.7, cancel_token=None):
+    """
+    LM Studio API에 스트리밍("stream": true)으로 요청하여 생성되는 텍스트 조각을 차례로 내보냅니다.
+    전체 응답을 기다리지 않고 첫 문장부터 TTS/재생을 시작할 때 사용합니다.
+
+    Args:
+        prompt (str): 사용자 입력 또는 LLM에게 전달할 프롬프트.
+        max_tokens (int): 생성할 최대 토큰 수.
+        temperature (float): 샘플링 온도 (창의성 조절).
+        cancel_token (barge_in.CancelToken): 취소되면 응답 연결을 닫아 LM Studio의 생성을 멈춥니다.
+
+    Yields:
+        str: 생성된 텍스트 조각 (delta). 오류가 발생하면 그 시점에서 종료합니다.
+    """
+    if not LM_STUDIO_URL or "your_lm_studio_url" in LM_STUDIO_URL: # URL 설정 확인
+         print("오류: LM Studio URL이 설정되지 않았습니다.")
+         return
+
+    headers = {"Content-Type": "application/json", "Accept": "text/event-stream"}
+    payload = {
+        "model": "loaded-model",
+        "messages": [
+            {"role": "user", "content": prompt}
+        ],
+        "temperature": temperature,
+        "max_tokens": max_tokens,
+        "stream": True,
+    }
+
+    try:
+        print(f"LM Studio 스트리밍 요청 시작 (Endpoint: {CHAT_ENDPOINT})...")
+        print(f"  - 프롬프트: {prompt[:50]}...")
+        with http_client.post(CHAT_ENDPOINT, endpoint="llm", headers=headers, json=payload, stream=True) as response:
+            cancel_callback = cancel_token.on_cancel(response.close) if cancel_token else None
+            try:
+                response.raise_for_status()
+                response.encoding = 'utf-8'
+                # OpenAI 호환 SSE: "data: {...}" 줄이 이어지고 "data: [DONE]"으로 끝남
+                with http_client.stream_outcome(response, cancel_token): # 본문 도중에 멈추면 회로 실패
+                    for line in response.iter_lines(decode_unicode=True):
+                        if not line or not line.startswith("data:"):
+                            continue
+                        data = line[len("data:"):].strip()
+                        if data == "[DONE]":
+                            break
+                        choices = json.loads(data).get("choices") or [{}]
+                        content = choices[0].get("delta", {}).get("content")
+                        if content:
+                            yield content
+            except Exception:
+                if cancel_token is not None and cancel_token.cancelled:
+                    print("LM Studio 스트리밍 요청 취소됨.")
+                    return
+                raise
+            finally:
+                if cancel_callback is not None:
+                    cancel_token.remove(cancel_callback)
+        print("LM Studio 스트리밍 응답 수신 완료.")
+
+    except requests.exceptions.Timeout:
+        print(f"오류: LM Studio API 요청 시간 초과 ({REQUEST_TIMEOUT[1]}초)")
+    except requests.exceptions.RequestException as req_err:
+        print(f"LM Studio API 요청 오류 발생: {req_err}")
+        print("LM Studio 서버가 실행 중이고 URL이 올바른지 확인하세요.")
+    except json.JSONDecodeError as json_err:
+        print(f"LM Studio 스트리밍 응답 JSON 파싱 오류: {json_err}")
+    except Exception as e:
+        print(f"LLM 스트리밍 응답 처리 중 예상치 못한 오류 발생: {e}")
+
 # --- 모듈 테스트 코드 ---
 if __name__ == "__main__":
     # .env 파일 사용을 위해 python-dotenv 설치 필요
@@ -1,74 +1,88 @@
 # -*- coding: utf-8 -*-
+import time      # 시간 관련 함수 사용 (sleep 추가)
+STARTUP_STARTED = time.perf_counter() # 시작 단계 시간 측정 기준 (모듈 임포트 포함)
 import os
-import requests # PC 서버 API 호출용
+import requests # 요청 예외 처리용
+import http_client # PC 서버 API 호출용 공용 세션 (keep-alive / 재시도)
 import subprocess # 외부 명령어(arecord, aplay) 실행용
 import json      # JSON 데이터 처리용
-import time      # 시간 관련 함수 사용 (sleep 추가)
+import threading # aplay 입력 공급 스레드
+import functools # 재생/합성 함수에 취소 토큰 바인딩
+import concurrent.futures # 시작 시 하위 시스템 병렬 초기화
+import contextlib # 직접 재생 시 응답 파일 대신 빈 컨텍스트
 from dotenv import load_dotenv # .env 파일 로드용
 import traceback # 오류 상세 출력을 위해 추가
+import conversation # 날씨 / LLM 분기 (서버 /converse와 공용)
+import converse_protocol # /converse 응답 프레임 해석
+import audio_utils # WAV 헤더 작성
+import vad # 발화 끝점 검출 (VAD)
+import capture_stream # 상시 오디오 캡처 (링 버퍼)
+import turn_pipeline # 응답 생성 / TTS / 재생 파이프라인
+import wake_word # 온디바이스 호출어 검출
+import barge_in # 끼어들기 감지 / 턴 취소
+import audio_output # 지속 출력 스트림 (응답 PCM 직접 재생)
+import tracing # 턴 단위 지연 시간 추적 (JSONL)
+
+# --- .env 파일 로드 ---
+dotenv_path = os.path.join(os.path.dirname(__file__), '.env')
+if os.path.exists(dotenv_path):
+    load_dotenv(dotenv_path=dotenv_path)
+    print(".env 파일 로드 완료.")
+else:
+    print("경고: .env 파일을 찾을 수 없습니다. 환경 변수 또는 기본값을 사용합니다.")
 
-# --- 사용자 정의 모듈 임포트 ---
+# --- 사용자 정의 모듈 ---
 led_controller = None
 weather_module = None
 language_model = None
 
-print("모듈 로드 시도...")
-# (모듈 임포트 로직 - led_controller)
-try:
-    import led_controller
-    print("  - led_controller 모듈 임포트 성공.")
+def load_led_controller():
+    """led_controller를 임포트하고 초기화합니다 (GPIO + NeoPixel). 실패하면 None (LED 기능 비활성화)."""
+    try:
+        import led_controller as module
+        print("  - led_controller 모듈 임포트 성공.")
 
-    # --- led_controller 초기화 호출 및 결과 확인 ---
-    print("  - led_controller.initialize() 호출 시도...")
-    initialization_result = led_controller.initialize() # 결과를 변수에 저장
-    print(f"  - led_controller.initialize() 반환값: {initialization_result}") # 반환값 직접 출력
+        # --- led_controller 초기화 호출 및 결과 확인 ---
+        print("  - led_controller.initialize() 호출 시도...")
+        initialization_result = module.initialize() # 결과를 변수에 저장
+        print(f"  - led_controller.initialize() 반환값: {initialization_result}") # 반환값 직접 출력
 
-    if initialization_result:
-        print("  - led_controller 초기화 성공 (main.py에서 확인). LED 기능 활성화됨.")
-    else:
+        if initialization_result:
+            print("  - led_controller 초기화 성공 (main.py에서 확인). LED 기능 활성화됨.")
+            return module
         print("  - 오류: led_controller.initialize() 호출 실패. LED 기능 비활성화됨.")
-        led_controller = None
-
-except ImportError:
-    print("  - 경고: led_controller.py 파일을 찾거나 임포트할 수 없습니다. LED 기능이 비활성화됩니다.")
-    led_controller = None
-except Exception as e:
-    print(f"  - 경고: led_controller 모듈 로드/초기화 중 예외 발생 ({e}). LED 기능 비활성화됨.")
-    traceback.print_exc()
-    led_controller = None
-
-# (weather_module, language_model 임포트 로직은 그대로)
-try:
-    import weather_module
-    print("  - weather_module 모듈 로드 성공.")
-except ImportError:
-    print("  - 경고: weather_module.py 파일을 찾거나 임포트할 수 없습니다. 날씨 기능이 비활성화됩니다.")
-    weather_module = None
-except Exception as e:
-    print(f"  - 경고: weather_module 모듈 로드 중 오류 발생 ({e}). 날씨 기능이 비활성화됩니다.")
-    traceback.print_exc()
-    weather_module = None
-
-try:
-    import language_model
-    print("  - language_model 모듈 로드 성공.")
-except ImportError:
-    print("  - 경고: language_model.py 파일을 찾거나 임포트할 수 없습니다. LLM 기능이 비활성화됩니다.")
-    language_model = None
-except Exception as e:
-    print(f"  - 경고: language_model 모듈 로드 중 오류 발생 ({e}). LLM 기능이 비활성화됩니다.")
-    traceback.print_exc()
-    language_model = None
-print("모듈 로드 시도 완료.")
+    except ImportError:
+        print("  - 경고: led_controller.py 파일을 찾거나 임포트할 수 없습니다. LED 기능이 비활성화됩니다.")
+    except Exception as e:
+        print(f"  - 경고: led_controller 모듈 로드/초기화 중 예외 발생 ({e}). LED 기능 비활성화됨.")
+        traceback.print_exc()
+    return None
 
+def load_weather_module():
+    """weather_module을 임포트합니다. 실패하면 None (날씨 기능 비활성화)."""
+    try:
+        import weather_module as module
+        print("  - weather_module 모듈 로드 성공.")
+        return module
+    except ImportError:
+        print("  - 경고: weather_module.py 파일을 찾거나 임포트할 수 없습니다. 날씨 기능이 비활성화됩니다.")
+    except Exception as e:
+        print(f"  - 경고: weather_module 모듈 로드 중 오류 발생 ({e}). 날씨 기능이 비활성화됩니다.")
+        traceback.print_exc()
+    return None
 
-# --- .env 파일 로드 ---
-dotenv_path = os.path.join(os.path.dirname(__file__), '.env')
-if os.path.exists(dotenv_path):
-    load_dotenv(dotenv_path=dotenv_path)
-    print(".env 파일 로드 완료.")
-else:
-    print("경고: .env 파일을 찾을 수 없습니다. 환경 변수 또는 기본값을 사용합니다.")
+def load_language_model():
+    """language_model을 임포트합니다. 실패하면 None (LLM 기능 비활성화)."""
+    try:
+        import language_model as module
+        print("  - language_model 모듈 로드 성공.")
+        return module
+    except ImportError:
+        print("  - 경고: language_model.py 파일을 찾거나 임포트할 수 없습니다. LLM 기능이 비활성화됩니다.")
+    except Exception as e:
+        print(f"  - 경고: language_model 모듈 로드 중 오류 발생 ({e}). LLM 기능이 비활성화됩니다.")
+        traceback.print_exc()
+    return None
 
 
 # --- 설정 ---
@@ -83,71 +97,385 @@ print(f"오디오 녹음 샘플 레이트: {AUDIO_RECORD_RATE} Hz")
 # -------------------------------------------------------
 RECORD_DURATION = int(os.getenv("RECORD_DURATION", 5))
 print(f"오디오 녹음 시간: {RECORD_DURATION} 초")
-RECORDED_AUDIO_FILENAME = "recorded_audio.wav"
+# --- 스트리밍 STT 설정 (녹음/전송/인식 중첩) ---
+STT_STREAMING = os.getenv("STT_STREAMING", "0") == "1"
+print(f"스트리밍 STT 사용: {STT_STREAMING}")
+STT_STREAM_CHUNK_BYTES = 4096 # 녹음 파이프에서 한 번에 읽어 전송할 바이트 수
+# --- 스트리밍 TTS 설정 (문장 단위 합성/전송) ---
+TTS_STREAMING = os.getenv("TTS_STREAMING", "0") == "1"
+print(f"스트리밍 TTS 사용: {TTS_STREAMING}")
+TTS_SAMPLE_RATE = int(os.getenv("TTS_SAMPLE_RATE", 24000)) # gTTS 원본 레이트(24kHz) - 44.1kHz 업샘플링 불필요
+# 발화 끝점 검출 녹음: 말이 시작되면 녹음하고, 말이 끝난 뒤 무음이 이어지면 바로 멈춤 (0: RECORD_DURATION 고정 길이)
+VAD_RECORDING = os.getenv("VAD_RECORDING", "1") == "1"
+VAD_PRE_ROLL_MS = int(os.getenv("VAD_PRE_ROLL_MS", vad.DEFAULT_PRE_ROLL_MS))   # 발화 시작 전 포함할 오디오
+VAD_HANGOVER_MS = int(os.getenv("VAD_HANGOVER_MS", vad.DEFAULT_HANGOVER_MS))   # 이만큼 무음이면 발화 종료
+VAD_THRESHOLD_DB = float(os.getenv("VAD_THRESHOLD_DB", vad.DEFAULT_THRESHOLD_DB)) # 배경 잡음 대비 음성 판정 기준
+VAD_MAX_UTTERANCE_SECONDS = float(os.getenv("VAD_MAX_UTTERANCE_SECONDS", vad.DEFAULT_MAX_UTTERANCE_SECONDS))
+# 업로드 전 처리: Whisper 입력 레이트로 다운샘플링 (0: 녹음 레이트 그대로), 형식 wav | flac(무손실) | opus(Ogg Opus)
+UPLOAD_SAMPLE_RATE = int(os.getenv("UPLOAD_SAMPLE_RATE", audio_utils.WHISPER_SAMPLE_RATE))
+UPLOAD_FORMAT = os.getenv("UPLOAD_FORMAT", "wav").lower()
+print(f"업로드 오디오: {UPLOAD_SAMPLE_RATE or AUDIO_RECORD_RATE} Hz, {UPLOAD_FORMAT}")
+# 상시 캡처: 시작 시 arecord를 한 번만 띄워 메모리 링 버퍼에 계속 녹음하고 턴마다 발화를 잘라 씀 (0: 턴마다 arecord 실행)
+PERSISTENT_CAPTURE = os.getenv("PERSISTENT_CAPTURE", "1") == "1"
+CAPTURE_BUFFER_SECONDS = int(os.getenv("CAPTURE_BUFFER_SECONDS", capture_stream.DEFAULT_BUFFER_SECONDS))
+# 응답을 문장 단위로 생성 → TTS → 재생을 겹쳐 실행 (1번 문장 재생 중 2번 문장 합성, 0: 전체 응답 후 한 번에 TTS/재생)
+PIPELINED_TURNS = os.getenv("PIPELINED_TURNS", "1") == "1"
+TTS_PIPELINE_PREFETCH = int(os.getenv("TTS_PIPELINE_PREFETCH", turn_pipeline.DEFAULT_PREFETCH)) # 재생보다 앞서 합성해 둘 최대 문장 수
+# STT → 응답 생성 → TTS를 서버 /converse 한 번의 왕복으로 처리 (1: 사용, 0: 단계별 요청)
+CONVERSE_MODE = os.getenv("CONVERSE_MODE", "0") == "1"
+# 호출어 게이팅: 상시 캡처 오디오에서 호출어가 감지된 뒤에만 녹음/STT 요청 (템플릿: python wake_word.py enroll ...)
+WAKE_WORD_ENABLED = os.getenv("WAKE_WORD_ENABLED", "0") == "1"
+WAKE_WORD_TEMPLATES = os.getenv("WAKE_WORD_TEMPLATES", os.path.join(os.path.dirname(os.path.abspath(__file__)), "wake_word.npz"))
+WAKE_WORD_THRESHOLD = float(os.getenv("WAKE_WORD_THRESHOLD", wake_word.DEFAULT_THRESHOLD))
+WAKE_WORD_LISTEN_SECONDS = float(os.getenv("WAKE_WORD_LISTEN_SECONDS", 5)) # 호출어 후 이 시간 안에 말이 시작되지 않으면 다시 대기
+# 끼어들기: 응답 생성/재생 중 사용자가 말하면(호출어 사용 시 호출어를 말하면) 즉시 멈추고 바로 녹음 (상시 캡처 필요)
+BARGE_IN_ENABLED = os.getenv("BARGE_IN_ENABLED", "1") == "1"
+BARGE_IN_THRESHOLD_DB = float(os.getenv("BARGE_IN_THRESHOLD_DB", barge_in.DEFAULT_THRESHOLD_DB)) # 배경 잡음 대비 (호출어 미사용 시)
+BARGE_IN_MIN_SPEECH_MS = int(os.getenv("BARGE_IN_MIN_SPEECH_MS", barge_in.DEFAULT_MIN_SPEECH_MS))
+# 직접 재생: 응답 PCM을 HTTP 스트림에서 받는 즉시 지속 출력 스트림에 써서 재생 (0: response.wav 저장 후 aplay 실행)
+DIRECT_PLAYBACK = os.getenv("DIRECT_PLAYBACK", "1") == "1"
+AUDIO_OUTPUT_BACKEND = os.getenv("AUDIO_OUTPUT_BACKEND", audio_output.DEFAULT_BACKEND) # aplay | sounddevice
+AUDIO_OUTPUT_DEVICE = os.getenv("AUDIO_OUTPUT_DEVICE") or None # 비우면 기본 출력 장치
+# 턴 추적: 녹음/STT/LLM/TTS/재생 구간을 턴 ID로 묶어 JSONL에 기록 (요약: python tracing.py summary traces/turns.jsonl)
+TRACE_ENABLED = os.getenv("TRACE_ENABLED", "1") == "1"
+TRACE_FILE = os.getenv("TRACE_FILE", os.path.join(os.path.dirname(os.path.abspath(__file__)), "traces", "turns.jsonl"))
+TRACE_MAX_BYTES = int(os.getenv("TRACE_MAX_BYTES", tracing.DEFAULT_MAX_BYTES))
+TRACE_BACKUP_COUNT = int(os.getenv("TRACE_BACKUP_COUNT", tracing.DEFAULT_BACKUP_COUNT))
+TRACE_PROPAGATE = os.getenv("TRACE_PROPAGATE", "1") == "1" # PC 서버 요청에 X-Turn-Id 헤더를 붙여 서버 쪽 단계도 기록
+# 빠른 시작: LED/날씨/LLM 모듈을 임포트 시점이 아니라 시작 후 백그라운드에서 병렬로 초기화하고 바로 듣기 시작
+# (0: 임포트 시 순서대로 초기화 + LED 자가 테스트 + 첫 녹음 전 대기)
+FAST_STARTUP = os.getenv("FAST_STARTUP", "1") == "1"
+LED_SELF_TEST = os.getenv("LED_SELF_TEST", "0" if FAST_STARTUP else "1") == "1" # 시작 시 빨강/초록/파랑 LED 확인 (약 7초)
+STARTUP_DELAY_SECONDS = float(os.getenv("STARTUP_DELAY_SECONDS", 0 if FAST_STARTUP else 2)) # 첫 녹음 전 대기
+# 원격 서비스 장애 대응: 회로가 열린 동안(http_client.py의 CIRCUIT_*) 서버 요청 없이 이 안내 음성을 재생하고 LED를 빨간색으로
+# (파일이 없으면 서버가 응답할 때 UNAVAILABLE_TEXT를 합성해 저장해 두고, 그 전까지는 LED로만 알림)
+UNAVAILABLE_AUDIO_FILE = os.getenv("UNAVAILABLE_AUDIO_FILE", os.path.join(os.path.dirname(os.path.abspath(__file__)), "server_unavailable.wav"))
+UNAVAILABLE_TEXT = os.getenv("UNAVAILABLE_TEXT", "지금은 서버에 연결할 수 없어요. 잠시 후 다시 말씀해 주세요.")
+UPLOAD_WAV_FILENAME = "recorded_audio.wav" # multipart 업로드 파일 이름 (디스크에 저장하지 않음)
 RESPONSE_AUDIO_FILENAME = "response.wav"
 
+audio_capture = None # 상시 캡처 스트림 (PERSISTENT_CAPTURE, 메인 실행 시 시작)
+wake_detector = None # 호출어 검출기 (WAKE_WORD_ENABLED, 메인 실행 시 생성)
+output_stream = None # 지속 출력 스트림 (DIRECT_PLAYBACK, 메인 실행 시 시작)
+startup_futures = [] # 백그라운드에서 진행 중인 시작 초기화 작업 (FAST_STARTUP)
+
+# 회로가 열려 있는 동안 PC 서버 상태 확인 (응답하면 시험 요청 허용)
+for _endpoint in ("stt", "stt_stream", "converse"):
+    http_client.configure_circuit(_endpoint, f"{PC_SERVER_URL}/readyz") # STT 모델 준비 여부까지 확인
+http_client.configure_circuit("tts", f"{PC_SERVER_URL}/healthz")
+
+if not FAST_STARTUP:
+    print("모듈 로드 시도...")
+    led_controller = load_led_controller()
+    weather_module = load_weather_module()
+    language_model = load_language_model()
+    print("모듈 로드 시도 완료.")
+
 # --- 함수 정의들 ---
-def record_audio(filename=RECORDED_AUDIO_FILENAME, duration=RECORD_DURATION, device=AUDIO_RECORD_DEVICE, format=AUDIO_RECORD_FORMAT, rate=AUDIO_RECORD_RATE): # rate 파라미터 추가
-    """arecord 명령어를 사용하여 오디오를 녹음합니다."""
-    print(f"{duration}초 동안 음성 녹음을 시작합니다... ('{device}', {rate}Hz 사용)") # rate 정보 추가
+def create_endpointer(rate=AUDIO_RECORD_RATE):
+    """설정값으로 발화 끝점 검출기를 만듭니다."""
+    return vad.Endpointer(rate, pre_roll_ms=VAD_PRE_ROLL_MS, hangover_ms=VAD_HANGOVER_MS,
+                          max_utterance_seconds=VAD_MAX_UTTERANCE_SECONDS,
+                          vad=vad.FrameVAD(rate, threshold_db=VAD_THRESHOLD_DB))
+
+def _endpoint_chunks(chunks, endpointer, onset_timeout=None):
+    """
+    PCM 청크를 발화 끝점 검출기에 넣어 발화 구간만 내보내고, 발화가 끝나면 멈춥니다.
+    onset_timeout(초)이 있으면 그 시간 안에 발화가 시작되지 않을 때 아무것도 내보내지 않고 멈춥니다.
+    """
+    waited_bytes = 0
+    timeout_bytes = int(onset_timeout * endpointer.sample_rate) * 2 if onset_timeout else None
+    for chunk in chunks:
+        was_triggered = endpointer.triggered
+        speech = endpointer.feed(chunk)
+        if endpointer.triggered and not was_triggered:
+            print("  -> 발화 시작 감지")
+        elif not endpointer.triggered and timeout_bytes is not None:
+            waited_bytes += len(chunk)
+            if waited_bytes >= timeout_bytes:
+                print(f"  -> {onset_timeout:.0f}초 동안 발화가 시작되지 않았습니다.")
+                return
+        if speech:
+            yield speech
+        if endpointer.done:
+            reason = "최대 길이 도달" if endpointer.end_reason == 'max_length' else f"무음 {VAD_HANGOVER_MS}ms"
+            print(f"  -> 발화 종료 감지 ({reason})")
+            return
+
+def _capture_chunks(capture, duration=None, start=None):
+    """상시 캡처 스트림에서 start 위치(기본: 지금) 이후의 오디오를 내보냅니다 (duration이 있으면 그 길이만큼)."""
+    remaining = int(duration * capture.rate) * 2 if duration else None
+    for chunk in capture.chunks(start):
+        if remaining is None:
+            yield chunk
+            continue
+        chunk = chunk[:remaining]
+        remaining -= len(chunk)
+        yield chunk
+        if remaining <= 0:
+            return
+
+def record_audio_stream(duration=RECORD_DURATION, device=AUDIO_RECORD_DEVICE, format=AUDIO_RECORD_FORMAT, rate=AUDIO_RECORD_RATE, chunk_bytes=STT_STREAM_CHUNK_BYTES, endpointer=None, capture_start=None, onset_timeout=None):
+    """
+    녹음이 진행되는 동안 raw PCM 청크를 차례로 내보냅니다 (파일 저장 없음).
+    상시 캡처 스트림(audio_capture)이 있으면 그 링 버퍼의 capture_start 위치(기본: 지금)부터, 없으면 arecord를 실행하여 파이프로 읽습니다.
+    endpointer가 주어지면 녹음 길이 제한 없이 발화가 시작된 뒤의 오디오만 내보내고, 발화가 끝나면 바로 멈춥니다
+    (onset_timeout초 안에 발화가 시작되지 않으면 빈 녹음으로 종료).
+    """
+    if endpointer:
+        print(f"음성 감지 대기 중... ('{device}', {rate}Hz 사용, 무음 {VAD_HANGOVER_MS}ms 후 종료)")
+        command = ['arecord', '-D', device, '-f', format, '-r', str(rate), '-c', '1', '-t', 'raw', '-q']
+    else:
+        print(f"{duration}초 동안 스트리밍 녹음을 시작합니다... ('{device}', {rate}Hz 사용)")
+        command = ['arecord', '-D', device, '-f', format, '-r', str(rate), '-c', '1', '-d', str(duration), '-t', 'raw', '-q']
     print("[main.py] 녹음 시작 전 LED 파란색 변경 시도...")
     if led_controller: led_controller.set_led_color(led_controller.COLOR_BLUE)
-    # --- ★★★ 명령어에 rate 와 채널(-c 1) 명시적으로 포함 ★★★ ---
-    command = ['arecord', '-D', device, '-f', format, '-r', str(rate), '-c', '1', '-d', str(duration), filename]
+
+    process = None
+    if audio_capture is not None:
+        # 프로세스 실행/장치 열기 없이 링 버퍼에서 읽음
+        chunks = _capture_chunks(audio_capture, None if endpointer else duration, capture_start)
+    else:
+        print(f"[record_audio_stream] 실행 명령어: {' '.join(command)}")
+        process = subprocess.Popen(command, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+        chunks = iter(lambda: process.stdout.read(chunk_bytes), b'')
     try:
-        # 파일 삭제 로직
-        if os.path.exists(filename):
-            print(f"[record_audio] 이전 파일 '{filename}' 삭제 시도...")
-            os.remove(filename)
-            print(f"[record_audio] 이전 파일 삭제 완료.")
-        else:
-             print(f"[record_audio] 이전 파일 '{filename}' 없음. 바로 녹음 시작.")
+        with tracing.span("record", streaming=True) as span: # 발화 시작 대기 포함
+            recorded_bytes = 0
+            for chunk in (chunks if endpointer is None else _endpoint_chunks(chunks, endpointer, onset_timeout)):
+                recorded_bytes += len(chunk)
+                yield chunk
+            span["speech_seconds"] = round(recorded_bytes / 2 / rate, 2)
+            span["ok"] = recorded_bytes > 0
+    finally:
+        if process is not None:
+            if process.poll() is None:
+                process.terminate()
+            process.wait()
+            if process.returncode not in (0, -15):
+                print(f"경고: arecord 종료 코드 {process.returncode}")
+                print(f"arecord 오류 출력:\n{process.stderr.read().decode(errors='replace')}")
+        print("스트리밍 녹음 종료.")
 
-        print(f"[record_audio] 실행 명령어: {' '.join(command)}") # 실행 명령어 확인
-        result = subprocess.run(command, check=True, capture_output=True, text=True) # arecord 실행
-        print(f"녹음 완료: {filename}")
+def get_upload_rate(rate):
+    """녹음 레이트 rate의 오디오를 업로드할 샘플 레이트 (업샘플링은 하지 않음)."""
+    if UPLOAD_SAMPLE_RATE and UPLOAD_SAMPLE_RATE < rate:
+        return UPLOAD_SAMPLE_RATE
+    return rate
 
-        # 파일 크기 확인
-        if os.path.exists(filename):
-            print(f"  -> 녹음된 파일 크기: {os.path.getsize(filename)} bytes")
-        else:
-            print("  -> 경고: 녹음 후 파일이 생성되지 않았습니다!")
+def resample_pcm_chunks(chunks, rate, target_rate):
+    """S16_LE PCM 청크를 폴리페이즈 필터로 target_rate로 바꾸며 차례로 내보냅니다 (스트리밍 업로드용)."""
+    if target_rate == rate:
+        yield from chunks
+        return
+    resampler = audio_utils.PolyphaseResampler(rate, target_rate)
+    for chunk in chunks:
+        resampled = resampler.process(audio_utils.pcm16_to_float32(chunk))
+        if len(resampled):
+            yield audio_utils.float32_to_pcm16(resampled)
+    tail = resampler.flush()
+    if len(tail):
+        yield audio_utils.float32_to_pcm16(tail)
 
+def encode_upload(pcm, rate):
+    """
+    녹음한 S16_LE PCM을 업로드용 오디오로 만듭니다 (UPLOAD_SAMPLE_RATE로 다운샘플링 후 UPLOAD_FORMAT으로 인코딩).
+    FLAC/Opus 인코딩에 실패하면 WAV로 대체합니다.
+    """
+    upload_rate = get_upload_rate(rate)
+    if upload_rate != rate:
+        pcm = audio_utils.float32_to_pcm16(audio_utils.resample_poly(audio_utils.pcm16_to_float32(pcm), rate, upload_rate))
+    if UPLOAD_FORMAT != "wav":
+        try:
+            return audio_utils.encode_pcm16(pcm, upload_rate, UPLOAD_FORMAT)
+        except (ValueError, RuntimeError) as e:
+            print(f"경고: {UPLOAD_FORMAT} 인코딩 실패 ({e}). WAV로 업로드합니다.")
+    return audio_utils.encode_pcm16(pcm, upload_rate, "wav")
+
+def upload_filename(audio_bytes):
+    """업로드 데이터 형식에 맞는 파일 이름 (서버 로그/ffmpeg 대체 경로용)."""
+    if audio_bytes[:4] == b'fLaC':
+        return "recorded_audio.flac"
+    if audio_bytes[:4] == b'OggS':
+        return "recorded_audio.opus"
+    return UPLOAD_WAV_FILENAME
+
+def record_utterance(device=AUDIO_RECORD_DEVICE, format=AUDIO_RECORD_FORMAT, rate=AUDIO_RECORD_RATE, capture_start=None, onset_timeout=None):
+    """
+    발화 하나를 녹음하여 메모리의 업로드용 오디오 바이트로 반환합니다 (파일 저장 없음).
+    VAD_RECORDING이면 말이 시작될 때부터 끝 무음까지만, 아니면 RECORD_DURATION초 동안 녹음합니다.
+    capture_start / onset_timeout은 record_audio_stream()에 그대로 전달됩니다 (호출어 직후부터 녹음할 때 사용).
+
+    Returns:
+        bytes: 업로드용 오디오 데이터 (encode_upload() 참고). 녹음 실패 시 None.
+    """
+    try:
+        started = time.monotonic()
+        endpointer = create_endpointer(rate) if VAD_RECORDING else None
+        pcm = b''.join(record_audio_stream(device=device, format=format, rate=rate, endpointer=endpointer,
+                                           capture_start=capture_start, onset_timeout=onset_timeout))
+        if not pcm:
+            print("오류: 녹음된 오디오가 없습니다 (발화 감지 전에 녹음이 종료됨).")
+            if led_controller: led_controller.set_led_color(led_controller.COLOR_RED)
+            return None
+        print(f"녹음 완료 (발화 {len(pcm) / 2 / rate:.1f}초, 대기 포함 {time.monotonic() - started:.1f}초, {len(pcm)} bytes)")
         print("[main.py] 녹음 완료 후 LED 흰색 변경 시도...")
         if led_controller: led_controller.set_led_color(led_controller.COLOR_WHITE)
-        return True
+        with tracing.span("encode", format=UPLOAD_FORMAT) as span:
+            upload = encode_upload(pcm, rate)
+            span["bytes"] = len(upload)
+        print(f"  -> 업로드 오디오: {get_upload_rate(rate)}Hz {UPLOAD_FORMAT}, {len(upload)} bytes (원본 PCM 대비 {len(upload) / len(pcm):.0%})")
+        return upload
     except FileNotFoundError:
         print("오류: 'arecord' 명령어를 찾을 수 없습니다. 'alsa-utils' 패키지가 설치되어 있나요?")
         if led_controller: led_controller.set_led_color(led_controller.COLOR_RED)
-        return False
-    except subprocess.CalledProcessError as e:
-        print(f"오류: 녹음 중 오류 발생 (종료 코드: {e.returncode})")
-        print(f"arecord 오류 출력:\n{e.stderr}")
-        if led_controller: led_controller.set_led_color(led_controller.COLOR_RED)
-        return False
+        return None
     except Exception as e:
         print(f"오류: 예상치 못한 녹음 오류 발생: {e}")
         traceback.print_exc()
         if led_controller: led_controller.set_led_color(led_controller.COLOR_RED)
-        return False
+        return None
 
-def get_stt_from_server(audio_filename):
-    """녹음된 오디오 파일을 PC 서버 /stt 로 보내 텍스트를 받습니다."""
-    stt_url = f"{PC_SERVER_URL}/stt"
-    print(f"오디오 파일 '{audio_filename}'을 STT 서버({stt_url})로 전송 중...")
-    print("[main.py] STT 요청 시 LED 노란색 변경 시도...")
-    if led_controller: led_controller.set_led_color(led_controller.COLOR_YELLOW)
+def create_wake_word_detector():
+    """
+    호출어 검출기를 만듭니다 (WAKE_WORD_ENABLED).
+    상시 캡처 스트림이 없거나 템플릿 파일을 읽을 수 없으면 None을 반환하고 호출어 없이 동작합니다.
+    """
+    if audio_capture is None:
+        print("경고: 호출어 검출에는 상시 캡처(PERSISTENT_CAPTURE=1)가 필요합니다. 호출어 없이 동작합니다.")
+        return None
     try:
-        if not os.path.exists(audio_filename):
-            print(f"오류: STT 요청 실패 - 오디오 파일 '{audio_filename}' 없음")
+        templates = wake_word.load_templates(WAKE_WORD_TEMPLATES)
+        detector = wake_word.WakeWordDetector(templates, audio_capture.rate, threshold=WAKE_WORD_THRESHOLD)
+    except (OSError, ValueError) as e:
+        print(f"경고: 호출어 템플릿 '{WAKE_WORD_TEMPLATES}'을(를) 사용할 수 없습니다 ({e}). 호출어 없이 동작합니다.")
+        return None
+    print(f"호출어 검출 사용 (템플릿 {len(templates)}개, 임계값 {WAKE_WORD_THRESHOLD})")
+    return detector
+
+def wait_for_wake_word(detector):
+    """
+    상시 캡처 오디오를 호출어 검출기에 계속 넣으며 호출어가 감지될 때까지 기다립니다 (서버 요청 없음).
+
+    Returns:
+        int: 호출어가 끝난 캡처 위치 (이 위치부터 녹음하면 호출어 직후 발화가 잘리지 않음). 캡처가 멈추면 None.
+    """
+    detector.reset()
+    position = audio_capture.position
+    for chunk in audio_capture.chunks(position):
+        position += len(chunk)
+        if detector.feed(chunk):
+            print(f"호출어 감지 (거리 {detector.last_score:.2f})")
+            return position
+    return None
+
+def start_barge_in_monitor():
+    """
+    응답 생성/재생 동안 끼어들기를 감시하는 모니터를 시작합니다.
+    호출어 검출기가 있으면 호출어로, 없으면 발화 시작(VAD)으로 판정합니다.
+
+    Returns:
+        barge_in.BargeInMonitor: 시작된 모니터 (monitor.token을 재생/요청 함수에 전달). 사용하지 않으면 None.
+    """
+    if not BARGE_IN_ENABLED or audio_capture is None:
+        return None
+    if wake_detector is not None:
+        wake_detector.reset()
+        detector = wake_detector
+    else:
+        detector = barge_in.SpeechOnsetDetector(audio_capture.rate, threshold_db=BARGE_IN_THRESHOLD_DB,
+                                                min_speech_ms=BARGE_IN_MIN_SPEECH_MS, pre_roll_ms=VAD_PRE_ROLL_MS)
+    return barge_in.BargeInMonitor(audio_capture, detector).start()
+
+def stop_barge_in_monitor(monitor):
+    """모니터를 멈추고, 끼어들기가 있었으면 다음 녹음을 시작할 캡처 위치를 반환합니다 (없으면 None)."""
+    if monitor is None:
+        return None
+    return monitor.stop()
+
+def get_stt_stream_from_server(pcm_chunks, rate=AUDIO_RECORD_RATE):
+    """
+    PCM 청크를 PC 서버 /stt_stream 으로 청크 전송하고, 부분/최종 인식 결과를 받아 최종 텍스트를 반환합니다.
+    청크는 전송 전에 업로드 레이트(UPLOAD_SAMPLE_RATE)로 리샘플링합니다.
+    녹음이 끝난 뒤 최종 결과를 받기까지의 시간을 'stt' 스팬으로 기록합니다 (녹음과 겹친 전송/부분 인식은 제외).
+    """
+    stt_url = f"{PC_SERVER_URL}/stt_stream"
+    upload_rate = get_upload_rate(rate)
+    print(f"오디오 스트림을 STT 서버({stt_url})로 전송 중... ({upload_rate}Hz)")
+    upload_done = {}
+
+    def mark_upload_done(chunks):
+        yield from chunks
+        upload_done["at"] = time.perf_counter()
+
+    try:
+        pcm_chunks = mark_upload_done(resample_pcm_chunks(pcm_chunks, rate, upload_rate))
+        response = http_client.post(stt_url, endpoint="stt_stream", params={'rate': upload_rate}, data=pcm_chunks,
+                                    headers={'Content-Type': 'application/octet-stream'},
+                                    stream=True)
+        print("[main.py] STT 대기 시 LED 노란색 변경 시도...")
+        if led_controller: led_controller.set_led_color(led_controller.COLOR_YELLOW)
+        response.raise_for_status()
+        response.encoding = 'utf-8'
+        transcribed_text = None
+        with http_client.stream_outcome(response):
+            for line in response.iter_lines(decode_unicode=True):
+                if not line:
+                    continue
+                message = json.loads(line)
+                if message.get("type") == "partial":
+                    print(f"  -> 부분 인식: '{message.get('text')}'")
+                elif message.get("type") == "final":
+                    transcribed_text = message.get("text")
+                elif message.get("type") == "error":
+                    print(f"오류: STT 서버 스트림 오류: {message.get('error')}")
+                    if led_controller: led_controller.set_led_color(led_controller.COLOR_RED)
+                    return None
+        if "at" in upload_done:
+            tracing.record("stt", time.perf_counter() - upload_done["at"], started_perf=upload_done["at"],
+                           ok=transcribed_text is not None, streaming=True)
+        if transcribed_text is not None:
+            print(f"STT 결과 수신: '{transcribed_text}'")
+            print("[main.py] STT 결과 수신 후 LED 흰색 변경 시도...")
+            if led_controller: led_controller.set_led_color(led_controller.COLOR_WHITE)
+            return transcribed_text
+        else:
+            print("오류: STT 스트림에 최종 결과가 없습니다.")
             if led_controller: led_controller.set_led_color(led_controller.COLOR_RED)
             return None
+    except FileNotFoundError:
+        print("오류: 'arecord' 명령어를 찾을 수 없습니다. 'alsa-utils' 패키지가 설치되어 있나요?")
+        if led_controller: led_controller.set_led_color(led_controller.COLOR_RED)
+        return None
+    except requests.exceptions.Timeout:
+        print(f"오류: STT 서버({stt_url}) 연결 시간 초과")
+        if led_controller: led_controller.set_led_color(led_controller.COLOR_RED)
+        return None
+    except requests.exceptions.RequestException as e:
+        print(f"오류: STT 서버({stt_url}) 통신 오류: {e}")
+        if led_controller: led_controller.set_led_color(led_controller.COLOR_RED)
+        return None
+    except json.JSONDecodeError:
+        print("오류: STT 스트림 응답이 유효한 JSON 형식이 아닙니다.")
+        if led_controller: led_controller.set_led_color(led_controller.COLOR_RED)
+        return None
+    except Exception as e:
+        print(f"오류: 예상치 못한 스트리밍 STT 처리 오류: {e}")
+        traceback.print_exc()
+        if led_controller: led_controller.set_led_color(led_controller.COLOR_RED)
+        return None
 
-        print(f"  -> 전송할 파일 크기: {os.path.getsize(audio_filename)} bytes")
-
-        with open(audio_filename, 'rb') as f_audio:
-            files = {'audio_file': (os.path.basename(audio_filename), f_audio)}
-            response = requests.post(stt_url, files=files, timeout=30)
+def get_stt_from_server(audio_bytes):
+    """
+    녹음된 오디오(record_utterance() 결과, 메모리의 업로드용 바이트)를 PC 서버 /stt 로 보내 텍스트를 받습니다.
+    """
+    stt_url = f"{PC_SERVER_URL}/stt"
+    print(f"녹음 오디오({len(audio_bytes)} bytes)를 메모리에서 STT 서버({stt_url})로 전송 중...")
+    print("[main.py] STT 요청 시 LED 노란색 변경 시도...")
+    if led_controller: led_controller.set_led_color(led_controller.COLOR_YELLOW)
+    try:
+        files = {'audio_file': (upload_filename(audio_bytes), audio_bytes)}
+        response = http_client.post(stt_url, endpoint="stt", files=files)
         response.raise_for_status()
         result_json = response.json()
         transcribed_text = result_json.get("text")
@@ -160,12 +488,8 @@ def get_stt_from_server(audio_filename):
             print(f"오류: STT 결과 JSON에 'text' 필드가 없습니다. 서버 응답: {result_json}")
             if led_controller: led_controller.set_led_color(led_controller.COLOR_RED)
             return None
-    except FileNotFoundError:
-        print(f"오류: 오디오 파일 '{audio_filename}'을 열 수 없습니다.")
-        if led_controller: led_controller.set_led_color(led_controller.COLOR_RED)
-        return None
     except requests.exceptions.Timeout:
-        print(f"오류: STT 서버({stt_url}) 연결 시간 초과 (30초)")
+        print(f"오류: STT 서버({stt_url}) 연결 시간 초과")
         if led_controller: led_controller.set_led_color(led_controller.COLOR_RED)
         return None
     except requests.exceptions.RequestException as e:
@@ -182,21 +506,31 @@ def get_stt_from_server(audio_filename):
         if led_controller: led_controller.set_led_color(led_controller.COLOR_RED)
         return None
 
-def get_tts_audio_from_server(text_to_speak, output_filename=RESPONSE_AUDIO_FILENAME):
-    """텍스트를 PC 서버 /generate_tts 로 보내 WAV 오디오를 받아 저장합니다."""
-    tts_url = f"{PC_SERVER_URL}/generate_tts"
+def get_tts_audio_from_server(text_to_speak, output_filename=RESPONSE_AUDIO_FILENAME, cancel_token=None):
+    """텍스트를 PC 서버 /generate_tts 로 보내 WAV 오디오를 받아 저장합니다 (cancel_token이 취소되면 수신 중단)."""
+    tts_url = f"{PC_SERVER_URL}/generate_tts_stream" if TTS_STREAMING else f"{PC_SERVER_URL}/generate_tts"
     print(f"텍스트 '{text_to_speak[:30]}...'를 TTS 서버({tts_url})로 전송 중...")
     print("[main.py] TTS 요청 시 LED 노란색 변경 시도...")
     if led_controller: led_controller.set_led_color(led_controller.COLOR_YELLOW)
-    payload = {"text": text_to_speak, "lang": "ko"}
+    payload = {"text": text_to_speak, "lang": "ko", "format": "wav", "sample_rate": TTS_SAMPLE_RATE}
     try:
-        response = requests.post(tts_url, json=payload, timeout=30, stream=True)
+        response = http_client.post(tts_url, endpoint="tts", json=payload, stream=True)
         response.raise_for_status()
         if 'audio/wav' in response.headers.get('Content-Type', ''):
             if os.path.exists(output_filename): os.remove(output_filename)
-            with open(output_filename, 'wb') as f_out:
-                for chunk in response.iter_content(chunk_size=8192):
-                    f_out.write(chunk)
+            cancel_callback = cancel_token.on_cancel(response.close) if cancel_token else None
+            try:
+                with http_client.stream_outcome(response, cancel_token), open(output_filename, 'wb') as f_out:
+                    for chunk in response.iter_content(chunk_size=8192):
+                        f_out.write(chunk)
+            except Exception:
+                if cancel_token is not None and cancel_token.cancelled:
+                    print("TTS 수신 취소됨 (끼어들기).")
+                    return False
+                raise
+            finally:
+                if cancel_callback is not None:
+                    cancel_token.remove(cancel_callback)
             print(f"TTS 오디오 저장 완료: {output_filename}")
             print("[main.py] TTS 완료 후 LED 흰색 변경 시도...")
             if led_controller: led_controller.set_led_color(led_controller.COLOR_WHITE)
@@ -209,7 +543,7 @@ def get_tts_audio_from_server(text_to_speak, output_filename=RESPONSE_AUDIO_FILE
             if led_controller: led_controller.set_led_color(led_controller.COLOR_RED)
             return False
     except requests.exceptions.Timeout:
-        print(f"오류: TTS 서버({tts_url}) 연결 시간 초과 (30초)")
+        print(f"오류: TTS 서버({tts_url}) 연결 시간 초과")
         if led_controller: led_controller.set_led_color(led_controller.COLOR_RED)
         return False
     except requests.exceptions.RequestException as e:
@@ -222,8 +556,370 @@ def get_tts_audio_from_server(text_to_speak, output_filename=RESPONSE_AUDIO_FILE
         if led_controller: led_controller.set_led_color(led_controller.COLOR_RED)
         return False
 
-def play_audio(filename=RESPONSE_AUDIO_FILENAME):
-    """aplay 명령어를 사용하여 오디오 파일을 재생합니다."""
+def converse_with_server(audio_bytes, output_filename=RESPONSE_AUDIO_FILENAME, cancel_token=None):
+    """
+    녹음된 오디오(record_utterance() 결과, 메모리의 업로드용 바이트)를 PC 서버 /converse 로 보내 인식 결과, 응답 텍스트, 응답 오디오를 한 번에 받습니다.
+    응답 오디오는 output_filename에 WAV로 저장합니다 (지속 출력 스트림이 있으면 저장 없이 받는 즉시 재생하고 끝까지 기다림).
+    cancel_token이 취소되면 응답 스트림을 닫고 False를 반환합니다.
+
+    Returns:
+        bool: 재생할 응답 오디오를 저장했으면(직접 재생이면 재생을 마쳤으면) True.
+    """
+    converse_url = f"{PC_SERVER_URL}/converse"
+    print(f"녹음 오디오({len(audio_bytes)} bytes)를 메모리에서 대화 서버({converse_url})로 전송 중...")
+    print("[main.py] 대화 요청 시 LED 노란색 변경 시도...")
+    if led_controller: led_controller.set_led_color(led_controller.COLOR_YELLOW)
+    direct = output_stream is not None
+    data = {"lang": "ko", "format": "pcm" if direct else "wav", "sample_rate": TTS_SAMPLE_RATE}
+    marks = {"request": time.perf_counter()} # 프레임 도착 시각 (서버 처리 단계를 기기 쪽에서 나눠 기록)
+
+    def mark(name, stage, since, **attrs):
+        marks[name] = time.perf_counter()
+        tracing.record(stage, marks[name] - marks[since], started_perf=marks[since], **attrs)
+
+    try:
+        files = {'audio_file': (upload_filename(audio_bytes), audio_bytes)}
+        response = http_client.post(converse_url, endpoint="converse", files=files, data=data, stream=True)
+        response.raise_for_status()
+        if cancel_token is not None:
+            cancel_token.on_cancel(response.close)
+            if direct:
+                cancel_token.on_cancel(output_stream.interrupt)
+
+        audio_saved = False
+        with http_client.stream_outcome(response, cancel_token), \
+             (contextlib.nullcontext() if direct else open(output_filename, 'wb')) as f_out:
+            for kind, payload in converse_protocol.read_frames(response.raw):
+                if kind == converse_protocol.FRAME_TRANSCRIPT:
+                    mark("transcript", "stt", "request", converse=True) # 업로드 + 서버 STT
+                    stt_text = json.loads(payload).get("text")
+                    print(f"STT 결과 수신: '{stt_text}'")
+                    if not conversation.is_valid_stt_text(stt_text):
+                        print(f"인식된 텍스트가 너무 짧거나 비어있습니다: '{stt_text}' (처리 건너뜀).")
+                        if led_controller: led_controller.set_led_color(led_controller.COLOR_WHITE) # 대기 상태로
+                        continue
+                    analyze_emotion_and_set_led(conversation.analyze_text(stt_text, weather_module))
+                    if led_controller: led_controller.set_led_color(led_controller.COLOR_YELLOW) # 응답 대기
+                elif kind == converse_protocol.FRAME_REPLY:
+                    reply = json.loads(payload)
+                    mark("reply", reply_stage(reply.get("route")), "transcript", converse=True)
+                    tracing.set_turn_attrs(route=reply.get("route"))
+                    print(f"생성된 응답 ({reply.get('route')}): '{reply.get('text')}'")
+                elif kind == converse_protocol.FRAME_AUDIO:
+                    if "audio" not in marks and "reply" in marks and (direct or audio_saved): # WAV는 첫 프레임이 헤더
+                        mark("audio", "tts_first_audio", "reply", converse=True)
+                    if not direct:
+                        f_out.write(payload)
+                    elif cancel_token is not None and cancel_token.cancelled:
+                        break
+                    else:
+                        if not audio_saved:
+                            print("응답 오디오 수신 시작 - 바로 재생합니다.")
+                            if led_controller: led_controller.set_led_color(led_controller.COLOR_GREEN)
+                        if not output_stream.write(payload):
+                            break
+                    audio_saved = True
+                elif kind == converse_protocol.FRAME_ERROR:
+                    print(f"오류: 대화 서버 응답 생성 실패: {json.loads(payload).get('error')}")
+                    if led_controller: led_controller.set_led_color(led_controller.COLOR_RED)
+                    return False
+
+        if cancel_token is not None and cancel_token.cancelled:
+            print("대화 요청 취소됨 (끼어들기).")
+            return False
+        if direct and audio_saved and not output_stream.drain():
+            print("재생 중단 (끼어들기).")
+            return False
+        if audio_saved:
+            print("응답 오디오 재생 완료." if direct else f"응답 오디오 저장 완료: {output_filename}")
+            if led_controller: led_controller.set_led_color(led_controller.COLOR_WHITE)
+        return audio_saved
+    except requests.exceptions.Timeout:
+        print(f"오류: 대화 서버({converse_url}) 연결 시간 초과")
+        if led_controller: led_controller.set_led_color(led_controller.COLOR_RED)
+        return False
+    except requests.exceptions.RequestException as e:
+        print(f"오류: 대화 서버({converse_url}) 통신 오류: {e}")
+        if led_controller: led_controller.set_led_color(led_controller.COLOR_RED)
+        return False
+    except (EOFError, json.JSONDecodeError) as e:
+        print(f"오류: 대화 서버 응답 스트림이 올바르지 않습니다: {e}")
+        if led_controller: led_controller.set_led_color(led_controller.COLOR_RED)
+        return False
+    except Exception as e:
+        if cancel_token is not None and cancel_token.cancelled:
+            print("대화 요청 취소됨 (끼어들기).")
+            return False
+        print(f"오류: 예상치 못한 대화 처리 오류: {e}")
+        traceback.print_exc()
+        if led_controller: led_controller.set_led_color(led_controller.COLOR_RED)
+        return False
+
+def synthesize_sentence(text_to_speak, cancel_token=None):
+    """
+    문장 하나를 PC 서버 /generate_tts 로 합성하여 메모리의 WAV 바이트로 반환합니다 (실패 시 None).
+    지속 출력 스트림을 쓰면 헤더 없는 PCM 바이트로 받습니다 (play_pcm_bytes()로 재생).
+    cancel_token이 취소되면 요청을 시작하지 않거나 수신 중인 응답을 닫고 None을 반환합니다.
+    """
+    tts_url = f"{PC_SERVER_URL}/generate_tts"
+    output_format = "pcm" if output_stream is not None else "wav"
+    payload = {"text": text_to_speak, "lang": "ko", "format": output_format, "sample_rate": TTS_SAMPLE_RATE}
+    if cancel_token is not None and cancel_token.cancelled:
+        return None
+    try:
+        response = http_client.post(tts_url, endpoint="tts", json=payload, stream=cancel_token is not None)
+        response.raise_for_status()
+        if f'audio/{output_format}' not in response.headers.get('Content-Type', ''):
+            print(f"오류: TTS 서버가 오디오를 반환하지 않았습니다. Content-Type: {response.headers.get('Content-Type')}")
+            return None
+        if cancel_token is None:
+            return response.content
+        cancel_callback = cancel_token.on_cancel(response.close)
+        try:
+            with http_client.stream_outcome(response, cancel_token):
+                return response.content
+        except Exception:
+            if cancel_token.cancelled:
+                return None
+            raise
+        finally:
+            cancel_token.remove(cancel_callback)
+    except requests.exceptions.Timeout:
+        print(f"오류: TTS 서버({tts_url}) 연결 시간 초과")
+        return None
+    except requests.exceptions.RequestException as e:
+        print(f"오류: TTS 서버({tts_url}) 통신 오류: {e}")
+        return None
+
+def _write_player_input(process, data):
+    try:
+        process.stdin.write(data)
+        process.stdin.close()
+    except (BrokenPipeError, OSError):
+        pass # 재생 중단으로 aplay가 먼저 종료됨
+
+def run_player(command, input_bytes=None, cancel_token=None):
+    """
+    aplay를 실행하고 끝날 때까지 기다립니다. cancel_token이 취소되면 즉시 aplay를 종료합니다.
+
+    Returns:
+        bool: 끝까지 재생했으면 True, 취소로 중단되었으면 False.
+
+    Raises:
+        FileNotFoundError: aplay 명령어가 없는 경우.
+        subprocess.CalledProcessError: aplay가 오류로 종료된 경우 (stderr 포함).
+    """
+    process = subprocess.Popen(command, stdin=subprocess.PIPE if input_bytes is not None else subprocess.DEVNULL,
+                               stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+    cancel_callback = cancel_token.on_cancel(process.kill) if cancel_token else None
+    try:
+        if input_bytes is not None:
+            threading.Thread(target=_write_player_input, args=(process, input_bytes), name="aplay-input", daemon=True).start()
+        process.wait()
+        stderr = process.stderr.read()
+    finally:
+        if cancel_callback is not None:
+            cancel_token.remove(cancel_callback)
+    if cancel_token is not None and cancel_token.cancelled:
+        print("재생 중단 (끼어들기).")
+        return False
+    if process.returncode != 0:
+        raise subprocess.CalledProcessError(process.returncode, command, stderr=stderr)
+    return True
+
+def play_audio_bytes(wav_bytes, cancel_token=None):
+    """메모리의 WAV 바이트를 aplay 표준 입력으로 재생합니다 (파일 저장 없음, cancel_token이 취소되면 즉시 중단)."""
+    try:
+        return run_player(['aplay', '-q', '-'], input_bytes=wav_bytes, cancel_token=cancel_token)
+    except FileNotFoundError:
+        print("오류: 'aplay' 명령어를 찾을 수 없습니다. 'alsa-utils' 패키지가 설치되어 있나요?")
+        return False
+    except subprocess.CalledProcessError as e:
+        print(f"오류: 오디오 재생 중 오류 발생 (종료 코드: {e.returncode})")
+        print(f"aplay 오류 출력:\n{e.stderr.decode(errors='replace')}")
+        return False
+
+def write_output_chunks(chunks, cancel_token=None, drain=True):
+    """
+    PCM 청크를 받는 대로 지속 출력 스트림에 씁니다 (첫 청크가 도착하면 바로 소리가 남).
+    cancel_token이 취소되면 출력 버퍼에 남은 소리까지 즉시 버립니다.
+
+    Args:
+        chunks (iterable): S16_LE 모노 PCM 바이트 청크 (TTS_SAMPLE_RATE).
+        cancel_token (barge_in.CancelToken): 끼어들기 취소 토큰.
+        drain (bool): True면 쓴 소리가 모두 재생될 때까지 기다림 (False: 다음 문장을 이어서 쓸 때).
+
+    Returns:
+        bool: 끝까지 썼으면(drain이면 재생까지 마쳤으면) True, 취소로 중단되었으면 False.
+    """
+    cancel_callback = cancel_token.on_cancel(output_stream.interrupt) if cancel_token else None
+    try:
+        for chunk in chunks:
+            # write()는 중단 표시를 지우고 출력을 다시 열므로 취소 여부를 먼저 확인
+            if cancel_token is not None and cancel_token.cancelled:
+                return False
+            if not output_stream.write(chunk):
+                return False
+        if cancel_token is not None and cancel_token.cancelled:
+            return False
+        return output_stream.drain() if drain else True
+    finally:
+        if cancel_callback is not None:
+            cancel_token.remove(cancel_callback)
+
+def play_pcm_bytes(pcm_bytes, cancel_token=None):
+    """
+    synthesize_sentence()가 받은 PCM을 지속 출력 스트림에 이어 씁니다 (문장 사이 aplay 실행/종료 없음).
+    재생 완료는 기다리지 않으므로 마지막 문장 뒤에 output_stream.drain()을 호출해야 합니다.
+    """
+    try:
+        ok = write_output_chunks([pcm_bytes], cancel_token=cancel_token, drain=False)
+    except RuntimeError as e:
+        print(f"오류: {e}")
+        return False
+    if not ok:
+        print("재생 중단 (끼어들기).")
+    return ok
+
+def stream_tts_to_output(text_to_speak, cancel_token=None):
+    """
+    텍스트를 PC 서버 /generate_tts(_stream) 로 보내 PCM을 받는 즉시 지속 출력 스트림으로 재생합니다.
+    get_tts_audio_from_server() + play_audio()와 달리 response.wav 저장과 aplay 실행이 없고,
+    첫 버퍼가 도착하면 바로 재생이 시작됩니다. 재생이 끝날 때까지 기다립니다.
+
+    Returns:
+        bool: 끝까지 재생했으면 True, 실패했거나 취소되었으면 False.
+    """
+    tts_url = f"{PC_SERVER_URL}/generate_tts_stream" if TTS_STREAMING else f"{PC_SERVER_URL}/generate_tts"
+    print(f"텍스트 '{text_to_speak[:30]}...'를 TTS 서버({tts_url})로 전송 중 (직접 재생)...")
+    print("[main.py] TTS 요청 시 LED 노란색 변경 시도...")
+    if led_controller: led_controller.set_led_color(led_controller.COLOR_YELLOW)
+    payload = {"text": text_to_speak, "lang": "ko", "format": "pcm", "sample_rate": TTS_SAMPLE_RATE}
+    cancel_callback = None
+    started = time.perf_counter()
+    first_audio = []
+    try:
+        response = http_client.post(tts_url, endpoint="tts", json=payload, stream=True)
+        response.raise_for_status()
+        if 'audio/pcm' not in response.headers.get('Content-Type', ''):
+            print(f"오류: TTS 서버가 PCM 오디오를 반환하지 않았습니다. Content-Type: {response.headers.get('Content-Type')}")
+            if led_controller: led_controller.set_led_color(led_controller.COLOR_RED)
+            return False
+        cancel_callback = cancel_token.on_cancel(response.close) if cancel_token else None
+
+        def chunks():
+            for index, chunk in enumerate(response.iter_content(chunk_size=4096)):
+                if index == 0:
+                    first_audio.append(time.perf_counter())
+                    tracing.record("tts_first_audio", first_audio[0] - started, started_perf=started, chars=len(text_to_speak))
+                    print("[main.py] 첫 오디오 버퍼 수신 - 재생 시작, LED 초록색 변경 시도...")
+                    if led_controller: led_controller.set_led_color(led_controller.COLOR_GREEN)
+                yield chunk
+
+        with http_client.stream_outcome(response, cancel_token):
+            played = write_output_chunks(chunks(), cancel_token=cancel_token)
+        if first_audio: # 수신과 재생이 겹치므로 첫 버퍼부터 재생 완료까지를 재생 구간으로 기록
+            tracing.record("playback", time.perf_counter() - first_audio[0], started_perf=first_audio[0], ok=played)
+        if not played:
+            print("재생 중단 (끼어들기).")
+            return False
+        print("오디오 재생 완료.")
+        print("[main.py] 오디오 재생 완료 후 LED 흰색 변경 시도...")
+        if led_controller: led_controller.set_led_color(led_controller.COLOR_WHITE)
+        return True
+    except requests.exceptions.Timeout:
+        print(f"오류: TTS 서버({tts_url}) 연결 시간 초과")
+        if led_controller: led_controller.set_led_color(led_controller.COLOR_RED)
+        return False
+    except Exception as e:
+        if cancel_token is not None and cancel_token.cancelled:
+            print("재생 중단 (끼어들기).")
+            return False
+        if isinstance(e, requests.exceptions.RequestException):
+            print(f"오류: TTS 서버({tts_url}) 통신 오류: {e}")
+        else:
+            print(f"오류: 예상치 못한 TTS 재생 오류: {e}")
+            traceback.print_exc()
+        if led_controller: led_controller.set_led_color(led_controller.COLOR_RED)
+        return False
+    finally:
+        if cancel_callback is not None:
+            cancel_token.remove(cancel_callback)
+
+def set_pipeline_led(state):
+    """응답 파이프라인 상태에 맞춰 LED 색상을 바꿉니다 (생성/합성 대기: 노랑, 재생: 초록, 완료: 흰색, 실패: 빨강)."""
+    if led_controller is None:
+        return
+    colors = {
+        turn_pipeline.STATE_THINKING: led_controller.COLOR_YELLOW,
+        turn_pipeline.STATE_SYNTHESIZING: led_controller.COLOR_YELLOW,
+        turn_pipeline.STATE_SPEAKING: led_controller.COLOR_GREEN,
+        turn_pipeline.STATE_DONE: led_controller.COLOR_WHITE,
+        turn_pipeline.STATE_FAILED: led_controller.COLOR_RED,
+        turn_pipeline.STATE_INTERRUPTED: led_controller.COLOR_BLUE, # 바로 다음 녹음으로
+    }
+    print(f"[main.py] 파이프라인 상태: {state} -> LED 변경 시도...")
+    led_controller.set_led_color(colors[state])
+
+def reply_stage(route):
+    """응답 생성 구간의 추적 단계 이름 (LLM과 날씨 응답은 지연 분포가 전혀 달라 따로 집계)."""
+    return "llm" if route == conversation.ROUTE_LLM else f"reply_{route}"
+
+def traced(stage, func, **attrs):
+    """func 호출을 현재 턴의 스팬으로 기록하는 래퍼를 만듭니다 (None/False를 반환하면 실패로 기록)."""
+    def wrapper(*args, **kwargs):
+        with tracing.span(stage, **attrs) as span:
+            result = func(*args, **kwargs)
+            span["ok"] = result is not None and result is not False
+            return result
+    return wrapper
+
+def _traced_sentences(sentences, stage):
+    """응답 문장 생성기를 감싸 첫 문장까지의 시간('<stage>_first_sentence')과 전체 생성 시간을 기록합니다."""
+    started = time.perf_counter()
+    count = 0
+    with tracing.span(stage) as span:
+        for sentence in sentences:
+            if count == 0:
+                tracing.record(f"{stage}_first_sentence", time.perf_counter() - started, started_perf=started)
+            count += 1
+            yield sentence
+        span["sentences"] = count
+        span["ok"] = count > 0
+
+def respond_pipelined(stt_text, route, target_city, cancel_token=None):
+    """응답 문장이 만들어지는 대로 합성·재생합니다 (cancel_token이 취소되면 즉시 중단). 한 문장 이상 재생했으면 True."""
+    started = time.perf_counter()
+    sentences = _traced_sentences(conversation.stream_response_sentences(stt_text, route, target_city, weather_module,
+                                                                         language_model, cancel_token=cancel_token),
+                                  reply_stage(route))
+    play = play_pcm_bytes if output_stream is not None else play_audio_bytes
+    first_audio = []
+
+    def play_sentence(audio):
+        if not first_audio: # 응답 생성 시작부터 첫 소리까지 (사용자가 체감하는 응답 지연)
+            first_audio.append(time.perf_counter())
+            tracing.record("first_audio", first_audio[0] - started, started_perf=started)
+        return play(audio, cancel_token=cancel_token)
+
+    pipeline = turn_pipeline.TurnPipeline(traced("tts", functools.partial(synthesize_sentence, cancel_token=cancel_token)),
+                                          traced("playback", play_sentence),
+                                          prefetch=TTS_PIPELINE_PREFETCH, on_state=set_pipeline_led,
+                                          cancel_token=cancel_token)
+    played = pipeline.run(sentences) > 0
+    if played and output_stream is not None:
+        # 문장들을 끊김 없이 이어 썼으므로 마지막 소리가 끝날 때까지 여기서 기다림 (끼어들기 시 즉시 반환)
+        cancel_callback = cancel_token.on_cancel(output_stream.interrupt) if cancel_token else None
+        try:
+            with tracing.span("playback_drain") as span:
+                span["ok"] = output_stream.drain()
+        finally:
+            if cancel_callback is not None:
+                cancel_token.remove(cancel_callback)
+    return played
+
+def play_audio(filename=RESPONSE_AUDIO_FILENAME, cancel_token=None):
+    """aplay 명령어를 사용하여 오디오 파일을 재생합니다 (cancel_token이 취소되면 즉시 중단하고 False 반환)."""
     print(f"오디오 파일 재생 시작: {filename}")
     print("[main.py] 오디오 재생 시 LED 초록색 변경 시도...")
     if led_controller: led_controller.set_led_color(led_controller.COLOR_GREEN)
@@ -233,7 +929,8 @@ def play_audio(filename=RESPONSE_AUDIO_FILENAME):
             print(f"오류: 재생할 오디오 파일 '{filename}' 없음")
             if led_controller: led_controller.set_led_color(led_controller.COLOR_RED)
             return False
-        result = subprocess.run(command, check=True, capture_output=True, text=True)
+        if not run_player(command, cancel_token=cancel_token):
+            return False
         print("오디오 파일 재생 완료.")
         print("[main.py] 오디오 재생 완료 후 LED 흰색 변경 시도...")
         if led_controller: led_controller.set_led_color(led_controller.COLOR_WHITE)
@@ -244,7 +941,7 @@ def play_audio(filename=RESPONSE_AUDIO_FILENAME):
         return False
     except subprocess.CalledProcessError as e:
         print(f"오류: 오디오 재생 중 오류 발생 (종료 코드: {e.returncode})")
-        print(f"aplay 오류 출력:\n{e.stderr}")
+        print(f"aplay 오류 출력:\n{e.stderr.decode(errors='replace')}")
         if led_controller: led_controller.set_led_color(led_controller.COLOR_RED)
         return False
     except Exception as e:
@@ -253,166 +950,418 @@ def play_audio(filename=RESPONSE_AUDIO_FILENAME):
         if led_controller: led_controller.set_led_color(led_controller.COLOR_RED)
         return False
 
-def analyze_emotion_and_set_led(text):
-    """입력된 텍스트에서 감정 키워드를 찾아 LED 색상을 설정하고, 감지된 경우 잠시 해당 색상을 유지합니다."""
+def prepare_unavailable_notice():
+    """
+    장애 안내 음성 파일이 없으면 서버가 응답할 때 UNAVAILABLE_TEXT를 합성해 UNAVAILABLE_AUDIO_FILE로 저장합니다.
+    시작 시 백그라운드에서 한 번 호출합니다 (서버가 꺼져 있으면 조용히 건너뜀 - 그동안은 LED로만 알림).
+    """
+    if os.path.exists(UNAVAILABLE_AUDIO_FILE):
+        return True
+    payload = {"text": UNAVAILABLE_TEXT, "lang": "ko", "format": "wav", "sample_rate": TTS_SAMPLE_RATE}
+    try:
+        response = http_client.post(f"{PC_SERVER_URL}/generate_tts", endpoint="tts", json=payload)
+        response.raise_for_status()
+        if 'audio/wav' not in response.headers.get('Content-Type', ''):
+            return False
+        with open(UNAVAILABLE_AUDIO_FILE, 'wb') as f:
+            f.write(response.content)
+        print(f"장애 안내 음성 저장 완료: {UNAVAILABLE_AUDIO_FILE}")
+        return True
+    except (requests.exceptions.RequestException, OSError) as e:
+        print(f"경고: 장애 안내 음성을 준비하지 못했습니다 ({e}).")
+        return False
+
+def play_unavailable_notice(cancel_token=None):
+    """
+    원격 서비스 회로가 열려 있을 때의 즉시 대체 응답: LED를 빨간색으로 바꾸고 로컬 안내 음성을 재생합니다 (서버 요청 없음).
+
+    Returns:
+        bool: 안내 음성을 끝까지 재생했으면 True (파일이 없거나 재생 실패/취소 시 False).
+    """
+    print("[main.py] 원격 서비스 응답 없음 - 안내 음성 재생, LED 빨간색 변경 시도...")
+    if led_controller: led_controller.set_led_color(led_controller.COLOR_RED)
+    try:
+        with open(UNAVAILABLE_AUDIO_FILE, 'rb') as f:
+            wav_bytes = f.read()
+    except OSError:
+        print(f"안내 음성 파일 '{UNAVAILABLE_AUDIO_FILE}'이 없어 LED로만 알립니다.")
+        return False
+    with tracing.span("degraded"):
+        if output_stream is None:
+            return play_audio_bytes(wav_bytes, cancel_token=cancel_token)
+        try:
+            audio, sample_rate = audio_utils.decode_wav(wav_bytes)
+            pcm = audio_utils.float32_to_pcm16(audio_utils.resample_poly(audio, sample_rate, TTS_SAMPLE_RATE))
+            return write_output_chunks([pcm], cancel_token=cancel_token)
+        except (ValueError, RuntimeError) as e:
+            print(f"오류: 안내 음성을 재생하지 못했습니다 ({e}).")
+            return False
+
+def stt_endpoint():
+    """현재 모드에서 발화를 보내는 PC 서버 엔드포인트 이름 (회로 차단기 구분용)."""
+    return "converse" if CONVERSE_MODE else "stt_stream" if STT_STREAMING else "stt"
+
+def analyze_emotion_and_set_led(analysis):
+    """텍스트 분석 결과(conversation.analyze_text())의 감정으로 LED 색상을 설정하고, 감지된 경우 잠시 해당 색상을 유지합니다.
+    감정 키워드와 색상은 의도 설정 파일(conversation.INTENTS_FILE)의 "emotions"에서 읽습니다."""
     if led_controller is None:
         print("[main.py] 감정 분석: LED 컨트롤러 없음.")
         return
 
-    emotion_detected = False
-    target_color = None
-
-    if "우울" in text:
-        print("[main.py] 감정 감지: 우울 -> 파란색 설정 시도")
-        target_color = led_controller.COLOR_BLUE
-        emotion_detected = True
-    elif "예민" in text or "짜증" in text:
-        print("[main.py] 감정 감지: 예민/짜증 -> 빨간색 설정 시도")
-        target_color = led_controller.COLOR_RED
-        emotion_detected = True
-    elif "안정" in text or "차분" in text or "평온" in text:
-        print("[main.py] 감정 감지: 안정/차분 -> 초록색 설정 시도")
-        target_color = led_controller.COLOR_GREEN
-        emotion_detected = True
-    elif "기뻐" in text or "행복" in text or "신나" in text:
-        print("[main.py] 감정 감지: 기쁨/행복 -> 노란색 설정 시도")
-        target_color = led_controller.COLOR_YELLOW
-        emotion_detected = True
-    else:
-        print("[main.py] 감정 감지: 특정 감정 키워드 없음")
+    emotion = analysis.emotion
+    color_name = conversation.get_router(weather_module).emotion_colors.get(emotion) if emotion else None
+    target_color = getattr(led_controller, f"COLOR_{color_name.upper()}", None) if color_name else None
 
-    if emotion_detected and target_color:
+    if emotion is None:
+        print("[main.py] 감정 감지: 특정 감정 키워드 없음")
+    elif target_color is None:
+        print(f"[main.py] 감정 감지: {emotion} (LED 색상 설정 없음)")
+    else:
+        print(f"[main.py] 감정 감지: {emotion} -> {color_name} 설정 시도")
         led_controller.set_led_color(target_color)
         print("감정 LED 색상 1초간 유지...")
         time.sleep(1)
 
+# --- 시작 초기화 ---
+class StartupTimer:
+    """시작 단계별 소요 시간 기록. 백그라운드 단계는 스레드 이름과 함께 표시합니다."""
+
+    def __init__(self, started=STARTUP_STARTED):
+        self.started = started
+        self.phases = [] # [(단계, 시작 오프셋 초, 소요 초, 스레드 이름)]
+        self._lock = threading.Lock()
+
+    def add(self, name, started, elapsed):
+        with self._lock:
+            self.phases.append((name, started - self.started, elapsed, threading.current_thread().name))
+
+    @contextlib.contextmanager
+    def phase(self, name):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(name, started, time.perf_counter() - started)
+
+    def report(self, title):
+        print(f"[startup] {title}: 시작 후 {time.perf_counter() - self.started:.2f}초")
+        with self._lock:
+            phases = sorted(self.phases, key=lambda phase: phase[1])
+        for name, offset, elapsed, thread_name in phases:
+            where = "" if thread_name == "MainThread" else f" ({thread_name})"
+            print(f"[startup]   {name:<16} +{offset:5.2f}s  {elapsed * 1000:7.0f}ms{where}")
+
+def power_on_led(module):
+    """LED 전원을 켜고 대기 색상(흰색)으로 설정합니다. Returns: bool 성공 여부."""
+    print("LED 컨트롤러 활성화됨. LED 전원 켜기 시도...")
+    power_on_result = module.power_on()
+    print(f"  -> led_controller.power_on() 반환값: {power_on_result}")
+    if power_on_result:
+        print("LED 전원 켜기 성공. (대기: 흰색 설정 시도)")
+        module.set_led_color(module.COLOR_WHITE)
+        return True
+    print("경고: LED 전원을 켜지 못했습니다. LED가 작동하지 않을 수 있습니다.")
+    return False
+
+def run_led_self_test(module):
+    """빨강 → 초록 → 파랑 → 끄기 → 흰색 순서로 LED를 확인합니다 (약 7초, LED_SELF_TEST)."""
+    print("\n--- [테스트] 직접 LED 색상 변경 시작 ---")
+    try:
+        print("  -> 빨간색 설정 시도...")
+        module.set_led_color(module.COLOR_RED)
+        time.sleep(2)
+        print("  -> 초록색 설정 시도...")
+        module.set_led_color(module.COLOR_GREEN)
+        time.sleep(2)
+        print("  -> 파란색 설정 시도...")
+        module.set_led_color(module.COLOR_BLUE)
+        time.sleep(2)
+        print("  -> 색상 OFF 시도...")
+        module.turn_off_leds_only()
+        time.sleep(1)
+        print("  -> 테스트 후 대기 색상(흰색) 설정 시도...")
+        module.set_led_color(module.COLOR_WHITE)
+        print("--- [테스트] 직접 LED 색상 변경 완료 ---\n")
+    except Exception as led_test_err:
+        print(f"!!! 직접 LED 테스트 중 오류 발생: {led_test_err}")
+        traceback.print_exc()
+
+def initialize_led(timer, module=None):
+    """
+    LED 컨트롤러를 (필요하면 임포트하고) 켠 뒤 전역 led_controller에 등록합니다.
+    자가 테스트가 끝난 뒤에 등록하므로, 그동안 턴 처리 코드는 LED가 없는 것처럼 동작합니다.
+    """
+    global led_controller
+    if module is None:
+        with timer.phase("led_import"):
+            module = load_led_controller()
+    if module is None:
+        print("LED 기능이 비활성화된 상태로 실행됩니다.")
+        return None
+    with timer.phase("led_power_on"):
+        powered = power_on_led(module)
+    if powered and LED_SELF_TEST:
+        with timer.phase("led_self_test"):
+            run_led_self_test(module)
+    led_controller = module
+    return module
+
+def initialize_weather_module(timer):
+    global weather_module
+    with timer.phase("weather_import"):
+        module = load_weather_module()
+    with timer.phase("intent_router"):
+        conversation.get_router(module) # 첫 턴에서 키워드 컴파일 비용을 내지 않도록 미리 컴파일
+    weather_module = module
+
+def initialize_language_model(timer):
+    global language_model
+    with timer.phase("llm_import"):
+        language_model = load_language_model()
+
+def initialize_output_stream(timer):
+    """지속 출력 스트림을 엽니다 (DIRECT_PLAYBACK). 실패하면 파일 저장 후 aplay 재생."""
+    global output_stream
+    with timer.phase("output_stream"):
+        try:
+            output_stream = audio_output.PCMOutputStream(TTS_SAMPLE_RATE, device=AUDIO_OUTPUT_DEVICE,
+                                                         backend=AUDIO_OUTPUT_BACKEND).start()
+        except Exception as e: # aplay 없음, sounddevice 미설치/장치 오류 등
+            print(f"경고: 오디오 출력 스트림을 열 수 없어 파일 저장 후 aplay로 재생합니다 ({e}).")
+            output_stream = None
+
+def start_background_initialization(timer):
+    """
+    서로 독립적인 하위 시스템(LED, 날씨, LLM, 출력 스트림)을 백그라운드 스레드에서 병렬로 초기화합니다 (FAST_STARTUP).
+    녹음은 기다리지 않고 바로 시작하며, 녹음이 끝난 뒤 응답 처리 전에 wait_for_startup()으로 완료를 기다립니다.
+    """
+    tasks = [functools.partial(initialize_led, timer), functools.partial(initialize_weather_module, timer),
+             functools.partial(initialize_language_model, timer)]
+    if DIRECT_PLAYBACK:
+        tasks.append(functools.partial(initialize_output_stream, timer))
+    executor = concurrent.futures.ThreadPoolExecutor(max_workers=len(tasks), thread_name_prefix="startup")
+    startup_futures.extend(executor.submit(task) for task in tasks)
+    executor.shutdown(wait=False)
+
+    def report_when_done():
+        concurrent.futures.wait(startup_futures)
+        timer.report("백그라운드 초기화 완료")
+    threading.Thread(target=report_when_done, name="startup-report", daemon=True).start()
+
+def wait_for_startup():
+    """백그라운드 시작 초기화가 남아 있으면 끝날 때까지 기다립니다 (응답 처리에 날씨/LLM/출력 스트림이 필요)."""
+    pending = [future for future in startup_futures if not future.done()]
+    if not pending:
+        return
+    print("시작 초기화가 끝나기를 기다립니다...")
+    with tracing.span("startup_wait"):
+        for future in pending:
+            try:
+                future.result()
+            except Exception as e:
+                print(f"경고: 시작 초기화 중 오류 발생 ({e}).")
+                traceback.print_exc()
+
+def run_turn(capture_start=None, onset_timeout=None):
+    """
+    한 턴(녹음 → STT → 응답 생성 → TTS → 재생)을 처리합니다. 메인 루프와 benchmark_turns.py가 함께 사용합니다.
+
+    Args:
+        capture_start (int): 녹음을 시작할 상시 캡처 위치 (호출어 직후 / 끼어든 발화, 기본: 지금).
+        onset_timeout (float): 이 시간(초) 안에 발화가 시작되지 않으면 녹음 없이 끝냄 (호출어 후 대기).
+
+    Returns:
+        int: 응답 중 끼어들기가 있었으면 다음 녹음을 시작할 캡처 위치, 아니면 None.
+    """
+    barge_in_position = None
+    turn = tracing.start_turn()
+    tracing.set_turn_attrs(mode=stt_endpoint(), barge_in=capture_start is not None and onset_timeout is None)
+
+    if http_client.circuit_open(stt_endpoint()):
+        # 서버가 응답하지 않는 동안: 발화는 기다렸다가 서버 요청(타임아웃 대기) 없이 바로 안내
+        recorded = record_utterance(capture_start=capture_start, onset_timeout=onset_timeout) is not None
+        tracing.set_turn_attrs(degraded=True)
+        if recorded:
+            play_unavailable_notice()
+        tracing.end_turn(ok=recorded)
+        print(f"[trace] 턴 {turn.turn_id}: {turn.elapsed():.2f}초")
+        return None
+
+    # 1. 음성 녹음 (수정된 rate 사용) + 2. STT 요청
+    if CONVERSE_MODE:
+        # 녹음 파일 하나로 STT·응답 생성·TTS를 서버에서 한 번에 처리
+        recorded_audio = record_utterance(capture_start=capture_start, onset_timeout=onset_timeout)
+        recorded = recorded_audio is not None
+        if recorded:
+            wait_for_startup()
+            monitor = start_barge_in_monitor()
+            cancel_token = monitor.token if monitor else None
+            try:
+                if traced("converse", converse_with_server)(recorded_audio, cancel_token=cancel_token):
+                    if output_stream is None:
+                        traced("playback", play_audio)(cancel_token=cancel_token)
+                elif http_client.circuit_open("converse"):
+                    play_unavailable_notice(cancel_token)
+            finally:
+                barge_in_position = stop_barge_in_monitor(monitor)
+                tracing.set_turn_attrs(interrupted=barge_in_position is not None)
+    elif STT_STREAMING:
+        # 녹음과 동시에 서버로 전송/인식 (녹음 실패는 STT 실패로 처리됨)
+        recorded = True
+        stt_text = get_stt_stream_from_server(record_audio_stream(endpointer=create_endpointer() if VAD_RECORDING else None,
+                                                                  capture_start=capture_start, onset_timeout=onset_timeout))
+    else:
+        recorded_audio = record_utterance(capture_start=capture_start, onset_timeout=onset_timeout)
+        recorded = recorded_audio is not None
+        stt_text = traced("stt", get_stt_from_server)(recorded_audio) if recorded else None
+
+    if recorded and not CONVERSE_MODE:
+        wait_for_startup()
+        # 2. STT 결과 처리
+        # --- ★★★ STT 결과 유효성 검사 추가 ★★★ ---
+        if conversation.is_valid_stt_text(stt_text): # 비어있지 않고, 최소 2글자 이상일 때만 처리
+            print(f"인식된 텍스트: '{stt_text}' (처리 진행)")
+            analysis = conversation.analyze_text(stt_text, weather_module) # 감정 LED와 분기가 한 번의 분석을 공유
+            analyze_emotion_and_set_led(analysis)
+
+            # 3. 텍스트 처리 (날씨 또는 LLM) - 이 동안 사용자가 말하면 끼어들기로 중단
+            with tracing.span("route") as span:
+                route, target_city = conversation.route_request(stt_text, weather_module, language_model, analysis)
+                span["route"] = route
+            tracing.set_turn_attrs(route=route)
+            monitor = start_barge_in_monitor()
+            cancel_token = monitor.token if monitor else None
+            try:
+                if PIPELINED_TURNS:
+                    # 3+4. 응답 생성 / TTS / 재생을 문장 단위로 겹쳐 실행
+                    if not traced("respond", respond_pipelined)(stt_text, route, target_city, cancel_token=cancel_token):
+                        print("응답 오디오를 재생하지 못했습니다.")
+                        if http_client.circuit_open("tts") and not (cancel_token is not None and cancel_token.cancelled):
+                            play_unavailable_notice(cancel_token)
+                else:
+                    if route == conversation.ROUTE_LLM:
+                        print("[main.py] LLM 요청 시 LED 노란색 변경 시도...")
+                        if led_controller: led_controller.set_led_color(led_controller.COLOR_YELLOW)
+                    # (전체 응답 방식의 LLM 요청은 중단할 수 없음 - 끼어들기는 응답 후 TTS/재생 단계에서 반영)
+                    with tracing.span(reply_stage(route)):
+                        response_text = conversation.build_response(stt_text, route, target_city, weather_module, language_model)
+                    if route == conversation.ROUTE_LLM:
+                        print("[main.py] LLM 완료 후 LED 흰색 변경 시도...")
+                        if led_controller: led_controller.set_led_color(led_controller.COLOR_WHITE)
+
+                    # 4. 응답 생성 확인 및 TTS/재생
+                    print(f"생성된 응답: '{response_text}'")
+                    if cancel_token is not None and cancel_token.cancelled:
+                        print("끼어들기로 응답 재생을 건너뜁니다.")
+                    elif output_stream is not None:
+                        # 파일 저장/aplay 실행 없이 받는 즉시 재생 (실패 LED는 함수 안에서 처리)
+                        if not stream_tts_to_output(response_text, cancel_token=cancel_token) and http_client.circuit_open("tts"):
+                            play_unavailable_notice(cancel_token)
+                    elif traced("tts", get_tts_audio_from_server)(response_text, cancel_token=cancel_token):
+                        traced("playback", play_audio)(cancel_token=cancel_token)
+                    elif not (cancel_token is not None and cancel_token.cancelled):
+                        print("TTS 오디오 생성에 실패하여 재생할 수 없습니다.")
+                        if http_client.circuit_open("tts"):
+                            play_unavailable_notice(cancel_token)
+                        elif led_controller: led_controller.set_led_color(led_controller.COLOR_RED)
+            finally:
+                barge_in_position = stop_barge_in_monitor(monitor)
+                tracing.set_turn_attrs(interrupted=barge_in_position is not None)
+
+        # --- ★★★ STT 결과가 짧거나 비어있는 경우 처리 ★★★ ---
+        elif stt_text is not None:
+            print(f"인식된 텍스트가 너무 짧거나 비어있습니다: '{stt_text}' (처리 건너<0xEB><0x85>).")
+            if led_controller: led_controller.set_led_color(led_controller.COLOR_WHITE) # 대기 상태로
+        # --- ★★★ STT 실패 경우 ★★★ ---
+        else:
+            print("STT 변환 실패. (처리 건너<0xEB><0x85>).")
+            # 오류 시 RED는 get_stt_from_server 에서 처리됨
+            if http_client.circuit_open(stt_endpoint()):
+                play_unavailable_notice()
+
+    # 음성 녹음 실패 시
+    elif not recorded:
+        print("오디오 녹음에 실패했습니다. 마이크 연결 및 설정을 확인하세요.")
+
+    # (녹음은 메모리에서 바로 업로드하므로 지울 임시 파일 없음)
+    tracing.end_turn(ok=recorded)
+    print(f"[trace] 턴 {turn.turn_id}: {turn.elapsed():.2f}초")
+    return barge_in_position
+
 # --- 메인 실행 로직 ---
 if __name__ == "__main__":
     print("\n========================================")
     print("      음성 대화 시스템 시작")
     print("========================================")
 
-    power_on_success = False
-    if led_controller:
-        print("LED 컨트롤러 활성화됨. LED 전원 켜기 시도...")
-        power_on_result = led_controller.power_on()
-        print(f"  -> led_controller.power_on() 반환값: {power_on_result}")
-        if power_on_result:
-             print("LED 전원 켜기 성공. (대기: 흰색 설정 시도)")
-             led_controller.set_led_color(led_controller.COLOR_WHITE)
-             power_on_success = True
-        else:
-             print("경고: LED 전원을 켜지 못했습니다. LED가 작동하지 않을 수 있습니다.")
+    startup_timer = StartupTimer()
+    startup_timer.add("imports", STARTUP_STARTED, time.perf_counter() - STARTUP_STARTED)
+    if FAST_STARTUP:
+        # 상시 캡처만 먼저 열고, 나머지는 백그라운드에서 병렬 초기화
+        start_background_initialization(startup_timer)
+    elif led_controller:
+        initialize_led(startup_timer, led_controller)
     else:
         print("LED 기능이 비활성화된 상태로 실행됩니다.")
 
-    if led_controller and power_on_success:
-         print("\n--- [테스트] 직접 LED 색상 변경 시작 ---")
-         try:
-             print("  -> 빨간색 설정 시도...")
-             led_controller.set_led_color(led_controller.COLOR_RED)
-             time.sleep(2)
-             print("  -> 초록색 설정 시도...")
-             led_controller.set_led_color(led_controller.COLOR_GREEN)
-             time.sleep(2)
-             print("  -> 파란색 설정 시도...")
-             led_controller.set_led_color(led_controller.COLOR_BLUE)
-             time.sleep(2)
-             print("  -> 색상 OFF 시도...")
-             led_controller.turn_off_leds_only()
-             time.sleep(1)
-             print("  -> 테스트 후 대기 색상(흰색) 설정 시도...")
-             led_controller.set_led_color(led_controller.COLOR_WHITE)
-             print("--- [테스트] 직접 LED 색상 변경 완료 ---\n")
-         except Exception as led_test_err:
-             print(f"!!! 직접 LED 테스트 중 오류 발생: {led_test_err}")
-             traceback.print_exc()
+    if PERSISTENT_CAPTURE:
+        with startup_timer.phase("capture_stream"):
+            try:
+                audio_capture = capture_stream.CaptureStream(AUDIO_RECORD_DEVICE, AUDIO_RECORD_FORMAT, AUDIO_RECORD_RATE,
+                                                             buffer_seconds=CAPTURE_BUFFER_SECONDS)
+                audio_capture.start()
+            except FileNotFoundError:
+                print("경고: 'arecord' 명령어를 찾을 수 없어 상시 캡처를 사용할 수 없습니다. 턴마다 녹음합니다.")
+                audio_capture = None
+    if WAKE_WORD_ENABLED:
+        with startup_timer.phase("wake_word"):
+            wake_detector = create_wake_word_detector()
+    if TRACE_ENABLED:
+        tracing.configure(TRACE_FILE, max_bytes=TRACE_MAX_BYTES, backup_count=TRACE_BACKUP_COUNT,
+                          propagate_to=[PC_SERVER_URL] if TRACE_PROPAGATE else [])
+        print(f"턴 추적 기록: {TRACE_FILE}")
+    if DIRECT_PLAYBACK and not FAST_STARTUP:
+        initialize_output_stream(startup_timer)
+    startup_timer.report("듣기 준비 완료")
+    # 장애 안내 음성이 없으면 서버가 살아 있는 동안 미리 합성해 둠 (듣기 시작을 늦추지 않도록 백그라운드)
+    threading.Thread(target=prepare_unavailable_notice, name="unavailable-notice", daemon=True).start()
 
     first_run = True
+    barge_in_position = None # 직전 턴에서 끼어든 발화의 캡처 위치 (다음 녹음을 여기서 바로 시작)
     while True:
         try:
             print("\n----------------------------------------")
             if first_run:
-                print("시스템 준비 완료. 잠시 후 첫 녹음을 시작합니다...")
-                time.sleep(2)
+                if STARTUP_DELAY_SECONDS > 0:
+                    print("시스템 준비 완료. 잠시 후 첫 녹음을 시작합니다...")
+                    time.sleep(STARTUP_DELAY_SECONDS)
                 first_run = False
+            # 0. 호출어 대기 (감지 전에는 녹음/서버 요청 없음)
+            capture_start, onset_timeout = None, None
+            if barge_in_position is not None:
+                # 끼어든 발화는 이미 시작되었으므로 호출어 대기 없이 그 위치부터 녹음
+                print("끼어든 발화부터 바로 녹음합니다...")
+                capture_start, barge_in_position = barge_in_position, None
+            elif wake_detector is not None:
+                print("호출어를 기다립니다...")
+                capture_start = wait_for_wake_word(wake_detector)
+                if capture_start is None:
+                    print("경고: 캡처 스트림이 멈춰 호출어를 기다릴 수 없습니다. 1초 후 다시 시도합니다.")
+                    time.sleep(1)
+                    continue
+                onset_timeout = WAKE_WORD_LISTEN_SECONDS
             print("음성 입력을 기다립니다...")
-
-            # 1. 음성 녹음 (수정된 rate 사용)
-            if record_audio():
-                # 2. STT 요청 및 결과 처리
-                stt_text = get_stt_from_server(RECORDED_AUDIO_FILENAME)
-
-                # --- ★★★ STT 결과 유효성 검사 추가 ★★★ ---
-                if stt_text is not None and len(stt_text.strip()) > 1: # 비어있지 않고, 최소 2글자 이상일 때만 처리 (예시 조건)
-                    print(f"인식된 텍스트: '{stt_text}' (처리 진행)")
-                    response_text = ""
-                    analyze_emotion_and_set_led(stt_text)
-
-                    # 3. 텍스트 처리 (날씨 또는 LLM)
-                    if ("날씨" in stt_text or "기온" in stt_text or "온도" in stt_text) and weather_module:
-                        print("날씨 관련 키워드 감지됨. 날씨 정보 조회 시도...")
-                        target_city = weather_module.DEFAULT_CITY_KO
-                        words = stt_text.split()
-                        for city_ko in weather_module.CITY_NAME_MAP_KO_EN.keys():
-                            if city_ko in words:
-                                target_city = city_ko; print(f"-> 대상 도시 감지: {target_city}"); break
-                        if "여기" in words or "현재" in words or "지금" in words:
-                            target_city = 'auto'; print("-> 현재 위치 날씨 요청 감지")
-                        response_text = weather_module.get_weather(target_city)
-                        print(f"-> 날씨 정보 조회 결과: {response_text if response_text else '정보 없음'}")
-                    elif language_model:
-                        print("LLM 응답 생성 시도...")
-                        print("[main.py] LLM 요청 시 LED 노란색 변경 시도...")
-                        if led_controller: led_controller.set_led_color(led_controller.COLOR_YELLOW)
-                        response_text = language_model.get_llm_response(stt_text)
-                        print("[main.py] LLM 완료 후 LED 흰색 변경 시도...")
-                        if led_controller: led_controller.set_led_color(led_controller.COLOR_WHITE)
-                    else:
-                        response_text = "죄송합니다. 날씨나 일반 대화 기능을 사용할 수 없습니다."
-
-                    # 4. 응답 생성 확인 및 TTS/재생
-                    if not response_text:
-                        response_text = "죄송합니다. 요청을 처리하지 못했습니다."
-                    print(f"생성된 응답: '{response_text}'")
-                    if get_tts_audio_from_server(response_text):
-                        play_audio()
-                    else:
-                        print("TTS 오디오 생성에 실패하여 재생할 수 없습니다.")
-                        if led_controller: led_controller.set_led_color(led_controller.COLOR_RED)
-
-                # --- ★★★ STT 결과가 짧거나 비어있는 경우 처리 ★★★ ---
-                elif stt_text is not None:
-                    print(f"인식된 텍스트가 너무 짧거나 비어있습니다: '{stt_text}' (처리 건너<0xEB><0x85>).")
-                    if led_controller: led_controller.set_led_color(led_controller.COLOR_WHITE) # 대기 상태로
-                # --- ★★★ STT 실패 경우 ★★★ ---
-                else:
-                    print("STT 변환 실패. (처리 건너<0xEB><0x85>).")
-                    # 오류 시 RED는 get_stt_from_server 에서 처리됨
-
-            # 음성 녹음 실패 시
-            else:
-                print("오디오 녹음에 실패했습니다. 마이크 연결 및 설정을 확인하세요.")
-
-            # --- 루프 마지막 정리 ---
-            if os.path.exists(RECORDED_AUDIO_FILENAME):
-                print(f"[main loop] 임시 녹음 파일 '{RECORDED_AUDIO_FILENAME}' 삭제 시도...")
-                try:
-                    os.remove(RECORDED_AUDIO_FILENAME)
-                    print(f"[main loop] 임시 녹음 파일 삭제 완료.")
-                except OSError as e:
-                    print(f"경고: 임시 녹음 파일 삭제 오류: {e}")
-                    traceback.print_exc()
-            else:
-                 print(f"[main loop] 임시 녹음 파일 '{RECORDED_AUDIO_FILENAME}' 이미 없음.")
-
-            print("다음 사이클까지 3초 대기...")
-            time.sleep(3)
+            barge_in_position = run_turn(capture_start, onset_timeout)
+            if barge_in_position is None:
+                print("다음 사이클까지 3초 대기...")
+                time.sleep(3)
 
         except KeyboardInterrupt:
             print("\nCtrl+C 입력 감지. 프로그램을 종료합니다.")
+            tracing.end_turn(ok=False)
             break
         except Exception as main_loop_error:
+            tracing.end_turn(ok=False)
             print(f"\n!!! 메인 루프에서 심각한 오류 발생: {main_loop_error} !!!")
             traceback.print_exc()
             if led_controller: led_controller.set_led_color(led_controller.COLOR_RED)
@@ -423,6 +1372,13 @@ if __name__ == "__main__":
     print("\n========================================")
     print("      음성 대화 시스템 종료")
     print("========================================")
+    if audio_capture:
+        audio_capture.stop()
+    if output_stream:
+        output_stream.close()
+    http_client.close()
+    tracing.close()
+    concurrent.futures.wait(startup_futures, timeout=5) # 초기화 중인 LED를 정리하기 전에 완료 대기
     if led_controller:
         print("LED 컨트롤러 정리 작업 수행...")
         led_controller.cleanup()
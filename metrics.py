@@ -0,0 +1,195 @@
+# -*- coding: utf-8 -*-
+"""
+경량 Prometheus 메트릭 (외부 라이브러리 없음).
+app.py의 /metrics 엔드포인트가 Prometheus 텍스트 형식(0.0.4)으로 내보냅니다.
+
+주의: 값은 프로세스 단위입니다. serve.py처럼 워커가 여러 개이면 각 워커가 자기 값만 보고합니다.
+"""
+import bisect
+import collections
+import threading
+import time
+from contextlib import contextmanager
+
+# --- 설정 ---
+# 지연 시간 히스토그램 버킷 (초): 수 ms 단위 캐시 적중부터 수십 초 단위 대형 모델 추론까지
+DEFAULT_LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+# --- 설정 끝 ---
+
+def _escape_label_value(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+def _format_labels(label_names, label_values, extra=()):
+    pairs = list(zip(label_names, label_values)) + list(extra)
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape_label_value(value)}"' for name, value in pairs) + "}"
+
+def _format_value(value):
+    if value == float('inf'):
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+class _Metric:
+    metric_type = "untyped"
+
+    def __init__(self, name, help_text, label_names=()):
+        self.name = name
+        self.help_text = help_text
+        self.label_names = tuple(label_names)
+        self._lock = threading.Lock()
+
+    def _key(self, labels):
+        if set(labels) != set(self.label_names):
+            raise ValueError(f"{self.name}: 레이블 {sorted(self.label_names)}이(가) 필요합니다 (받은 값: {sorted(labels)})")
+        return tuple(str(labels[name]) for name in self.label_names)
+
+    def _header(self):
+        return [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} {self.metric_type}"]
+
+class Counter(_Metric):
+    """단조 증가 카운터."""
+    metric_type = "counter"
+
+    def __init__(self, name, help_text, label_names=()):
+        super().__init__(name, help_text, label_names)
+        self._values = {}
+
+    def inc(self, amount=1.0, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def render(self):
+        lines = self._header()
+        with self._lock:
+            for key, value in sorted(self._values.items()):
+                lines.append(f"{self.name}{_format_labels(self.label_names, key)} {_format_value(value)}")
+        return lines
+
+class Gauge(_Metric):
+    """증감 가능한 현재 값."""
+    metric_type = "gauge"
+
+    def __init__(self, name, help_text, label_names=()):
+        super().__init__(name, help_text, label_names)
+        self._values = {}
+
+    def set(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = float(value)
+
+    def inc(self, amount=1.0, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def dec(self, amount=1.0, **labels):
+        self.inc(-amount, **labels)
+
+    def render(self):
+        lines = self._header()
+        with self._lock:
+            for key, value in sorted(self._values.items()):
+                lines.append(f"{self.name}{_format_labels(self.label_names, key)} {_format_value(value)}")
+        return lines
+
+class Histogram(_Metric):
+    """누적 버킷 히스토그램 (_bucket / _sum / _count)."""
+    metric_type = "histogram"
+
+    def __init__(self, name, help_text, label_names=(), buckets=DEFAULT_LATENCY_BUCKETS):
+        super().__init__(name, help_text, label_names)
+        self.buckets = tuple(sorted(buckets))
+        self._series = {} # key → [버킷별 개수 리스트, 합계, 개수]
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+
+    @contextmanager
+    def time(self, **labels):
+        """with 블록의 실행 시간을 관측합니다."""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, **labels)
+
+    def render(self):
+        lines = self._header()
+        with self._lock:
+            for key, (bucket_counts, total, count) in sorted(self._series.items()):
+                cumulative = 0
+                for bound, bucket_count in zip(self.buckets + (float('inf'),), bucket_counts):
+                    cumulative += bucket_count
+                    labels = _format_labels(self.label_names, key, [("le", _format_value(bound))])
+                    lines.append(f"{self.name}_bucket{labels} {cumulative}")
+                lines.append(f"{self.name}_sum{_format_labels(self.label_names, key)} {_format_value(total)}")
+                lines.append(f"{self.name}_count{_format_labels(self.label_names, key)} {count}")
+        return lines
+
+class RateWindow:
+    """최근 window초 동안 더해진 양의 초당 비율 (예: 벽시계 1초당 처리한 오디오 초)."""
+
+    def __init__(self, window=60.0):
+        self.window = window
+        self._events = collections.deque()
+        self._lock = threading.Lock()
+
+    def add(self, amount):
+        now = time.monotonic()
+        with self._lock:
+            self._events.append((now, amount))
+            self._trim(now)
+
+    def rate(self):
+        now = time.monotonic()
+        with self._lock:
+            self._trim(now)
+            return sum(amount for _, amount in self._events) / self.window
+
+    def _trim(self, now):
+        while self._events and self._events[0][0] < now - self.window:
+            self._events.popleft()
+
+class Registry:
+    """메트릭 모음. render()로 Prometheus 텍스트를 만듭니다."""
+
+    def __init__(self):
+        self._metrics = []
+        self._lock = threading.Lock()
+
+    def register(self, metric):
+        with self._lock:
+            self._metrics.append(metric)
+        return metric
+
+    def counter(self, name, help_text, label_names=()):
+        return self.register(Counter(name, help_text, label_names))
+
+    def gauge(self, name, help_text, label_names=()):
+        return self.register(Gauge(name, help_text, label_names))
+
+    def histogram(self, name, help_text, label_names=(), buckets=DEFAULT_LATENCY_BUCKETS):
+        return self.register(Histogram(name, help_text, label_names, buckets))
+
+    def render(self):
+        with self._lock:
+            metrics = list(self._metrics)
+        lines = []
+        for metric in metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
@@ -0,0 +1,83 @@
+# -*- coding: utf-8 -*-
+"""
+운영용 멀티 프로세스 서버 실행 스크립트 (gunicorn, pip install gunicorn 필요).
+
+- 마스터 프로세스가 포크 전에 STT 모델을 한 번만 로드하고, 워커들은 그 메모리를
+  copy-on-write로 공유합니다 (워커 수만큼 모델을 다시 로드하지 않음).
+- 각 워커는 포크 후 워밍업/배치 스케줄러를 자기 프로세스 안에서 시작합니다.
+- 요청 수락 제어(app.py의 ADMISSION_*)는 워커 단위로 적용되어, 포화 시 429 + Retry-After를 반환합니다.
+
+워커 스레드 수와 수락 제어의 관계:
+    gthread 워커는 스레드 하나가 요청 하나를 끝까지 처리하며, 수락 대기열에서 기다리는 요청도 스레드를 차지합니다.
+    스레드가 ADMISSION_MAX_INFLIGHT + ADMISSION_MAX_QUEUE 이하이면 대기열이 차기 전에 스레드가 바닥나,
+    넘친 요청은 429를 받지 못하고 gunicorn 내부 연결 대기열에서 클라이언트 타임아웃까지 기다립니다.
+    그래서 SERVER_THREADS >= ADMISSION_MAX_INFLIGHT + ADMISSION_MAX_QUEUE + 1 (거절용 여유 스레드 1개)이어야 하며,
+    기본값은 이 최솟값이고 더 작게 지정하면 시작하지 않습니다.
+
+사용 예:
+    SERVER_WORKERS=4 ADMISSION_MAX_INFLIGHT=4 ADMISSION_MAX_QUEUE=8 python serve.py   (워커당 스레드 13개)
+"""
+import gc
+import os
+
+# app.py가 import 시점에 백그라운드 로드를 시작하지 않도록 함 (로드는 아래에서 포크 전에 직접 수행)
+os.environ.setdefault("STT_DEFER_LOAD", "1")
+
+from gunicorn.app.base import BaseApplication
+
+import app as audio_app
+
+# --- 설정 ---
+SERVER_BIND = os.getenv("SERVER_BIND", "0.0.0.0:5001")
+SERVER_WORKERS = int(os.getenv("SERVER_WORKERS", max(2, (os.cpu_count() or 2) // 2)))
+MIN_SERVER_THREADS = audio_app.ADMISSION_MAX_INFLIGHT + audio_app.ADMISSION_MAX_QUEUE + 1 # 처리 + 대기 + 429 거절용
+SERVER_THREADS = int(os.getenv("SERVER_THREADS", MIN_SERVER_THREADS)) # 워커당 요청 처리 스레드 수 (gthread)
+SERVER_TIMEOUT = int(os.getenv("SERVER_TIMEOUT", 120)) # 워커 응답 없음 판정 시간 (초)
+SERVER_BACKLOG = int(os.getenv("SERVER_BACKLOG", 64))  # 커널 accept 대기열 길이
+# --- 설정 끝 ---
+
+def post_fork(server, worker):
+    """gunicorn 훅: 워커 포크 직후 호출. 공유된 엔진을 이 워커에서 활성화합니다."""
+    print(f"워커 시작 (pid={worker.pid}). STT 엔진 활성화 중...")
+    audio_app.start_worker_after_fork()
+
+class AudioServer(BaseApplication):
+    """설정 파일 없이 코드에서 gunicorn 옵션을 지정하는 애플리케이션 래퍼."""
+
+    def __init__(self, application, options):
+        self.application = application
+        self.options = options
+        super().__init__()
+
+    def load_config(self):
+        for key, value in self.options.items():
+            self.cfg.set(key, value)
+
+    def load(self):
+        return self.application
+
+if __name__ == "__main__":
+    if SERVER_THREADS < MIN_SERVER_THREADS:
+        raise SystemExit(f"오류: SERVER_THREADS={SERVER_THREADS}가 수락 제어 한도보다 작습니다. "
+                         f"ADMISSION_MAX_INFLIGHT({audio_app.ADMISSION_MAX_INFLIGHT}) + ADMISSION_MAX_QUEUE"
+                         f"({audio_app.ADMISSION_MAX_QUEUE}) + 1 = {MIN_SERVER_THREADS} 이상으로 설정하세요 "
+                         f"(그보다 작으면 대기열이 차기 전에 스레드가 바닥나 429 대신 연결이 멈춥니다).")
+    print(f"운영 서버 준비: workers={SERVER_WORKERS}, threads={SERVER_THREADS}, bind={SERVER_BIND}")
+
+    # 1. 포크 전에 모델 로드 (워밍업은 스레드 풀이 포크를 넘어가지 않도록 각 워커에서 수행)
+    audio_app.load_stt_engine(activate=False)
+
+    # 2. 지금까지 만든 객체를 GC 추적 대상에서 제외: 워커에서 GC가 객체 헤더를 건드려
+    #    공유 페이지가 복사(copy-on-write)되는 것을 줄임
+    gc.freeze()
+
+    AudioServer(audio_app.app, {
+        "bind": SERVER_BIND,
+        "workers": SERVER_WORKERS,
+        "worker_class": "gthread",
+        "threads": SERVER_THREADS,
+        "timeout": SERVER_TIMEOUT,
+        "backlog": SERVER_BACKLOG,
+        "preload_app": True,
+        "post_fork": post_fork,
+    }).run()
@@ -0,0 +1,86 @@
+# -*- coding: utf-8 -*-
+"""
+동시에 들어오는 STT 요청을 짧은 시간 창 동안 모아 한 번의 배치 추론으로 처리하는 스케줄러.
+여러 라즈베리파이 클라이언트가 하나의 PC 서버(모델 1개)를 공유할 때 처리량을 높이기 위해 사용합니다.
+"""
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+# --- 설정 ---
+DEFAULT_BATCH_WINDOW_MS = 50 # 첫 요청 도착 후 추가 요청을 기다리는 시간 (밀리초)
+DEFAULT_MAX_BATCH_SIZE = 8   # 한 번에 처리할 최대 요청 수
+# --- 설정 끝 ---
+
+class STTBatcher:
+    """
+    요청 큐와 워커 스레드 하나로 구성된 마이크로 배치 스케줄러.
+
+    batch_fn은 오디오 배열 리스트를 받아 같은 순서의 텍스트 리스트를 반환해야 합니다.
+    """
+
+    def __init__(self, batch_fn, window_ms=DEFAULT_BATCH_WINDOW_MS, max_batch_size=DEFAULT_MAX_BATCH_SIZE):
+        self.batch_fn = batch_fn
+        self.window = window_ms / 1000.0
+        self.max_batch_size = max(1, max_batch_size)
+        self._queue = queue.Queue()
+        self._worker = None
+
+    def start(self):
+        """배치 워커 스레드를 시작합니다 (이미 실행 중이면 무시)."""
+        if self._worker is not None and self._worker.is_alive():
+            return
+        self._worker = threading.Thread(target=self._run, name="stt-batcher", daemon=True)
+        self._worker.start()
+        print(f"STT 배치 스케줄러 시작 (window={self.window * 1000:.0f}ms, max_batch={self.max_batch_size})")
+
+    def submit(self, audio):
+        """
+        오디오 한 건을 큐에 넣고 결과를 받을 Future를 반환합니다.
+
+        Args:
+            audio (np.ndarray): 16kHz float32 모노 오디오.
+
+        Returns:
+            concurrent.futures.Future: 결과 텍스트(str)가 설정될 Future.
+        """
+        future = Future()
+        self._queue.put((audio, future))
+        return future
+
+    def transcribe(self, audio, timeout=None):
+        """submit() 후 결과가 나올 때까지 기다려 텍스트를 반환합니다."""
+        return self.submit(audio).result(timeout=timeout)
+
+    def _collect_batch(self):
+        """첫 요청을 기다린 뒤, 시간 창이 끝나거나 최대 크기에 도달할 때까지 요청을 모읍니다."""
+        batch = [self._queue.get()]
+        deadline = time.monotonic() + self.window
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._collect_batch()
+            # 대기 중에 취소된 요청은 제외
+            batch = [(audio, future) for audio, future in batch if future.set_running_or_notify_cancel()]
+            if not batch:
+                continue
+            try:
+                started = time.monotonic()
+                texts = self.batch_fn([audio for audio, _ in batch])
+                print(f"STT 배치 처리 완료: {len(batch)}건, {time.monotonic() - started:.2f}초")
+                for (_, future), text in zip(batch, texts):
+                    future.set_result(text)
+            except Exception as e:
+                print(f"STT 배치 처리 중 오류 발생: {e}")
+                for _, future in batch:
+                    future.set_exception(e)
@@ -0,0 +1,151 @@
+# -*- coding: utf-8 -*-
+"""
+STT 엔진 추상화.
+app.py의 /stt 계열 엔드포인트는 이 모듈의 엔진 객체만 사용하므로,
+배포 환경에 따라 백엔드(PyTorch Whisper / CPU int8 양자화 faster-whisper)를 설정으로 바꿀 수 있습니다.
+
+모든 엔진은 16kHz float32 모노 NumPy 배열을 입력으로 받습니다.
+"""
+import threading
+
+import audio_utils
+
+# --- 설정 ---
+DEFAULT_LANGUAGE = 'ko'
+BATCH_MAX_SECONDS = 30 # Whisper 한 번의 디코더 패스가 처리하는 최대 길이 (초)
+# --- 설정 끝 ---
+
+class STTEngine:
+    """
+    STT 엔진 기본 클래스.
+
+    하위 클래스는 _transcribe()를 구현하고, 배치 디코딩을 지원하면
+    supports_batching = True 와 _transcribe_batch()를 구현합니다.
+    """
+    backend = "base"
+    supports_batching = False
+    max_batch_samples = BATCH_MAX_SECONDS * audio_utils.WHISPER_SAMPLE_RATE
+
+    def __init__(self, model_name, threads=0, beam_size=1, language=DEFAULT_LANGUAGE):
+        self.model_name = model_name
+        self.threads = threads
+        self.beam_size = max(1, beam_size)
+        self.language = language
+        self._lock = threading.Lock() # 모델 동시 호출 직렬화
+
+    def describe(self):
+        """엔진 설정 요약 문자열 (로그/벤치마크 출력용)."""
+        return f"{self.backend}:{self.model_name} (threads={self.threads or 'auto'}, beam={self.beam_size})"
+
+    def reset_after_fork(self):
+        """포크된 자식 프로세스에서 호출: 부모에서 복사된 잠금 상태를 버리고 새 잠금을 만듭니다."""
+        self._lock = threading.Lock()
+
+    def transcribe(self, audio):
+        """
+        오디오 한 건을 인식합니다.
+
+        Returns:
+            dict: {"text": str, "segments": [{"start": float, "end": float, "text": str}, ...]}
+        """
+        with self._lock:
+            return self._transcribe(audio)
+
+    def transcribe_batch(self, audios):
+        """여러 오디오(각 max_batch_samples 이하)를 한 번에 인식하여 같은 순서의 텍스트 리스트를 반환합니다."""
+        if not self.supports_batching:
+            return [self.transcribe(audio)["text"] for audio in audios]
+        with self._lock:
+            return self._transcribe_batch(audios)
+
+    def _transcribe(self, audio):
+        raise NotImplementedError
+
+    def _transcribe_batch(self, audios):
+        raise NotImplementedError
+
+class WhisperEngine(STTEngine):
+    """OpenAI Whisper 레퍼런스(PyTorch) 구현. 멜 스펙트로그램 배치 디코딩을 지원합니다."""
+    backend = "whisper"
+    supports_batching = True
+
+    def __init__(self, model_name, threads=0, beam_size=1, language=DEFAULT_LANGUAGE):
+        super().__init__(model_name, threads, beam_size, language)
+        import torch
+        import whisper
+        self._torch = torch
+        self._whisper = whisper
+        if threads > 0:
+            torch.set_num_threads(threads)
+        self.model = whisper.load_model(model_name)
+        self.max_batch_samples = whisper.audio.N_SAMPLES
+
+    def _decode_kwargs(self):
+        fp16 = self.model.device.type == 'cuda'
+        if self.beam_size > 1:
+            return {"language": self.language, "fp16": fp16, "beam_size": self.beam_size}
+        return {"language": self.language, "fp16": fp16}
+
+    def _transcribe(self, audio):
+        result = self.model.transcribe(audio, **self._decode_kwargs())
+        segments = [{"start": seg["start"], "end": seg["end"], "text": seg["text"]} for seg in result["segments"]]
+        return {"text": result["text"], "segments": segments}
+
+    def _transcribe_batch(self, audios):
+        # 각 오디오를 30초로 패딩 → 멜 스펙트로그램을 쌓아 한 번의 디코더 패스로 처리
+        whisper = self._whisper
+        mels = [whisper.log_mel_spectrogram(whisper.pad_or_trim(audio), n_mels=self.model.dims.n_mels)
+                for audio in audios]
+        mel_batch = self._torch.stack(mels).to(self.model.device)
+        options = whisper.DecodingOptions(**self._decode_kwargs())
+        results = whisper.decode(self.model, mel_batch, options)
+        return [result.text for result in results]
+
+class FasterWhisperEngine(STTEngine):
+    """
+    CTranslate2 기반 faster-whisper 구현. CPU에서 int8 양자화 가중치로 추론합니다.
+    (pip install faster-whisper 필요)
+    """
+    backend = "faster-whisper"
+
+    def __init__(self, model_name, threads=0, beam_size=1, language=DEFAULT_LANGUAGE, compute_type="int8"):
+        super().__init__(model_name, threads, beam_size, language)
+        from faster_whisper import WhisperModel
+        self.compute_type = compute_type
+        self.model = WhisperModel(model_name, device="cpu", compute_type=compute_type, cpu_threads=threads)
+
+    def describe(self):
+        return f"{super().describe()} [{self.compute_type}]"
+
+    def _transcribe(self, audio):
+        segments_iter, _ = self.model.transcribe(audio, language=self.language, beam_size=self.beam_size)
+        segments = [{"start": seg.start, "end": seg.end, "text": seg.text} for seg in segments_iter]
+        return {"text": "".join(seg["text"] for seg in segments), "segments": segments}
+
+# 백엔드 이름 → 엔진 클래스
+ENGINES = {
+    WhisperEngine.backend: WhisperEngine,
+    FasterWhisperEngine.backend: FasterWhisperEngine,
+}
+
+def create_engine(backend, model_name, threads=0, beam_size=1, language=DEFAULT_LANGUAGE):
+    """
+    설정값으로 STT 엔진을 생성합니다.
+
+    Args:
+        backend (str): 'whisper' 또는 'faster-whisper'.
+        model_name (str): 모델 이름 (예: 'large', 'small', 'large-v3').
+        threads (int): CPU 추론 스레드 수 (0이면 라이브러리 기본값).
+        beam_size (int): 빔 서치 크기 (1이면 그리디 디코딩).
+        language (str): 인식 언어 코드.
+
+    Returns:
+        STTEngine: 생성된 엔진.
+
+    Raises:
+        ValueError: 알 수 없는 백엔드 이름인 경우.
+    """
+    engine_class = ENGINES.get(backend)
+    if engine_class is None:
+        raise ValueError(f"알 수 없는 STT 백엔드입니다: '{backend}' (사용 가능: {', '.join(ENGINES)})")
+    return engine_class(model_name, threads=threads, beam_size=beam_size, language=language)
@@ -0,0 +1,82 @@
+# -*- coding: utf-8 -*-
+"""
+텍스트 처리 공용 유틸리티.
+긴 응답을 문장 단위로 나누어 TTS를 문장별로 합성/재생할 때 사용합니다.
+"""
+import re
+
+# --- 설정 ---
+MIN_SENTENCE_CHARS = 4    # 이보다 짧은 조각은 다음 문장과 합침 (예: "네.", "1.")
+MAX_SENTENCE_CHARS = 120  # 이보다 긴 문장은 쉼표 등에서 한 번 더 나눔
+# --- 설정 끝 ---
+
+# 문장 끝: 마침표/물음표/느낌표/말줄임표(한·중·일 전각 문자 포함) 뒤의 공백, 또는 줄바꿈
+_SENTENCE_END_RE = re.compile(r'(?<=[.!?…。！？])["\')\]」』]*\s+|\n+')
+# 긴 문장을 나눌 보조 경계: 쉼표/세미콜론/콜론 뒤의 공백
+_CLAUSE_END_RE = re.compile(r'(?<=[,;:，、])\s+')
+
+def split_sentences(text, min_chars=MIN_SENTENCE_CHARS, max_chars=MAX_SENTENCE_CHARS):
+    """
+    텍스트를 문장 단위로 나눕니다 (한국어 문장 부호 포함).
+    소수점("3.5")처럼 뒤에 공백이 없는 마침표에서는 나누지 않습니다.
+
+    Args:
+        text (str): 원문.
+        min_chars (int): 이보다 짧은 문장은 다음 문장과 합칩니다.
+        max_chars (int): 이보다 긴 문장은 쉼표 등 절 경계에서 추가로 나눕니다.
+
+    Returns:
+        list[str]: 앞뒤 공백이 제거된 문장 리스트 (빈 문장 제외).
+    """
+    pieces = []
+    for sentence in _SENTENCE_END_RE.split(text.strip()):
+        sentence = sentence.strip()
+        if not sentence:
+            continue
+        if len(sentence) > max_chars:
+            pieces.extend(clause.strip() for clause in _CLAUSE_END_RE.split(sentence) if clause.strip())
+        else:
+            pieces.append(sentence)
+
+    sentences = []
+    carry = ""
+    for piece in pieces:
+        carry = f"{carry} {piece}" if carry else piece
+        if len(carry) >= min_chars:
+            sentences.append(carry)
+            carry = ""
+    if carry:
+        if sentences:
+            sentences[-1] = f"{sentences[-1]} {carry}"
+        else:
+            sentences.append(carry)
+    return sentences
+
+def split_sentence_stream(chunks, min_chars=MIN_SENTENCE_CHARS, max_chars=MAX_SENTENCE_CHARS):
+    """
+    텍스트 조각(예: LLM 스트리밍 출력)을 받아, 문장이 완성될 때마다 바로 내보냅니다.
+    문장 경계 규칙은 split_sentences()와 같으며, 문장 끝 없이 max_chars를 넘으면 절 경계에서 먼저 내보냅니다.
+
+    Args:
+        chunks (iterable[str]): 차례로 도착하는 텍스트 조각.
+        min_chars (int): 이보다 짧은 문장은 다음 문장과 합칩니다.
+        max_chars (int): 문장 끝이 오지 않아도 이 길이를 넘으면 절 경계에서 나눕니다.
+
+    Yields:
+        str: 완성된 문장.
+    """
+    buffer = ""
+    for chunk in chunks:
+        buffer += chunk
+        boundary = None
+        for match in _SENTENCE_END_RE.finditer(buffer):
+            boundary = match.end()
+        if boundary is None and len(buffer) > max_chars:
+            for match in _CLAUSE_END_RE.finditer(buffer):
+                boundary = match.end()
+        if boundary is None or len(buffer[:boundary].strip()) < min_chars:
+            continue
+        complete, buffer = buffer[:boundary], buffer[boundary:]
+        yield from split_sentences(complete, min_chars, max_chars)
+    if buffer.strip():
+        yield from split_sentences(buffer, min_chars, max_chars)
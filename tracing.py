@@ -0,0 +1,314 @@
+# -*- coding: utf-8 -*-
+"""
+턴 단위 지연 시간 추적 (경량 스팬 + JSONL 타임라인).
+"이번 턴의 9초가 어디에 쓰였나?"에 답하기 위해 main.py는 녹음, 업로드 인코딩, STT, 분기, LLM, TTS 수신, 재생
+구간을 스팬으로 기록하고, 한 턴의 스팬은 모두 같은 턴 ID로 묶습니다.
+
+  - 기록: 호출 스레드는 큐에 넣기만 하고, 백그라운드 스레드가 크기 기준으로 회전하는 JSONL 파일에 씀
+  - 전파: PC 서버로 가는 요청에 X-Turn-Id 헤더를 붙이면 app.py도 같은 턴 ID로 서버 쪽 단계를 기록
+  - 요약: python tracing.py summary traces/turns.jsonl --window 1h  (단계별 p50/p95/p99)
+
+한 줄(스팬) 형식:
+  {"ts": 시작 시각(epoch 초), "turn": 턴 ID, "source": "device"|"server", "stage": 단계,
+   "offset_ms": 턴 시작 후 경과, "duration_ms": 길이, "ok": 성공 여부, ...추가 속성}
+"""
+import argparse
+import glob
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+
+# --- 설정 ---
+TURN_ID_HEADER = "X-Turn-Id"
+DEFAULT_MAX_BYTES = 5 * 1024 * 1024 # 파일 하나의 최대 크기 (넘으면 .1, .2 ...로 회전)
+DEFAULT_BACKUP_COUNT = 3            # 보관할 회전 파일 수
+QUEUE_SIZE = 10000                  # 기록 대기 스팬 수 (가득 차면 버림 - 추적 때문에 턴이 느려지지 않도록)
+SUMMARY_PERCENTILES = (50, 95, 99)
+# --- 설정 끝 ---
+
+_lock = threading.Lock()
+_writer = None
+_writer_pid = None
+_config = None          # configure() 인자 (포크된 프로세스에서 기록기를 다시 만들 때 사용)
+_current_turn = None    # 기기(main.py)에서 진행 중인 턴 (한 번에 한 턴)
+_propagate_to = ()      # 턴 ID 헤더를 붙일 URL 접두사
+
+class TraceWriter:
+    """스팬(dict)을 JSON 한 줄로 비동기 기록합니다 (logging QueueListener + RotatingFileHandler)."""
+
+    def __init__(self, path, max_bytes=DEFAULT_MAX_BYTES, backup_count=DEFAULT_BACKUP_COUNT):
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        self.path = path
+        self.dropped = 0
+        self._queue = queue.Queue(maxsize=QUEUE_SIZE)
+        handler = logging.handlers.RotatingFileHandler(path, maxBytes=max_bytes, backupCount=backup_count,
+                                                       encoding='utf-8')
+        handler.setFormatter(logging.Formatter("%(message)s"))
+        self._listener = logging.handlers.QueueListener(self._queue, handler)
+        self._listener.start()
+
+    def write(self, span):
+        record = logging.makeLogRecord({"msg": json.dumps(span, ensure_ascii=False), "levelno": logging.INFO})
+        try:
+            self._queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+    def close(self):
+        """남은 스팬을 모두 쓰고 파일을 닫습니다."""
+        self._listener.stop()
+        for handler in self._listener.handlers:
+            handler.close()
+
+def configure(path, max_bytes=DEFAULT_MAX_BYTES, backup_count=DEFAULT_BACKUP_COUNT, propagate_to=()):
+    """
+    추적 기록을 켭니다. 호출하지 않으면 모든 스팬 함수는 아무것도 하지 않습니다.
+
+    Args:
+        path (str): JSONL 파일 경로. '{pid}'가 있으면 프로세스 ID로 바꿈 (serve.py 워커마다 별도 파일).
+        max_bytes (int): 회전 기준 파일 크기.
+        backup_count (int): 보관할 회전 파일 수.
+        propagate_to (iterable): 턴 ID 헤더를 붙일 URL 접두사 (예: PC 서버 주소).
+    """
+    global _config, _propagate_to
+    with _lock:
+        _config = (path, max_bytes, backup_count)
+        _propagate_to = tuple(prefix for prefix in propagate_to if prefix)
+
+def _get_writer():
+    global _writer, _writer_pid, _config
+    if _config is None:
+        return None
+    pid = os.getpid()
+    if _writer is not None and _writer_pid == pid:
+        return _writer
+    with _lock:
+        if _writer is None or _writer_pid != pid: # 포크 후에는 기록 스레드가 없으므로 새로 만듦
+            path, max_bytes, backup_count = _config
+            try:
+                _writer = TraceWriter(path.replace("{pid}", str(pid)), max_bytes, backup_count)
+            except OSError as e:
+                print(f"경고: 추적 파일을 열 수 없습니다 ({e}). 추적을 끕니다.")
+                _config = None
+                return None
+            _writer_pid = pid
+        return _writer
+
+def close():
+    """기록 스레드를 멈추고 파일을 닫습니다 (프로그램 종료 시)."""
+    global _writer
+    with _lock:
+        if _writer is not None and _writer_pid == os.getpid():
+            _writer.close()
+        _writer = None
+
+class Turn:
+    """한 턴의 스팬 묶음. 스팬은 여러 스레드(파이프라인 합성/재생)에서 기록해도 됩니다."""
+
+    def __init__(self, turn_id=None, source="device"):
+        self.turn_id = turn_id or uuid.uuid4().hex[:16]
+        self.source = source
+        self.started = time.time()
+        self._started_perf = time.perf_counter()
+        self.attrs = {} # 턴 전체 속성 (route, mode 등) - finish() 시 'turn' 스팬에 기록
+
+    def record(self, stage, duration, started_perf=None, ok=True, **attrs):
+        """
+        이미 측정한 구간을 스팬으로 기록합니다.
+
+        Args:
+            stage (str): 단계 이름.
+            duration (float): 길이 (초).
+            started_perf (float): 구간 시작 시각 (time.perf_counter). 없으면 지금 - duration.
+            ok (bool): 성공 여부.
+        """
+        writer = _get_writer()
+        if writer is None:
+            return
+        if started_perf is None:
+            started_perf = time.perf_counter() - duration
+        offset = started_perf - self._started_perf
+        span = {
+            "ts": round(self.started + offset, 3),
+            "turn": self.turn_id,
+            "source": self.source,
+            "stage": stage,
+            "offset_ms": round(offset * 1000, 1),
+            "duration_ms": round(duration * 1000, 1),
+            "ok": ok,
+        }
+        span.update(attrs)
+        writer.write(span)
+
+    @contextmanager
+    def span(self, stage, **attrs):
+        """
+        with 블록의 실행 시간을 기록합니다. 블록 안에서 yield된 dict에 속성을 추가할 수 있고,
+        'ok'를 False로 바꾸면 실패로 기록합니다 (예외가 나면 자동으로 실패).
+        """
+        attrs.setdefault("ok", True)
+        started = time.perf_counter()
+        try:
+            yield attrs
+        except BaseException:
+            attrs["ok"] = False
+            raise
+        finally:
+            ok = attrs.pop("ok")
+            self.record(stage, time.perf_counter() - started, started_perf=started, ok=ok, **attrs)
+
+    def elapsed(self):
+        """턴 시작 후 경과 시간 (초)."""
+        return time.perf_counter() - self._started_perf
+
+    def finish(self, ok=True):
+        """턴 전체 길이를 'turn' 스팬으로 기록합니다."""
+        self.record("turn", self.elapsed(), started_perf=self._started_perf, ok=ok, **self.attrs)
+
+# --- 기기(main.py)용: 진행 중인 턴 하나를 모듈 전역으로 추적 ---
+def start_turn():
+    """새 턴을 시작하고 현재 턴으로 설정합니다 (추적이 꺼져 있어도 턴 ID는 만들어짐)."""
+    global _current_turn
+    _current_turn = Turn()
+    return _current_turn
+
+def end_turn(ok=True):
+    """현재 턴을 기록하고 끝냅니다."""
+    global _current_turn
+    turn, _current_turn = _current_turn, None
+    if turn is not None:
+        turn.finish(ok=ok)
+    return turn
+
+def current_turn():
+    return _current_turn
+
+def set_turn_attrs(**attrs):
+    """현재 턴의 속성(route 등)을 설정합니다 ('turn' 스팬에 함께 기록)."""
+    if _current_turn is not None:
+        _current_turn.attrs.update(attrs)
+
+@contextmanager
+def span(stage, **attrs):
+    """현재 턴에 스팬을 기록합니다 (턴이 없거나 추적이 꺼져 있으면 속성 dict만 돌려주고 기록 안 함)."""
+    turn = _current_turn
+    if turn is None or _config is None:
+        attrs.setdefault("ok", True)
+        yield attrs
+        return
+    with turn.span(stage, **attrs) as span_attrs:
+        yield span_attrs
+
+def record(stage, duration, started_perf=None, ok=True, **attrs):
+    """현재 턴에 이미 측정한 구간을 기록합니다."""
+    turn = _current_turn
+    if turn is not None:
+        turn.record(stage, duration, started_perf=started_perf, ok=ok, **attrs)
+
+def propagation_headers(url):
+    """url이 전파 대상(PC 서버)이면 현재 턴 ID 헤더를 반환합니다 (아니면 빈 dict)."""
+    turn = _current_turn
+    if turn is None or _config is None or not _propagate_to or not url.startswith(_propagate_to):
+        return {}
+    return {TURN_ID_HEADER: turn.turn_id}
+
+# --- 요약 도구 ---
+def _parse_window(text):
+    """'90s', '30m', '6h', '7d' 또는 초 단위 숫자를 초로 바꿉니다 (0/빈 값: 전체)."""
+    units = {"s": 1, "m": 60, "h": 3600, "d": 86400}
+    text = (text or "0").strip().lower()
+    if text[-1] in units:
+        return float(text[:-1]) * units[text[-1]]
+    return float(text)
+
+def _trace_files(patterns):
+    """경로/글롭 패턴과 그 회전 파일(.1, .2 ...)을 모두 찾습니다."""
+    paths = []
+    for pattern in patterns:
+        for path in sorted(glob.glob(pattern)) or [pattern]:
+            paths.extend(p for p in sorted(glob.glob(glob.escape(path) + ".*")) if p.rsplit(".", 1)[1].isdigit())
+            paths.append(path)
+    return [path for path in dict.fromkeys(paths) if os.path.isfile(path)]
+
+def load_spans(patterns, window_seconds=0, now=None):
+    """JSONL 파일들에서 최근 window_seconds 이내(0이면 전체)에 시작한 스팬을 읽습니다."""
+    since = (now or time.time()) - window_seconds if window_seconds > 0 else None
+    spans = []
+    for path in _trace_files(patterns):
+        with open(path, encoding='utf-8') as f:
+            for line in f:
+                try:
+                    span = json.loads(line)
+                except json.JSONDecodeError:
+                    continue # 기록 중 잘린 마지막 줄 등
+                if since is None or span.get("ts", 0) >= since:
+                    spans.append(span)
+    return spans
+
+def percentile(sorted_values, p):
+    """정렬된 값들의 p번째 백분위수 (최근접 순위)."""
+    if not sorted_values:
+        return None
+    rank = max(1, -(-len(sorted_values) * p // 100)) # ceil(n * p / 100)
+    return sorted_values[int(rank) - 1]
+
+def summarize(spans, include_failed=False):
+    """
+    (source, stage)별 지연 시간 분포를 계산합니다.
+
+    Returns:
+        list: [(source, stage, 개수, 실패 수, {백분위: ms}, 최대 ms)] - 턴 내 평균 시작 시점 순.
+    """
+    groups = {}
+    for span in spans:
+        key = (span.get("source", "device"), span.get("stage", "?"))
+        group = groups.setdefault(key, {"durations": [], "failed": 0, "offsets": []})
+        group["offsets"].append(float(span.get("offset_ms", 0)))
+        if not span.get("ok", True):
+            group["failed"] += 1
+            if not include_failed:
+                continue
+        group["durations"].append(float(span.get("duration_ms", 0)))
+    rows = []
+    for (source, stage), group in groups.items():
+        durations = sorted(group["durations"])
+        offsets = group["offsets"]
+        order = (source != "device", stage == "turn", sum(offsets) / len(offsets) if offsets else 0)
+        rows.append((order, source, stage, len(durations), group["failed"],
+                     {p: percentile(durations, p) for p in SUMMARY_PERCENTILES}, durations[-1] if durations else None))
+    return [row[1:] for row in sorted(rows)]
+
+def _format_ms(value):
+    return f"{value:>9.0f}" if value is not None else f"{'-':>9}"
+
+def main():
+    parser = argparse.ArgumentParser(description="턴 추적(JSONL) 단계별 지연 시간 요약")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    summary_parser = subparsers.add_parser("summary", help="단계별 p50/p95/p99 요약")
+    summary_parser.add_argument('paths', nargs='+', help="추적 파일 경로 또는 글롭 (회전 파일 .1, .2 ... 자동 포함)")
+    summary_parser.add_argument('--window', default="24h", help="최근 구간 (예: 15m, 6h, 7d / 0: 전체, 기본 24h)")
+    summary_parser.add_argument('--include-failed', action='store_true', help="실패/중단된 스팬도 분포에 포함")
+    args = parser.parse_args()
+
+    window_seconds = _parse_window(args.window)
+    spans = load_spans(args.paths, window_seconds)
+    turns = {span["turn"] for span in spans if span.get("stage") == "turn"}
+    window_text = f"최근 {args.window}" if window_seconds > 0 else "전체 기간"
+    print(f"{window_text}: 스팬 {len(spans)}개, 턴 {len(turns)}개")
+    if not spans:
+        return
+    header = "".join(f"{'p' + str(p) + '(ms)':>9}" for p in SUMMARY_PERCENTILES)
+    print(f"{'source':<8} {'stage':<24} {'count':>6} {'fail':>5}{header}{'max(ms)':>9}")
+    for source, stage, count, failed, percentiles, maximum in summarize(spans, args.include_failed):
+        values = "".join(_format_ms(percentiles[p]) for p in SUMMARY_PERCENTILES)
+        print(f"{source:<8} {stage:<24} {count:>6} {failed:>5}{values}{_format_ms(maximum)}")
+
+if __name__ == "__main__":
+    main()
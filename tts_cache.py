@@ -0,0 +1,179 @@
+# -*- coding: utf-8 -*-
+"""
+TTS 결과 2단계 캐시 (메모리 LRU + 디스크 저장소).
+같은 문장(폴백 안내 문구, 날씨 오류 메시지, 자주 나오는 LLM 응답 등)을 다시 합성하지 않도록
+(텍스트, 언어, 샘플 레이트)로 만든 콘텐츠 주소 키로 합성 결과를 저장합니다.
+"""
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+
+# --- 설정 ---
+DEFAULT_MEMORY_LIMIT_BYTES = 64 * 1024 * 1024  # 메모리 캐시 최대 크기
+DEFAULT_DISK_LIMIT_BYTES = 512 * 1024 * 1024   # 디스크 캐시 최대 크기
+CACHE_FILE_SUFFIX = ".bin"
+# --- 설정 끝 ---
+
+def make_key(*parts):
+    """
+    캐시 키(SHA-256 16진수 문자열)를 만듭니다. 같은 입력이면 항상 같은 키가 나옵니다.
+
+    Args:
+        *parts: 키를 구성하는 값들 (예: text, lang, sample_rate). JSON 직렬화 가능해야 합니다.
+
+    Returns:
+        str: 64자리 16진수 키.
+    """
+    encoded = json.dumps(parts, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+    return hashlib.sha256(encoded).hexdigest()
+
+class TTSCache:
+    """
+    메모리 LRU(OrderedDict)와 디스크 디렉토리를 함께 쓰는 스레드 안전 캐시.
+    메모리에서 밀려난 항목도 디스크에 남아 있으면 다시 메모리로 올라옵니다.
+    """
+
+    def __init__(self, cache_dir, memory_limit_bytes=DEFAULT_MEMORY_LIMIT_BYTES, disk_limit_bytes=DEFAULT_DISK_LIMIT_BYTES):
+        self.cache_dir = cache_dir
+        self.memory_limit_bytes = memory_limit_bytes
+        self.disk_limit_bytes = disk_limit_bytes
+        self._memory = OrderedDict()
+        self._memory_bytes = 0
+        self._lock = threading.Lock()
+        self._stats = {
+            "memory_hits": 0,
+            "disk_hits": 0,
+            "misses": 0,
+            "memory_evictions": 0,
+            "disk_evictions": 0,
+        }
+        self._disk_bytes = 0
+        if self.cache_dir and self.disk_limit_bytes > 0:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            self._disk_bytes = sum(size for _, size, _ in self._scan_disk())
+            print(f"TTS 디스크 캐시: {self.cache_dir} ({self._disk_bytes / 1024 / 1024:.1f}MB 사용 중)")
+
+    def get(self, key):
+        """
+        캐시에서 데이터를 찾습니다. 메모리 → 디스크 순으로 조회하며, 디스크 적중 시 메모리로 올립니다.
+
+        Returns:
+            bytes: 캐시된 데이터. 없으면 None.
+        """
+        with self._lock:
+            data = self._memory.get(key)
+            if data is not None:
+                self._memory.move_to_end(key)
+                self._stats["memory_hits"] += 1
+                return data
+
+        data = self._read_disk(key)
+        with self._lock:
+            if data is None:
+                self._stats["misses"] += 1
+                return None
+            self._stats["disk_hits"] += 1
+            self._put_memory(key, data)
+            return data
+
+    def put(self, key, data):
+        """데이터를 메모리와 디스크 양쪽에 저장하고, 한도를 넘으면 오래된 항목부터 제거합니다."""
+        with self._lock:
+            self._put_memory(key, data)
+        self._write_disk(key, data)
+
+    def stats(self):
+        """적중/실패/제거 카운터와 현재 사용량을 딕셔너리로 반환합니다."""
+        with self._lock:
+            snapshot = dict(self._stats)
+            snapshot["memory_entries"] = len(self._memory)
+            snapshot["memory_bytes"] = self._memory_bytes
+            snapshot["disk_bytes"] = self._disk_bytes
+        lookups = snapshot["memory_hits"] + snapshot["disk_hits"] + snapshot["misses"]
+        snapshot["hit_ratio"] = (snapshot["memory_hits"] + snapshot["disk_hits"]) / lookups if lookups else 0.0
+        return snapshot
+
+    # --- 메모리 계층 (self._lock 보유 상태에서 호출) ---
+    def _put_memory(self, key, data):
+        if len(data) > self.memory_limit_bytes:
+            return
+        old = self._memory.pop(key, None)
+        if old is not None:
+            self._memory_bytes -= len(old)
+        self._memory[key] = data
+        self._memory_bytes += len(data)
+        while self._memory_bytes > self.memory_limit_bytes:
+            _, evicted = self._memory.popitem(last=False)
+            self._memory_bytes -= len(evicted)
+            self._stats["memory_evictions"] += 1
+
+    # --- 디스크 계층 ---
+    def _disk_path(self, key):
+        return os.path.join(self.cache_dir, key + CACHE_FILE_SUFFIX)
+
+    def _scan_disk(self):
+        """디스크 캐시 파일 목록을 (경로, 크기, 수정 시각)으로 반환합니다."""
+        entries = []
+        for entry in os.scandir(self.cache_dir):
+            if entry.is_file() and entry.name.endswith(CACHE_FILE_SUFFIX):
+                stat = entry.stat()
+                entries.append((entry.path, stat.st_size, stat.st_mtime))
+        return entries
+
+    def _read_disk(self, key):
+        if not self.cache_dir or self.disk_limit_bytes <= 0:
+            return None
+        path = self._disk_path(key)
+        try:
+            with open(path, 'rb') as f:
+                data = f.read()
+            os.utime(path) # 수정 시각을 최근 사용 시각으로 갱신 (디스크 LRU 기준)
+            return data
+        except FileNotFoundError:
+            return None
+        except OSError as e:
+            print(f"경고: TTS 디스크 캐시 읽기 오류 ({path}): {e}")
+            return None
+
+    def _write_disk(self, key, data):
+        if not self.cache_dir or self.disk_limit_bytes <= 0 or len(data) > self.disk_limit_bytes:
+            return
+        path = self._disk_path(key)
+        temp_path = f"{path}.{threading.get_ident()}.tmp"
+        try:
+            existed = os.path.exists(path)
+            with open(temp_path, 'wb') as f:
+                f.write(data)
+            os.replace(temp_path, path) # 원자적 교체 (동시 쓰기 시 깨진 파일 방지)
+            if not existed:
+                with self._lock:
+                    self._disk_bytes += len(data)
+                    over_limit = self._disk_bytes > self.disk_limit_bytes
+                if over_limit:
+                    self._evict_disk()
+        except OSError as e:
+            print(f"경고: TTS 디스크 캐시 쓰기 오류 ({path}): {e}")
+            try:
+                os.remove(temp_path)
+            except OSError:
+                pass
+
+    def _evict_disk(self):
+        """가장 오래 사용되지 않은 파일부터 삭제하여 디스크 한도 아래로 맞춥니다."""
+        entries = sorted(self._scan_disk(), key=lambda entry: entry[2])
+        total = sum(size for _, size, _ in entries)
+        evicted = 0
+        for path, size, _ in entries:
+            if total <= self.disk_limit_bytes:
+                break
+            try:
+                os.remove(path)
+                total -= size
+                evicted += 1
+            except OSError:
+                pass
+        with self._lock:
+            self._disk_bytes = total
+            self._stats["disk_evictions"] += evicted
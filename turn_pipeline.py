@@ -0,0 +1,131 @@
+# -*- coding: utf-8 -*-
+"""
+파이프라인 방식의 응답 턴 실행기.
+응답 문장이 하나 만들어질 때마다 바로 TTS를 요청하고, 1번 문장을 재생하는 동안 2번 문장을 합성하여
+체감 응답 지연을 '전체 응답 생성 + 전체 TTS'에서 '첫 문장 생성 + 첫 문장 TTS'로 줄입니다.
+
+  문장 생성(LLM 스트림 등) ─▶ TTS 스레드 풀(재생을 최대 prefetch문장 앞서 합성) ─▶ 순서대로 재생
+"""
+import queue
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+# --- 설정 ---
+DEFAULT_PREFETCH = 2 # 재생을 앞서 합성해 둘 최대 문장 수 (합성 요청 후 아직 재생 차례가 오지 않은 문장)
+# --- 설정 끝 ---
+
+# 파이프라인 상태 (on_state 콜백으로 전달, 예: LED 색상 표시)
+STATE_THINKING = "thinking"         # 다음 응답 문장 생성 대기
+STATE_SYNTHESIZING = "synthesizing" # 문장은 나왔고 TTS 오디오 대기
+STATE_SPEAKING = "speaking"         # 재생 중
+STATE_DONE = "done"                 # 한 문장 이상 재생하고 종료
+STATE_FAILED = "failed"             # 재생한 문장 없이 종료
+STATE_INTERRUPTED = "interrupted"   # 끼어들기(cancel_token 취소)로 중단
+
+class TurnPipeline:
+    """
+    문장 생성 → TTS → 재생을 겹쳐 실행합니다.
+
+    synthesize(sentence)는 재생할 오디오(없으면 None)를, play(audio)는 성공 여부를 반환해야 합니다.
+    cancel_token(barge_in.CancelToken 등, cancelled / on_cancel / remove 제공)이 취소되면
+    문장 생성과 합성 대기를 즉시 멈춥니다. 재생 중단은 play 쪽에서 같은 토큰으로 처리합니다.
+    """
+
+    def __init__(self, synthesize, play, prefetch=DEFAULT_PREFETCH, on_state=None, cancel_token=None):
+        self.synthesize = synthesize
+        self.play = play
+        self.prefetch = max(1, prefetch)
+        self.on_state = on_state
+        self.cancel_token = cancel_token
+        self.state = None
+
+    @property
+    def cancelled(self):
+        return self.cancel_token is not None and self.cancel_token.cancelled
+
+    def _set_state(self, state):
+        if state == self.state:
+            return
+        self.state = state
+        if self.on_state:
+            self.on_state(state)
+
+    def run(self, sentences):
+        """
+        문장들을 합성하여 순서대로 재생합니다. 문장 생성은 별도 스레드에서 진행되어 재생 중에도 계속됩니다.
+
+        Args:
+            sentences (iterable[str]): 응답 문장 (제너레이터 가능).
+
+        Returns:
+            int: 재생에 성공한 문장 수.
+        """
+        started = time.monotonic()
+        executor = ThreadPoolExecutor(max_workers=self.prefetch, thread_name_prefix="tts")
+        pending = queue.Queue() # (문장 번호, 문장, Future), 끝나면 None
+        slots = threading.Semaphore(self.prefetch) # 재생 쪽이 pending에서 꺼내야 다음 문장 합성 자리가 남
+
+        def produce():
+            try:
+                for index, sentence in enumerate(sentences, 1):
+                    slots.acquire() # 긴 응답도 재생보다 prefetch문장 넘게 앞서 합성하지 않음 (취소 시 깨어남)
+                    if self.cancelled:
+                        # 응답 생성기를 닫아 진행 중인 LLM 스트림 연결도 정리
+                        if hasattr(sentences, "close"):
+                            sentences.close()
+                        break
+                    print(f"  [pipeline] 문장 {index} 생성됨 ({time.monotonic() - started:.2f}s): '{sentence[:30]}'")
+                    pending.put((index, sentence, executor.submit(self.synthesize, sentence)))
+            except Exception as e:
+                print(f"  [pipeline] 응답 문장 생성 중 오류: {e}")
+            finally:
+                pending.put(None)
+
+        threading.Thread(target=produce, name="turn-pipeline-producer", daemon=True).start()
+        # 취소되면 다음 문장/합성 결과를 기다리던 대기를 바로 깨움
+        wakeup = threading.Event()
+        cancel_callback = (self.cancel_token.on_cancel(lambda: (wakeup.set(), slots.release(), pending.put(None)))
+                           if self.cancel_token else None)
+        played = 0
+        try:
+            while not self.cancelled:
+                if pending.empty():
+                    self._set_state(STATE_THINKING)
+                item = pending.get()
+                if item is not None:
+                    slots.release()
+                if item is None or self.cancelled:
+                    break
+                index, sentence, future = item
+                if not future.done():
+                    self._set_state(STATE_SYNTHESIZING)
+                    future.add_done_callback(lambda _: wakeup.set())
+                    wakeup.wait()
+                    wakeup.clear()
+                    if self.cancelled:
+                        break
+                try:
+                    audio = future.result()
+                except Exception as e:
+                    print(f"  [pipeline] 문장 {index} TTS 실패: {e}")
+                    audio = None
+                if not audio:
+                    print(f"  [pipeline] 문장 {index} 오디오 없음 - 건너뜀")
+                    continue
+                if played == 0:
+                    print(f"  [pipeline] 첫 문장 재생 시작까지 {time.monotonic() - started:.2f}s")
+                self._set_state(STATE_SPEAKING)
+                if self.play(audio):
+                    played += 1
+        finally:
+            executor.shutdown(wait=False, cancel_futures=True)
+            if cancel_callback is not None:
+                self.cancel_token.remove(cancel_callback)
+        if self.cancelled:
+            print(f"  [pipeline] 중단됨: {played}문장 재생 후 끼어들기, 총 {time.monotonic() - started:.2f}s")
+            self._set_state(STATE_INTERRUPTED)
+            return played
+        print(f"  [pipeline] 완료: {played}문장 재생, 총 {time.monotonic() - started:.2f}s")
+        self._set_state(STATE_DONE if played else STATE_FAILED)
+        return played
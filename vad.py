@@ -0,0 +1,131 @@
+# -*- coding: utf-8 -*-
+"""
+음성 구간 검출(VAD)과 발화 끝점 검출.
+main.py가 고정 길이(arecord -d) 대신 말이 시작될 때 녹음을 시작하고,
+말이 끝난 뒤 일정 시간 무음이 이어지면 바로 녹음을 멈추는 데 사용합니다.
+
+프레임 단위로 NumPy만 사용하여 계산합니다:
+  - 에너지: 배경 잡음 수준(무음 프레임에서 천천히 추적)보다 threshold_db 이상 큰지
+  - 스펙트럼: 에너지 중 음성 대역(기본 250~4000Hz) 비율이 충분한지 (저주파 험, 고주파 잡음 배제)
+"""
+import collections
+import numpy as np
+
+import audio_utils
+
+# --- 설정 ---
+DEFAULT_FRAME_MS = 20          # 판정 프레임 길이 (밀리초)
+DEFAULT_THRESHOLD_DB = 10.0    # 배경 잡음 대비 이 이상 크면 음성 후보 (dB)
+DEFAULT_MIN_ENERGY_DB = -55.0  # 이보다 작은 프레임은 항상 무음 (dBFS)
+DEFAULT_SPEECH_BAND_HZ = (250.0, 4000.0)
+DEFAULT_MIN_BAND_RATIO = 0.5   # 음성 대역 에너지 비율 하한
+NOISE_ADAPT_DOWN = 0.2         # 배경 잡음 수준이 내려갈 때 따라가는 비율 (조용해지면 빠르게)
+NOISE_ADAPT_UP = 0.01          # 올라갈 때 따라가는 비율 (말소리 사이 구간에 끌려 올라가지 않도록 느리게)
+
+DEFAULT_PRE_ROLL_MS = 300      # 발화 시작 전 함께 보관할 오디오 (첫 음절 잘림 방지)
+DEFAULT_HANGOVER_MS = 700      # 이만큼 무음이 이어지면 발화 종료
+DEFAULT_MIN_SPEECH_MS = 100    # 이만큼 음성 프레임이 연속되어야 발화 시작으로 인정 (클릭/잡음 무시)
+DEFAULT_MAX_UTTERANCE_SECONDS = 15.0 # 발화 최대 길이 (초과 시 강제 종료)
+# --- 설정 끝 ---
+
+class FrameVAD:
+    """프레임 하나가 음성인지 판정하는 에너지 + 스펙트럼 VAD (배경 잡음 수준을 스스로 추적)."""
+
+    def __init__(self, sample_rate, frame_ms=DEFAULT_FRAME_MS, threshold_db=DEFAULT_THRESHOLD_DB,
+                 min_energy_db=DEFAULT_MIN_ENERGY_DB, speech_band_hz=DEFAULT_SPEECH_BAND_HZ,
+                 min_band_ratio=DEFAULT_MIN_BAND_RATIO):
+        self.sample_rate = sample_rate
+        self.frame_samples = max(1, int(sample_rate * frame_ms / 1000))
+        self.threshold_db = threshold_db
+        self.min_energy_db = min_energy_db
+        self.min_band_ratio = min_band_ratio
+        self.noise_db = None
+        self._window = np.hanning(self.frame_samples).astype(np.float32)
+        freqs = np.fft.rfftfreq(self.frame_samples, 1.0 / sample_rate)
+        self._band = (freqs >= speech_band_hz[0]) & (freqs <= speech_band_hz[1])
+
+    def is_speech(self, frame):
+        """
+        float32 프레임(frame_samples 길이)이 음성인지 판정합니다.
+        무음으로 판정된 프레임으로 배경 잡음 수준을 갱신합니다.
+        """
+        energy_db = 10.0 * np.log10(float(np.mean(frame * frame)) + 1e-10)
+        if self.noise_db is None:
+            self.noise_db = energy_db
+
+        speech = energy_db >= self.min_energy_db and energy_db >= self.noise_db + self.threshold_db
+        if speech:
+            spectrum = np.abs(np.fft.rfft(frame * self._window)) ** 2
+            total = float(spectrum.sum())
+            speech = total > 0 and float(spectrum[self._band].sum()) / total >= self.min_band_ratio
+
+        if not speech:
+            rate = NOISE_ADAPT_DOWN if energy_db < self.noise_db else NOISE_ADAPT_UP
+            self.noise_db += rate * (energy_db - self.noise_db)
+        return speech
+
+class Endpointer:
+    """
+    raw PCM(S16_LE 모노)을 받아 발화 시작/끝을 검출하는 상태 머신.
+
+    feed()는 지금까지 확정된 발화 오디오 중 새로 나온 부분을 돌려줍니다:
+    발화 시작 전에는 빈 바이트(프리롤 버퍼에만 보관), 시작 순간에는 프리롤 전체,
+    이후에는 들어온 프레임을 그대로 반환합니다. 발화가 끝나면 done이 True가 됩니다.
+    """
+
+    def __init__(self, sample_rate, frame_ms=DEFAULT_FRAME_MS, pre_roll_ms=DEFAULT_PRE_ROLL_MS,
+                 hangover_ms=DEFAULT_HANGOVER_MS, min_speech_ms=DEFAULT_MIN_SPEECH_MS,
+                 max_utterance_seconds=DEFAULT_MAX_UTTERANCE_SECONDS, vad=None):
+        self.vad = vad or FrameVAD(sample_rate, frame_ms)
+        self.sample_rate = sample_rate
+        self.frame_bytes = self.vad.frame_samples * 2
+        frame_ms = self.vad.frame_samples * 1000.0 / sample_rate
+        self._onset_frames = max(1, int(round(min_speech_ms / frame_ms)))
+        self._hangover_frames = max(1, int(round(hangover_ms / frame_ms)))
+        self._max_frames = int(max_utterance_seconds * 1000 / frame_ms)
+        # 프리롤 + 시작 판정 중인 프레임을 함께 보관
+        self._pre_roll = collections.deque(maxlen=int(round(pre_roll_ms / frame_ms)) + self._onset_frames)
+        self._pending = b''
+        self._speech_run = 0
+        self._silence_run = 0
+        self._utterance_frames = 0
+        self.triggered = False
+        self.done = False
+        self.end_reason = None # 'silence' | 'max_length'
+
+    def feed(self, pcm_bytes):
+        """
+        PCM 바이트(길이 무관)를 넣고 새로 확정된 발화 오디오를 반환합니다.
+
+        Returns:
+            bytes: 발화에 포함될 새 PCM 데이터 (없으면 b'').
+        """
+        if self.done:
+            return b''
+        data = self._pending + pcm_bytes
+        usable = len(data) - len(data) % self.frame_bytes
+        self._pending = data[usable:]
+        output = []
+        for offset in range(0, usable, self.frame_bytes):
+            frame_bytes = data[offset:offset + self.frame_bytes]
+            speech = self.vad.is_speech(audio_utils.pcm16_to_float32(frame_bytes))
+            if not self.triggered:
+                self._pre_roll.append(frame_bytes)
+                self._speech_run = self._speech_run + 1 if speech else 0
+                if self._speech_run >= self._onset_frames:
+                    self.triggered = True
+                    self._utterance_frames = len(self._pre_roll)
+                    output.extend(self._pre_roll)
+                    self._pre_roll.clear()
+                continue
+
+            output.append(frame_bytes)
+            self._utterance_frames += 1
+            self._silence_run = 0 if speech else self._silence_run + 1
+            if self._silence_run >= self._hangover_frames:
+                self.done, self.end_reason = True, 'silence'
+            elif self._utterance_frames >= self._max_frames:
+                self.done, self.end_reason = True, 'max_length'
+            if self.done:
+                break
+        return b''.join(output)
@@ -0,0 +1,230 @@
+# -*- coding: utf-8 -*-
+"""
+온디바이스 호출어(wake word) 검출.
+main.py가 상시 캡처 스트림을 계속 이 검출기에 넣고, 호출어가 감지된 뒤에만 녹음/STT 요청을 시작하도록 하여
+아무도 기기에게 말하지 않을 때(무음, TV 소리 등) 서버 Whisper를 쓰지 않게 합니다.
+
+NumPy만 사용합니다:
+  - 특징: 16kHz MFCC (25ms 프레임 / 10ms 홉, 창 단위 평균·분산 정규화, c0 제외)
+  - 판정: 미리 등록한 호출어 템플릿들과 최근 오디오의 부분열 DTW 거리 (기울기 0.5~2배 제한)
+
+템플릿 등록 / 임계값 확인:
+  python wake_word.py enroll wake_word.npz 샘플1.wav 샘플2.wav 샘플3.wav
+  python wake_word.py score wake_word.npz 테스트.wav
+"""
+import collections
+import sys
+
+import numpy as np
+
+import audio_utils
+
+# --- 설정 ---
+FEATURE_SAMPLE_RATE = audio_utils.WHISPER_SAMPLE_RATE
+FRAME_MS = 25
+HOP_MS = 10
+N_FFT = 512
+N_MELS = 26
+N_MFCC = 13
+DEFAULT_THRESHOLD = 2.0          # 템플릿 프레임당 평균 거리가 이보다 작으면 감지 (score 명령으로 조정)
+DEFAULT_EVAL_INTERVAL_MS = 100   # DTW 판정 주기
+DEFAULT_REFRACTORY_MS = 1000     # 감지 후 다시 감지하지 않는 시간
+DEFAULT_MIN_ENERGY_DB = -45.0    # 판정 구간 최대 프레임 에너지가 이보다 작으면 판정 생략 (dBFS)
+WINDOW_STRETCH = 1.5             # 판정 구간 길이 = 가장 긴 템플릿 * 이 배수
+ENROLL_TRIM_DB = 30.0            # 등록 시 최대 에너지보다 이만큼 작은 앞뒤 프레임은 잘라냄
+# --- 설정 끝 ---
+
+def _mel_filterbank(sample_rate, n_fft, n_mels):
+    def hz_to_mel(hz):
+        return 2595.0 * np.log10(1.0 + hz / 700.0)
+
+    def mel_to_hz(mel):
+        return 700.0 * (10.0 ** (mel / 2595.0) - 1.0)
+
+    mel_points = np.linspace(hz_to_mel(0.0), hz_to_mel(sample_rate / 2), n_mels + 2)
+    bins = np.floor((n_fft + 1) * mel_to_hz(mel_points) / sample_rate).astype(int)
+    bank = np.zeros((n_mels, n_fft // 2 + 1), dtype=np.float32)
+    for m in range(1, n_mels + 1):
+        left, center, right = bins[m - 1], bins[m], bins[m + 1]
+        if center > left:
+            bank[m - 1, left:center] = (np.arange(left, center) - left) / (center - left)
+        if right > center:
+            bank[m - 1, center:right] = (right - np.arange(center, right)) / (right - center)
+    return bank
+
+def _dct_matrix(n_mfcc, n_mels):
+    n = np.arange(n_mels)
+    k = np.arange(n_mfcc)[:, None]
+    return (np.cos(np.pi * k * (2 * n + 1) / (2 * n_mels)) * np.sqrt(2.0 / n_mels)).astype(np.float32)
+
+class MFCCExtractor:
+    """16kHz float32 오디오를 청크 단위로 받아 MFCC 프레임을 만듭니다 (청크 경계에 걸친 샘플은 다음 호출로 이월)."""
+
+    def __init__(self, sample_rate=FEATURE_SAMPLE_RATE):
+        self.frame_samples = int(sample_rate * FRAME_MS / 1000)
+        self.hop_samples = int(sample_rate * HOP_MS / 1000)
+        self._window = np.hamming(self.frame_samples).astype(np.float32)
+        self._mel = _mel_filterbank(sample_rate, N_FFT, N_MELS)
+        self._dct = _dct_matrix(N_MFCC, N_MELS)
+        self._pending = np.zeros(0, dtype=np.float32)
+
+    def process(self, audio):
+        """
+        Returns:
+            tuple: (np.ndarray (프레임 수, N_MFCC) MFCC, np.ndarray (프레임 수,) 프레임 에너지 dBFS)
+        """
+        data = np.concatenate([self._pending, np.asarray(audio, dtype=np.float32)])
+        n_frames = 0 if len(data) < self.frame_samples else 1 + (len(data) - self.frame_samples) // self.hop_samples
+        self._pending = data[n_frames * self.hop_samples:]
+        if n_frames == 0:
+            return np.zeros((0, N_MFCC), dtype=np.float32), np.zeros(0, dtype=np.float32)
+
+        index = np.arange(self.frame_samples)[None, :] + self.hop_samples * np.arange(n_frames)[:, None]
+        frames = data[index]
+        energy_db = 10.0 * np.log10(np.mean(frames * frames, axis=1) + 1e-10)
+        power = np.abs(np.fft.rfft(frames * self._window, n=N_FFT)) ** 2
+        log_mel = np.log(power @ self._mel.T + 1e-10)
+        return (log_mel @ self._dct.T).astype(np.float32), energy_db.astype(np.float32)
+
+def normalize_features(features):
+    """창 단위 평균·분산 정규화 후 c0(음량)을 버립니다. 마이크 거리/음량 차이를 줄입니다."""
+    features = features - features.mean(axis=0)
+    features = features / (features.std(axis=0) + 1e-5)
+    return features[:, 1:]
+
+def subsequence_dtw(template, window):
+    """
+    template 전체가 window의 어느 구간과든 맞춰질 때의 최소 DTW 거리 (템플릿 프레임당 평균).
+    시작/끝은 window 안 어디든 될 수 있고, 한 스텝은 (1,1), (1,2), (2,1)만 허용하여 말 빠르기 0.5~2배를 허용합니다.
+    이전 두 행만 참조하므로 행 단위로 벡터 연산합니다.
+
+    Args:
+        template (np.ndarray): (n, d) 정규화된 특징.
+        window (np.ndarray): (m, d) 정규화된 특징.
+
+    Returns:
+        float: 거리 (작을수록 비슷함). 맞출 수 없으면 inf.
+    """
+    cost = np.sqrt(((template[:, None, :] - window[None, :, :]) ** 2).sum(axis=2))
+    n, m = cost.shape
+    inf = np.full(2, np.inf)
+    previous2 = np.full(m + 2, np.inf) # 패딩 2칸: j-1, j-2 참조용
+    previous = np.concatenate([inf, cost[0]]) # 첫 행: 어느 열에서든 시작
+    for i in range(1, n):
+        best = np.minimum(np.minimum(previous[1:-1], previous[:-2]), previous2[1:-1])
+        previous2, previous = previous, np.concatenate([inf, cost[i] + best])
+    return float(previous[2:].min()) / n
+
+class WakeWordDetector:
+    """
+    캡처 레이트의 S16_LE PCM을 받아 호출어를 감지합니다.
+
+    feed()가 True를 반환한 순간이 호출어가 끝난 시점입니다. 감지 후에는 판정 구간을 비우고 refractory 동안 쉽니다.
+    """
+
+    def __init__(self, templates, sample_rate, threshold=DEFAULT_THRESHOLD,
+                 eval_interval_ms=DEFAULT_EVAL_INTERVAL_MS, refractory_ms=DEFAULT_REFRACTORY_MS,
+                 min_energy_db=DEFAULT_MIN_ENERGY_DB):
+        if not templates:
+            raise ValueError("호출어 템플릿이 없습니다")
+        self.templates = [normalize_features(np.asarray(template, dtype=np.float32)) for template in templates]
+        self.threshold = threshold
+        self.min_energy_db = min_energy_db
+        self.last_score = None
+        self._resampler = audio_utils.PolyphaseResampler(sample_rate, FEATURE_SAMPLE_RATE)
+        self._mfcc = MFCCExtractor()
+        window_frames = int(max(len(template) for template in self.templates) * WINDOW_STRETCH)
+        self._features = collections.deque(maxlen=window_frames)
+        self._energy = collections.deque(maxlen=window_frames)
+        self._eval_frames = max(1, eval_interval_ms // HOP_MS)
+        self._refractory_frames = refractory_ms // HOP_MS
+        self._since_eval = 0
+        self._cooldown = 0
+
+    def reset(self):
+        """판정 구간을 비웁니다 (녹음/응답 재생 뒤 대기 상태로 돌아올 때)."""
+        self._features.clear()
+        self._energy.clear()
+        self._since_eval = 0
+
+    def feed(self, pcm_bytes):
+        """
+        PCM 바이트(길이 무관)를 넣습니다.
+
+        Returns:
+            bool: 이번 입력에서 호출어가 감지되었으면 True.
+        """
+        features, energy_db = self._mfcc.process(self._resampler.process(audio_utils.pcm16_to_float32(pcm_bytes)))
+        fired = False
+        for frame, energy in zip(features, energy_db):
+            self._features.append(frame)
+            self._energy.append(energy)
+            if self._cooldown > 0:
+                self._cooldown -= 1
+                continue
+            self._since_eval += 1
+            if self._since_eval < self._eval_frames or len(self._features) < self._features.maxlen:
+                continue
+            self._since_eval = 0
+            if self._evaluate():
+                fired = True
+                self._cooldown = self._refractory_frames
+                self.reset()
+        return fired
+
+    def _evaluate(self):
+        if max(self._energy) < self.min_energy_db:
+            return False
+        window = normalize_features(np.array(self._features))
+        self.last_score = min(subsequence_dtw(template, window) for template in self.templates)
+        return self.last_score < self.threshold
+
+def extract_template(audio, sample_rate):
+    """호출어 녹음 한 개에서 앞뒤 무음을 잘라낸 MFCC 템플릿을 만듭니다."""
+    features, energy_db = MFCCExtractor().process(audio_utils.resample_poly(audio, sample_rate, FEATURE_SAMPLE_RATE))
+    if len(features) == 0:
+        raise ValueError("오디오가 너무 짧습니다")
+    voiced = np.nonzero(energy_db >= energy_db.max() - ENROLL_TRIM_DB)[0]
+    return features[voiced[0]:voiced[-1] + 1]
+
+def save_templates(path, templates):
+    """템플릿 목록을 .npz 파일로 저장합니다."""
+    np.savez(path, **{f"template_{i}": template for i, template in enumerate(templates)})
+
+def load_templates(path):
+    """save_templates()로 저장한 템플릿 목록을 읽습니다."""
+    with np.load(path) as data:
+        return [data[key] for key in sorted(data.files, key=lambda name: int(name.rsplit("_", 1)[1]))]
+
+def _read_wav(path):
+    with open(path, 'rb') as f:
+        return audio_utils.decode_wav(f.read())
+
+# --- 템플릿 등록 / 점수 확인 도구 ---
+if __name__ == "__main__":
+    if len(sys.argv) < 4 or sys.argv[1] not in ("enroll", "score"):
+        print("사용법: python wake_word.py enroll <템플릿.npz> <호출어.wav>...")
+        print("        python wake_word.py score <템플릿.npz> <테스트.wav>...")
+        sys.exit(1)
+    command, template_path, wav_paths = sys.argv[1], sys.argv[2], sys.argv[3:]
+    if command == "enroll":
+        templates = []
+        for wav_path in wav_paths:
+            template = extract_template(*_read_wav(wav_path))
+            print(f"{wav_path}: {len(template) * HOP_MS}ms")
+            templates.append(template)
+        save_templates(template_path, templates)
+        print(f"템플릿 {len(templates)}개 저장: {template_path}")
+    else:
+        templates = load_templates(template_path)
+        for wav_path in wav_paths:
+            audio, sample_rate = _read_wav(wav_path)
+            detector = WakeWordDetector(templates, sample_rate, threshold=0.0) # 감지 없이 점수만 계산
+            scores = []
+            for start in range(0, len(audio), 1600):
+                detector.feed(audio_utils.float32_to_pcm16(audio[start:start + 1600]))
+                if detector.last_score is not None:
+                    scores.append(detector.last_score)
+                    detector.last_score = None
+            best = f"{min(scores):.2f}" if scores else "판정 없음(무음)"
+            print(f"{wav_path}: 최소 거리 {best} (임계값 기본 {DEFAULT_THRESHOLD})")
@@ -1,6 +1,7 @@
 # -*- coding: utf-8 -*-
 # 필요한 라이브러리를 가져옵니다.
 import requests
+import http_client # 공용 HTTP 세션 (keep-alive / 재시도)
 import os
 from dotenv import load_dotenv # .env 파일 사용을 위해 추가
 
@@ -40,7 +41,7 @@ def get_location_from_ip():
     """
     try:
         print("IP 주소 기반 현재 위치 조회 중...")
-        response = requests.get(IPINFO_URL, timeout=5) # 5초 타임아웃 설정
+        response = http_client.get(IPINFO_URL, endpoint="ipinfo") # HTTP_TIMEOUT_IPINFO (기본 5초)
         response.raise_for_status()
         data = response.json()
         city_en = data.get('city')
@@ -98,7 +99,7 @@ def get_weather(city_ko=DEFAULT_CITY_KO):
 
     try:
         print(f"날씨 정보 요청 ({display_city_name} / {city_en}): {complete_url}")
-        response = requests.get(complete_url)
+        response = http_client.get(complete_url, endpoint="weather")
         response.raise_for_status()
         data = response.json()
 